@@ -1,25 +1,69 @@
 from __future__ import annotations
 
-import subprocess
-import sys
+import bisect
+import codecs
+import io
+import math
+import mmap
+import os
+import queue
+import threading
+import time
 import tkinter as tk
 from pathlib import Path
 from tkinter import filedialog, messagebox, ttk
-from typing import Optional, Sequence, Tuple
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
 from test_runner import (
+    CancelToken,
     TestCase,
     TestResult,
+    UsageTotals,
+    display_text,
     ensure_pytest_available,
     generate_pytest_file,
-    parse_cases,
-    run_test_cases,
+    iter_test_results,
 )
+from test_runner._text import text_encoding
+from test_runner.benchmark import (
+    BaselineComparison,
+    CaseBenchmark,
+    benchmark_cases,
+    compare_to_baseline,
+    load_baseline,
+    save_baseline,
+)
+from test_runner.cache import ResultCache
 from test_runner.cases import ParseError
+from test_runner.compare import COMPARATORS, get_comparator
+from test_runner.generate import DISTRIBUTIONS, ORACLES, SuiteSpec, size_sweep, suite_text, write_suite
+from test_runner.generator import write_recorded_results
+from test_runner.history import AdaptiveTimeout, RunHistory
+from test_runner.limits import MEMORY_LIMIT_STATUS
+from test_runner.pytest_session import PytestOutcome, PytestReport, run_pytest
+from test_runner.suite import CaseSuite, describe_stats
+from test_runner.tracing import Tracer, describe_summary, span
 
 WINDOW_MIN_WIDTH = 960
 WINDOW_MIN_HEIGHT = 720
 DEFAULT_TIMEOUT = 5.0
+POLL_INTERVAL_MS = 50
+RESULTS_PER_POLL = 200
+TABLE_PAGE_ROWS = 12
+TABLE_HEADING_HEIGHT = 24
+DEFAULT_ROW_HEIGHT = 20
+WHEEL_ROWS = 3
+SEARCH_DELAY_MS = 150
+STDOUT_PREVIEW_SCAN = 256
+SPILL_PREVIEW_HEAD = 64 * 1024
+SPILL_PREVIEW_TAIL = 16 * 1024
+CACHE_FILENAME = ".test_runner_cache.sqlite3"
+HISTORY_FILENAME = ".test_runner_history.sqlite3"
+# Larger generated suites are only written to a file, not into the editor.
+EDITOR_CASE_LIMIT = 10_000
+MAX_GENERATED_CASES = 100_000_000
+SWEEP_STEPS = 8
+EDGE_VALUE_RATE = 0.05
 
 
 class Application(tk.Tk):
@@ -30,12 +74,35 @@ class Application(tk.Tk):
 
         cwd = Path.cwd()
         default_script = cwd / "script.py"
-        default_tests_dir = cwd / "tests"
+        # Not "tests": that is the package of the project's own tests.
+        default_tests_dir = cwd / "generated_tests"
 
         self.script_path_var = tk.StringVar(value=str(default_script.resolve()))
+        self.reference_path_var = tk.StringVar()
         self.tests_dir_var = tk.StringVar(value=str(default_tests_dir.resolve()))
         self.test_filename_var = tk.StringVar(value="test_generated.py")
         self.timeout_var = tk.DoubleVar(value=DEFAULT_TIMEOUT)
+        self.cpu_limit_var = tk.DoubleVar(value=0.0)
+        self.memory_limit_var = tk.IntVar(value=0)
+        self.trace_var = tk.BooleanVar(value=False)
+        self.adaptive_timeout_var = tk.BooleanVar(value=False)
+        self.timeout_factor_var = tk.DoubleVar(value=AdaptiveTimeout.factor)
+        self.warm_start_var = tk.BooleanVar(value=False)
+        self.data_file_var = tk.BooleanVar(value=False)
+        self.use_cache_var = tk.BooleanVar(value=True)
+        self.single_pass_var = tk.BooleanVar(value=True)
+        self.stop_on_divergence_var = tk.BooleanVar(value=False)
+        self.use_history_var = tk.BooleanVar(value=True)
+        self.deduplicate_var = tk.BooleanVar(value=True)
+        self.binary_var = tk.BooleanVar(value=False)
+        self.encoding_var = tk.StringVar(value=text_encoding())
+        self.comparator_var = tk.StringVar()
+        self.tolerance_var = tk.StringVar(value="1e-6")
+        self.max_failures_var = tk.IntVar(value=0)
+        self.repeat_var = tk.IntVar(value=5)
+        self.warmup_var = tk.IntVar(value=1)
+        self._cache: Optional[ResultCache] = None
+        self._history: Optional[RunHistory] = None
 
         self.case_count_var = tk.IntVar(value=3)
         self.sequence_length_var = tk.IntVar(value=5)
@@ -44,6 +111,12 @@ class Application(tk.Tk):
         self.arrangement_var = tk.StringVar()
         self.include_length_var = tk.BooleanVar(value=True)
         self.include_expected_var = tk.BooleanVar(value=True)
+        self.max_length_var = tk.IntVar(value=5)
+        self.spread_var = tk.IntVar(value=100)
+        self.seed_var = tk.StringVar()
+        self.edge_values_var = tk.BooleanVar(value=False)
+        self.distribution_var = tk.StringVar()
+        self.oracle_var = tk.StringVar()
 
         self._arrangement_options = {
             "column": "По одному в строке",
@@ -51,6 +124,21 @@ class Application(tk.Tk):
             "comma": "Через запятую",
         }
         self.arrangement_var.set(self._arrangement_options["column"])
+        self._distribution_options = dict(
+            zip(DISTRIBUTIONS, ("Последовательность", "Равномерное", "Нормальное"))
+        )
+        self.distribution_var.set(self._distribution_options["range"])
+        self._oracle_options = dict(
+            zip(ORACLES, ("Первые два больше остальных", "Сумма", "Максимум", "Сортировка"))
+        )
+        self.oracle_var.set(self._oracle_options["first_two_vs_rest"])
+        self._comparator_options = dict(
+            zip(
+                COMPARATORS,
+                ("Точное совпадение", "По словам", "Числа с допуском", "Строки в любом порядке"),
+            )
+        )
+        self.comparator_var.set(self._comparator_options["exact"])
 
         self._build_layout()
         self._generate_sample_tests()
@@ -70,10 +158,22 @@ class Application(tk.Tk):
         self._build_buttons(container)
 
     def _build_file_section(self, parent: ttk.Frame) -> None:
-        frame = ttk.LabelFrame(parent, text="Файлы", padding=10)
-        frame.grid(row=0, column=0, sticky="nsew", padx=0, pady=(0, 12))
-        frame.columnconfigure(1, weight=1)
-
+        # The options are spread over tabs so the test editor keeps its room
+        # in the minimum-size window.
+        notebook = ttk.Notebook(parent)
+        notebook.grid(row=0, column=0, sticky="nsew", padx=0, pady=(0, 12))
+        for title, build in (
+            ("Файлы", self._build_files_tab),
+            ("Запуск", self._build_run_tab),
+            ("Проверка вывода", self._build_check_tab),
+            ("Ограничения", self._build_limits_tab),
+        ):
+            frame = ttk.Frame(notebook, padding=10)
+            frame.columnconfigure(1, weight=1)
+            build(frame)
+            notebook.add(frame, text=title)
+
+    def _build_files_tab(self, frame: ttk.Frame) -> None:
         ttk.Label(frame, text="Скрипт с решением:").grid(row=0, column=0, sticky="w")
         entry = ttk.Entry(frame, textvariable=self.script_path_var)
         entry.grid(row=0, column=1, sticky="ew", padx=8)
@@ -87,10 +187,127 @@ class Application(tk.Tk):
         ttk.Label(frame, text="Имя файла тестов:").grid(row=2, column=0, sticky="w", pady=(8, 0))
         ttk.Entry(frame, textvariable=self.test_filename_var).grid(row=2, column=1, sticky="ew", padx=8, pady=(8, 0))
 
-        ttk.Label(frame, text="Тайм-аут (сек):").grid(row=3, column=0, sticky="w", pady=(8, 0))
+        ttk.Checkbutton(
+            frame,
+            text="Хранить тесты в отдельном файле данных (для больших наборов)",
+            variable=self.data_file_var,
+        ).grid(row=3, column=0, columnspan=3, sticky="w", pady=(8, 0))
+
+        ttk.Label(frame, text="Эталонное решение:").grid(row=4, column=0, sticky="w", pady=(8, 0))
+        ttk.Entry(frame, textvariable=self.reference_path_var).grid(
+            row=4, column=1, sticky="ew", padx=8, pady=(8, 0)
+        )
+        ttk.Button(frame, text="Обзор", command=self._choose_reference).grid(row=4, column=2, pady=(8, 0))
+        ttk.Label(
+            frame,
+            text="Если указано, вывод скрипта сравнивается с выводом эталона, а не с ожидаемым",
+        ).grid(row=5, column=1, columnspan=2, sticky="w", padx=8)
+
+    def _build_run_tab(self, frame: ttk.Frame) -> None:
+        ttk.Checkbutton(
+            frame,
+            text="Тёплый интерпретатор (fork вместо запуска Python на каждый тест)",
+            variable=self.warm_start_var,
+        ).grid(row=0, column=0, columnspan=3, sticky="w")
+
+        ttk.Checkbutton(
+            frame,
+            text="Один прогон: pytest проверяет уже полученные результаты",
+            variable=self.single_pass_var,
+        ).grid(row=1, column=0, columnspan=3, sticky="w", pady=(8, 0))
+
+        ttk.Checkbutton(
+            frame,
+            text="Сначала недавно упавшие и самые долгие тесты (по истории запусков)",
+            variable=self.use_history_var,
+        ).grid(row=2, column=0, columnspan=3, sticky="w", pady=(8, 0))
+
+        ttk.Checkbutton(
+            frame,
+            text="Одинаковые входные данные запускать один раз (скрипт детерминирован)",
+            variable=self.deduplicate_var,
+        ).grid(row=3, column=0, columnspan=3, sticky="w", pady=(8, 0))
+
+        ttk.Label(frame, text="Остановить после ошибок:").grid(row=4, column=0, sticky="w", pady=(8, 0))
+        ttk.Spinbox(frame, textvariable=self.max_failures_var, from_=0, to=10000, width=8).grid(
+            row=4, column=1, sticky="w", padx=8, pady=(8, 0)
+        )
+        ttk.Label(frame, text="0 — выполнять все тесты").grid(row=4, column=2, sticky="w", pady=(8, 0))
+
+        ttk.Checkbutton(
+            frame,
+            text="Трассировка этапов (файл .trace.json рядом с файлом тестов, для Perfetto)",
+            variable=self.trace_var,
+        ).grid(row=5, column=0, columnspan=3, sticky="w", pady=(8, 0))
+
+    def _build_check_tab(self, frame: ttk.Frame) -> None:
+        ttk.Label(frame, text="Сравнение вывода:").grid(row=0, column=0, sticky="w")
+        comparison = ttk.Frame(frame)
+        comparison.grid(row=0, column=1, columnspan=2, sticky="w", padx=8)
+        ttk.Combobox(
+            comparison,
+            textvariable=self.comparator_var,
+            values=list(self._comparator_options.values()),
+            state="readonly",
+            width=24,
+        ).grid(row=0, column=0)
+        ttk.Label(comparison, text="Допуск для чисел:").grid(row=0, column=1, padx=(12, 4))
+        ttk.Entry(comparison, textvariable=self.tolerance_var, width=10).grid(row=0, column=2)
+        ttk.Label(
+            frame,
+            text="Для отдельного теста: строка «# @compare tokens» (или numeric, unordered, exact)",
+        ).grid(row=1, column=1, columnspan=2, sticky="w", padx=8)
+
+        ttk.Checkbutton(
+            frame,
+            text="Останавливать тест при первом расхождении с ожидаемым выводом",
+            variable=self.stop_on_divergence_var,
+        ).grid(row=2, column=0, columnspan=3, sticky="w", pady=(8, 0))
+
+        ttk.Checkbutton(
+            frame,
+            text="Двоичный режим: вход и вывод сравниваются как байты, без перекодирования",
+            variable=self.binary_var,
+        ).grid(row=3, column=0, columnspan=3, sticky="w", pady=(8, 0))
+
+        ttk.Label(frame, text="Кодировка ввода-вывода:").grid(row=4, column=0, sticky="w", pady=(8, 0))
+        ttk.Entry(frame, textvariable=self.encoding_var, width=12).grid(
+            row=4, column=1, sticky="w", padx=8, pady=(8, 0)
+        )
+
+    def _build_limits_tab(self, frame: ttk.Frame) -> None:
+        ttk.Label(frame, text="Тайм-аут (сек):").grid(row=0, column=0, sticky="w")
         ttk.Spinbox(frame, textvariable=self.timeout_var, from_=0.0, to=60.0, increment=0.5, width=8).grid(
+            row=0, column=1, sticky="w", padx=8
+        )
+
+        adaptive = ttk.Frame(frame)
+        adaptive.grid(row=1, column=0, columnspan=3, sticky="w", pady=(8, 0))
+        ttk.Checkbutton(
+            adaptive,
+            text="Тайм-аут каждого теста по истории: p95 его времени ×",
+            variable=self.adaptive_timeout_var,
+        ).grid(row=0, column=0)
+        ttk.Spinbox(
+            adaptive, textvariable=self.timeout_factor_var, from_=1.0, to=20.0, increment=0.5, width=6
+        ).grid(row=0, column=1, padx=4)
+        ttk.Label(adaptive, text="(не больше общего тайм-аута)").grid(row=0, column=2)
+
+        ttk.Label(frame, text="Лимит CPU (сек):").grid(row=2, column=0, sticky="w", pady=(8, 0))
+        ttk.Spinbox(frame, textvariable=self.cpu_limit_var, from_=0.0, to=600.0, increment=1.0, width=8).grid(
+            row=2, column=1, sticky="w", padx=8, pady=(8, 0)
+        )
+        ttk.Label(frame, text="0 — без ограничения; параллельные тесты на него не влияют").grid(
+            row=2, column=2, sticky="w", pady=(8, 0)
+        )
+
+        ttk.Label(frame, text="Лимит памяти (МиБ):").grid(row=3, column=0, sticky="w", pady=(8, 0))
+        ttk.Spinbox(frame, textvariable=self.memory_limit_var, from_=0, to=65536, increment=64, width=8).grid(
             row=3, column=1, sticky="w", padx=8, pady=(8, 0)
         )
+        ttk.Label(frame, text="0 — без ограничения; превысившие его тесты получают отдельный статус").grid(
+            row=3, column=2, sticky="w", pady=(8, 0)
+        )
 
     def _build_generator_section(self, parent: ttk.Frame) -> None:
         frame = ttk.LabelFrame(parent, text="Настройки генератора", padding=10)
@@ -99,13 +316,18 @@ class Application(tk.Tk):
             frame.columnconfigure(col, weight=1)
 
         ttk.Label(frame, text="Количество тестов:").grid(row=0, column=0, sticky="w")
-        ttk.Spinbox(frame, from_=1, to=1000, textvariable=self.case_count_var, width=6).grid(
-            row=0, column=1, sticky="w", padx=(0, 12)
+        ttk.Spinbox(
+            frame, from_=1, to=MAX_GENERATED_CASES, textvariable=self.case_count_var, width=10
+        ).grid(row=0, column=1, sticky="w", padx=(0, 12))
+
+        ttk.Label(frame, text="Чисел в тесте (от и до):").grid(row=0, column=2, sticky="w")
+        sizes = ttk.Frame(frame)
+        sizes.grid(row=0, column=3, sticky="w")
+        ttk.Spinbox(sizes, from_=1, to=10_000_000, textvariable=self.sequence_length_var, width=8).grid(
+            row=0, column=0
         )
-
-        ttk.Label(frame, text="Чисел в тесте:").grid(row=0, column=2, sticky="w")
-        ttk.Spinbox(frame, from_=1, to=1000, textvariable=self.sequence_length_var, width=6).grid(
-            row=0, column=3, sticky="w"
+        ttk.Spinbox(sizes, from_=1, to=10_000_000, textvariable=self.max_length_var, width=8).grid(
+            row=0, column=1, padx=(4, 0)
         )
 
         ttk.Label(frame, text="Начальное число:").grid(row=1, column=0, sticky="w", pady=(8, 0))
@@ -133,14 +355,51 @@ class Application(tk.Tk):
             variable=self.include_length_var,
         ).grid(row=2, column=2, columnspan=2, sticky="w", pady=(8, 0))
 
+        ttk.Label(frame, text="Распределение:").grid(row=3, column=0, sticky="w", pady=(8, 0))
+        ttk.Combobox(
+            frame,
+            textvariable=self.distribution_var,
+            values=list(self._distribution_options.values()),
+            state="readonly",
+            width=20,
+        ).grid(row=3, column=1, sticky="w", padx=(0, 12), pady=(8, 0))
+
+        ttk.Label(frame, text="Разброс (для случайных):").grid(row=3, column=2, sticky="w", pady=(8, 0))
+        ttk.Spinbox(frame, from_=0, to=10**9, textvariable=self.spread_var, width=10).grid(
+            row=3, column=3, sticky="w", pady=(8, 0)
+        )
+
+        ttk.Label(frame, text="Зерно (пусто — случайное):").grid(row=4, column=0, sticky="w", pady=(8, 0))
+        ttk.Entry(frame, textvariable=self.seed_var, width=12).grid(
+            row=4, column=1, sticky="w", padx=(0, 12), pady=(8, 0)
+        )
+
         ttk.Checkbutton(
             frame,
-            text="Добавлять ожидаемый ответ (сумма)",
-            variable=self.include_expected_var,
-        ).grid(row=3, column=0, columnspan=2, sticky="w", pady=(8, 0))
+            text="Подмешивать граничные значения (0, ±1, пределы int32)",
+            variable=self.edge_values_var,
+        ).grid(row=4, column=2, columnspan=2, sticky="w", pady=(8, 0))
 
-        ttk.Button(frame, text="Сгенерировать примеры", command=self._generate_sample_tests).grid(
-            row=3, column=2, columnspan=2, sticky="e", pady=(8, 0)
+        ttk.Checkbutton(
+            frame,
+            text="Добавлять ожидаемый ответ:",
+            variable=self.include_expected_var,
+        ).grid(row=5, column=0, sticky="w", pady=(8, 0))
+        ttk.Combobox(
+            frame,
+            textvariable=self.oracle_var,
+            values=list(self._oracle_options.values()),
+            state="readonly",
+            width=28,
+        ).grid(row=5, column=1, sticky="w", padx=(0, 12), pady=(8, 0))
+
+        buttons = ttk.Frame(frame)
+        buttons.grid(row=5, column=2, columnspan=2, sticky="e", pady=(8, 0))
+        ttk.Button(buttons, text="Сгенерировать примеры", command=self._generate_sample_tests).grid(
+            row=0, column=0
+        )
+        ttk.Button(buttons, text="Сохранить в файл…", command=self._save_generated_suite).grid(
+            row=0, column=1, padx=(8, 0)
         )
 
     def _build_text_section(self, parent: ttk.Frame) -> None:
@@ -179,10 +438,33 @@ class Application(tk.Tk):
         frame.grid(row=3, column=0, sticky="ew", pady=(12, 0))
         frame.columnconfigure(0, weight=1)
 
+        bench = ttk.Frame(frame)
+        bench.grid(row=0, column=0, sticky="w")
+        ttk.Label(bench, text="Повторов:").grid(row=0, column=0)
+        ttk.Spinbox(bench, from_=1, to=1000, textvariable=self.repeat_var, width=5).grid(
+            row=0, column=1, padx=(4, 8)
+        )
+        ttk.Label(bench, text="Прогрев:").grid(row=0, column=2)
+        ttk.Spinbox(bench, from_=0, to=100, textvariable=self.warmup_var, width=5).grid(
+            row=0, column=3, padx=(4, 8)
+        )
+        ttk.Button(bench, text="Бенчмарк", command=self._run_benchmark).grid(row=0, column=4)
+
+        ttk.Checkbutton(frame, text="Кэшировать результаты", variable=self.use_cache_var).grid(
+            row=0, column=1, sticky="e", padx=(0, 12)
+        )
+        ttk.Button(frame, text="Очистить кэш", command=self._clear_cache).grid(
+            row=0, column=2, sticky="e", padx=(0, 12)
+        )
+        ttk.Button(
+            frame,
+            text="Перезапустить без кэша",
+            command=lambda: self._generate_and_run(refresh=True),
+        ).grid(row=0, column=3, sticky="e", padx=(0, 12))
         ttk.Button(frame, text="Создать test.py и запустить", command=self._generate_and_run).grid(
-            row=0, column=1, sticky="e"
+            row=0, column=4, sticky="e"
         )
-        ttk.Button(frame, text="Выход", command=self.destroy).grid(row=0, column=2, padx=(12, 0))
+        ttk.Button(frame, text="Выход", command=self.destroy).grid(row=0, column=5, padx=(12, 0))
 
     # ----------------------------------------------------------------- events
     def _choose_script(self) -> None:
@@ -193,60 +475,216 @@ class Application(tk.Tk):
         if path:
             self.script_path_var.set(path)
 
+    def _choose_reference(self) -> None:
+        path = filedialog.askopenfilename(
+            title="Выберите эталонное решение",
+            filetypes=[("Python", "*.py"), ("Все файлы", "*.*")],
+        )
+        if path:
+            self.reference_path_var.set(path)
+
     def _choose_directory(self) -> None:
         path = filedialog.askdirectory(title="Папка для файла test.py")
         if path:
             self.tests_dir_var.set(path)
 
+    @staticmethod
+    def _option_key(options: dict[str, str], label: str, default: str) -> str:
+        return next((key for key, text in options.items() if text == label), default)
+
+    def _generator_spec(self) -> Optional[SuiteSpec]:
+        """Translate the generator settings into a :class:`SuiteSpec`."""
+
+        try:
+            count = max(1, self.case_count_var.get())
+            smallest = max(1, self.sequence_length_var.get())
+            largest = max(smallest, self.max_length_var.get())
+            start = self.start_value_var.get()
+            spread = max(0, self.spread_var.get())
+            seed_text = self.seed_var.get().strip()
+            seed = int(seed_text) if seed_text else None
+        except (tk.TclError, ValueError):
+            messagebox.showerror("Ошибка", "Проверьте числовые настройки генератора")
+            return None
+
+        spec = SuiteSpec(
+            count=count,
+            lengths=size_sweep(smallest, largest, min(count, SWEEP_STEPS)),
+            distribution=self._option_key(
+                self._distribution_options, self.distribution_var.get(), "range"
+            ),
+            start=start,
+            step=self.step_var.get() or 1,
+            low=start,
+            high=start + spread,
+            mean=start,
+            stddev=spread,
+            seed=seed,
+            edge_rate=EDGE_VALUE_RATE if self.edge_values_var.get() else 0.0,
+            arrangement=self._option_key(self._arrangement_options, self.arrangement_var.get(), "column"),
+            include_length=self.include_length_var.get(),
+            oracle=(
+                self._option_key(self._oracle_options, self.oracle_var.get(), "first_two_vs_rest")
+                if self.include_expected_var.get()
+                else None
+            ),
+        )
+        try:
+            spec.validate()
+        except ValueError as exc:
+            messagebox.showerror("Ошибка", str(exc))
+            return None
+        return spec
+
     def _generate_sample_tests(self) -> None:
-        count = max(1, self.case_count_var.get())
-        length = max(1, self.sequence_length_var.get())
-        start = self.start_value_var.get()
-        step = self.step_var.get() or 1
-        arrangement_key = next(
-            (key for key, label in self._arrangement_options.items() if label == self.arrangement_var.get()),
-            "column",
-        )
-
-        lines = []
-        current = start
-        for index in range(count):
-            lines.append(f"# Тест {index + 1}")
-            if self.include_length_var.get():
-                lines.append(str(length))
-
-            numbers = [str(current + offset * step) for offset in range(length)]
-            current += length * step
-
-            if arrangement_key == "column":
-                lines.extend(numbers)
-            elif arrangement_key == "space":
-                lines.append(" ".join(numbers))
-            else:
-                lines.append(",".join(numbers))
-
-            if self.include_expected_var.get():
-                values = [int(value) for value in numbers]
-                lines.append("=>")
-                if len(values) >= 2:
-                    first_two_sum = values[0] + values[1]
-                    remaining_sum = sum(values[2:])
-                    expected = "yes" if first_two_sum > remaining_sum else "no"
-                else:
-                    expected = "<недостаточно данных>"
-                lines.append(expected)
-
-            lines.append("")
-
-        text = "\n".join(lines).strip() + "\n"
+        spec = self._generator_spec()
+        if spec is None:
+            return
+        if spec.count > EDITOR_CASE_LIMIT:
+            messagebox.showinfo(
+                "Генератор",
+                f"В редактор помещается не больше {EDITOR_CASE_LIMIT} тестов; "
+                "большие наборы сохраняйте в файл.",
+            )
+            return
+
         self.tests_text.delete("1.0", tk.END)
-        self.tests_text.insert(tk.END, text)
+        self.tests_text.insert(tk.END, suite_text(spec))
+
+    def _save_generated_suite(self) -> None:
+        spec = self._generator_spec()
+        if spec is None:
+            return
+        path = filedialog.asksaveasfilename(
+            title="Сохранить набор тестов",
+            defaultextension=".txt",
+            filetypes=[("Текстовые файлы", "*.txt"), ("Все файлы", "*.*")],
+        )
+        if not path:
+            return
+
+        events: queue.Queue[Tuple[str, object]] = queue.Queue()
+
+        def worker() -> None:
+            started = time.perf_counter()
+            try:
+                write_suite(spec, Path(path))
+                size = os.path.getsize(path)
+            except Exception as exc:  # pragma: no cover - GUI feedback
+                events.put(("error", exc))
+            else:
+                events.put(("done", (size, time.perf_counter() - started)))
+
+        threading.Thread(target=worker, name="suite-writer", daemon=True).start()
+        self._poll_suite_writer(events, path, spec.count)
+
+    def _poll_suite_writer(self, events: queue.Queue[Tuple[str, object]], path: str, count: int) -> None:
+        try:
+            kind, payload = events.get_nowait()
+        except queue.Empty:
+            self.after(POLL_INTERVAL_MS, self._poll_suite_writer, events, path, count)
+            return
+        if kind == "error":
+            messagebox.showerror("Ошибка", f"Не удалось сохранить набор тестов:\n{payload}")
+            return
+        size, elapsed = payload  # type: ignore[misc]
+        messagebox.showinfo(
+            "Генератор",
+            f"Сохранено тестов: {count} ({size / 2**20:.1f} МиБ) за {elapsed:.1f} с\n{path}\n\n"
+            "Такой набор можно запустить без окна: python -m test_runner скрипт файл",
+        )
+
+    def _result_cache(self, tests_dir: Path) -> ResultCache:
+        path = tests_dir / CACHE_FILENAME
+        if self._cache is None or self._cache.path != path:
+            if self._cache is not None:
+                self._cache.close()
+            self._cache = ResultCache(path)
+        return self._cache
+
+    def _run_history(self, tests_dir: Path) -> RunHistory:
+        path = tests_dir / HISTORY_FILENAME
+        if self._history is None or self._history.path != path:
+            if self._history is not None:
+                self._history.close()
+            self._history = RunHistory(path)
+        return self._history
+
+    def _clear_cache(self) -> None:
+        tests_dir = Path(self.tests_dir_var.get()).expanduser()
+        if (tests_dir / CACHE_FILENAME).exists():
+            self._result_cache(tests_dir).clear()
+        messagebox.showinfo("Кэш", "Кэш результатов очищен")
+
+    def _encoding(self) -> Optional[str]:
+        encoding = self.encoding_var.get().strip() or text_encoding()
+        try:
+            return codecs.lookup(encoding).name
+        except LookupError:
+            messagebox.showerror("Ошибка", f"Неизвестная кодировка: {encoding}")
+            return None
+
+    def _comparator_spec(self) -> Optional[str]:
+        name = self._option_key(self._comparator_options, self.comparator_var.get(), "exact")
+        spec = name
+        if name == "numeric":
+            tolerance = self.tolerance_var.get().strip()
+            spec = f"numeric abs={tolerance} rel={tolerance}"
+        try:
+            return get_comparator(spec).spec
+        except ValueError as exc:
+            messagebox.showerror("Ошибка", str(exc))
+            return None
+
+    def _read_test_cases(self, encoding: str = "utf-8") -> Optional[CaseSuite]:
+        raw_text = self.tests_text.get("1.0", tk.END)
+        try:
+            test_cases = CaseSuite.from_stream(io.StringIO(raw_text), encoding=encoding)
+        except ParseError as exc:
+            messagebox.showerror("Ошибка разбора", str(exc))
+            return None
+        except UnicodeEncodeError as exc:
+            messagebox.showerror(
+                "Ошибка", f"Тесты нельзя записать в кодировке {encoding}: {exc.reason}"
+            )
+            return None
+
+        if not test_cases:
+            messagebox.showwarning("Нет тестов", "Добавьте хотя бы один тест")
+            return None
+        return test_cases
+
+    def _run_benchmark(self) -> None:
+        script_path = Path(self.script_path_var.get()).expanduser()
+        if not script_path.exists():
+            messagebox.showerror("Ошибка", f"Файл {script_path} не найден")
+            return
 
-    def _generate_and_run(self) -> None:
+        test_cases = self._read_test_cases()
+        if test_cases is None:
+            return
+
+        timeout_value = self.timeout_var.get()
+        BenchmarkWindow(
+            self,
+            test_cases,
+            script_path,
+            repeat=max(1, self.repeat_var.get()),
+            warmup=max(0, self.warmup_var.get()),
+            timeout=timeout_value if timeout_value > 0 else None,
+            mode="fork" if self.warm_start_var.get() else "cold",
+        )
+
+    def _generate_and_run(self, refresh: bool = False) -> None:
         script_path = Path(self.script_path_var.get()).expanduser()
         if not script_path.exists():
             messagebox.showerror("Ошибка", f"Файл {script_path} не найден")
             return
+        reference_text = self.reference_path_var.get().strip()
+        reference = Path(reference_text).expanduser() if reference_text else None
+        if reference is not None and not reference.exists():
+            messagebox.showerror("Ошибка", f"Файл {reference} не найден")
+            return
 
         tests_dir = Path(self.tests_dir_var.get()).expanduser()
         tests_dir.mkdir(parents=True, exist_ok=True)
@@ -263,61 +701,293 @@ class Application(tk.Tk):
 
         timeout_value = self.timeout_var.get()
         timeout = timeout_value if timeout_value > 0 else None
+        mode = "fork" if self.warm_start_var.get() else "cold"
+        cpu_limit = self.cpu_limit_var.get()
+        memory_limit = self.memory_limit_var.get()
+        adaptive_timeout = None
+        if self.adaptive_timeout_var.get():
+            if not self.use_history_var.get():
+                messagebox.showerror(
+                    "Ошибка", "Тайм-ауту по истории нужна история запусков: включите её выше"
+                )
+                return
+            adaptive_timeout = AdaptiveTimeout(
+                factor=self.timeout_factor_var.get(),
+                ceiling=timeout if timeout is not None else AdaptiveTimeout.ceiling,
+            )
 
-        raw_text = self.tests_text.get("1.0", tk.END)
-        try:
-            test_cases = parse_cases(raw_text)
-        except ParseError as exc:
-            messagebox.showerror("Ошибка разбора", str(exc))
-            return
-
-        if not test_cases:
-            messagebox.showwarning("Нет тестов", "Добавьте хотя бы один тест")
+        encoding = self._encoding()
+        comparator = self._comparator_spec()
+        if encoding is None or comparator is None:
             return
-
+        # Started here so that parsing and writing the pytest module are traced too.
+        tracer = Tracer().start() if self.trace_var.get() else None
+        started = False
         try:
-            ensure_pytest_available()
-        except Exception as exc:  # pragma: no cover - GUI feedback
-            messagebox.showerror(
-                "pytest",
-                "Не удалось установить pytest автоматически.\n"
-                f"{exc}",
+            test_cases = self._read_test_cases(encoding)
+            if test_cases is None:
+                return
+
+            try:
+                ensure_pytest_available()
+            except Exception as exc:  # pragma: no cover - GUI feedback
+                messagebox.showerror(
+                    "pytest",
+                    "Не удалось установить pytest автоматически.\n"
+                    f"{exc}",
+                )
+                return
+
+            try:
+                generate_pytest_file(
+                    test_cases,
+                    script_path,
+                    test_file,
+                    timeout=timeout,
+                    mode=mode,
+                    data_file=self.data_file_var.get(),
+                    comparator=comparator,
+                    encoding=encoding,
+                )
+            except Exception as exc:
+                messagebox.showerror("Ошибка", f"Не удалось создать файл тестов:\n{exc}")
+                return
+
+            cache = self._result_cache(tests_dir) if self.use_cache_var.get() else None
+            history = self._run_history(tests_dir) if self.use_history_var.get() else None
+            max_failures = self.max_failures_var.get()
+            self._start_run(
+                test_cases,
+                script_path,
+                test_file,
+                timeout=timeout,
+                mode=mode,
+                cache=cache,
+                refresh=refresh,
+                stop_on_divergence=self.stop_on_divergence_var.get(),
+                history=history,
+                max_failures=max_failures if max_failures > 0 else None,
+                reference=reference,
+                deduplicate=self.deduplicate_var.get(),
+                binary=self.binary_var.get(),
+                encoding=encoding,
+                comparator=comparator,
+                cpu_limit=cpu_limit if cpu_limit > 0 else None,
+                memory_limit=memory_limit * 1024 * 1024 if memory_limit > 0 else None,
+                adaptive_timeout=adaptive_timeout,
+                tracer=tracer,
             )
-            return
+            started = True
+        finally:
+            if tracer is not None and not started:
+                tracer.stop()
 
-        try:
-            generate_pytest_file(test_cases, script_path, test_file, timeout=timeout)
-        except Exception as exc:
-            messagebox.showerror("Ошибка", f"Не удалось создать файл тестов:\n{exc}")
+    def _start_run(
+        self,
+        test_cases: CaseSuite,
+        script_path: Path,
+        test_file: Path,
+        tracer: Optional[Tracer] = None,
+        **run_options: object,
+    ) -> None:
+        """Run the suite on a worker thread and stream results into a window.
+
+        *run_options* are passed on to :func:`iter_test_results`; binary runs
+        get the suite's stored bytes as they are.  An active *tracer* is
+        stopped and saved once the window has shown the last results.
+        """
+
+        token = CancelToken()
+        window = ResultsWindow(
+            self,
+            [],
+            test_file,
+            None,
+            total=len(test_cases),
+            on_cancel=token.cancel,
+            note=describe_stats(test_cases.stats()),
+            encoding=run_options.get("encoding"),  # type: ignore[arg-type]
+        )
+        events: queue.Queue[Tuple[str, object]] = queue.Queue()
+
+        single_pass = self.single_pass_var.get()
+        source = test_cases.iter_bytes() if run_options.get("binary") else test_cases
+
+        def worker() -> None:
+            results: List[TestResult] = []
+            try:
+                for result in iter_test_results(
+                    source, script_path, cancel=token, **run_options  # type: ignore[arg-type]
+                ):
+                    results.append(result)
+                    events.put(("result", result))
+            except Exception as exc:  # pragma: no cover - GUI feedback
+                events.put(("error", exc))
+                return
+
+            pytest_report = None
+            if not token.cancelled:
+                try:
+                    pytest_report = self._run_pytest_if_needed(
+                        test_cases,
+                        test_file,
+                        token,
+                        results if single_pass else None,
+                        encoding=run_options.get("encoding"),  # type: ignore[arg-type]
+                    )
+                except Exception as exc:  # pragma: no cover - GUI feedback
+                    events.put(("pytest_error", exc))
+            events.put(("done", pytest_report))
+
+        threading.Thread(target=worker, name="test-runner", daemon=True).start()
+        self._poll_run(window, events, token, tracer, test_file)
+
+    def _poll_run(
+        self,
+        window: "ResultsWindow",
+        events: queue.Queue[Tuple[str, object]],
+        token: CancelToken,
+        tracer: Optional[Tracer] = None,
+        test_file: Optional[Path] = None,
+    ) -> None:
+        if not window.winfo_exists():
+            token.cancel()
+            if tracer is not None:
+                tracer.stop()
             return
 
+        for _ in range(RESULTS_PER_POLL):
+            try:
+                kind, payload = events.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "result":
+                window.add_result(payload)  # type: ignore[arg-type]
+            elif kind == "pytest_error":
+                messagebox.showwarning("pytest", f"Не удалось запустить pytest: {payload}", parent=window)
+            elif kind == "error":
+                window.finish(None, cancelled=True)
+                if tracer is not None:
+                    tracer.stop()
+                messagebox.showerror("Ошибка выполнения", str(payload), parent=window)
+                return
+            else:
+                window.finish(payload, cancelled=token.cancelled)  # type: ignore[arg-type]
+                if tracer is not None and test_file is not None:
+                    # After the refresh that finish() scheduled, so it is traced too.
+                    self.after_idle(self._save_trace, window, tracer, test_file)
+                return
+
+        self.after(POLL_INTERVAL_MS, self._poll_run, window, events, token, tracer, test_file)
+
+    def _save_trace(self, window: "ResultsWindow", tracer: Tracer, test_file: Path) -> None:
+        tracer.stop()
+        path = test_file.with_suffix(".trace.json")
         try:
-            results = run_test_cases(test_cases, script_path, timeout=timeout)
-        except Exception as exc:
-            messagebox.showerror("Ошибка выполнения", str(exc))
+            tracer.write_chrome_trace(path)
+        except OSError as exc:
+            messagebox.showerror("Трассировка", f"Не удалось сохранить трассировку:\n{exc}", parent=window)
             return
-
-        pytest_data = self._run_pytest_if_needed(test_cases, test_file)
-        ResultsWindow(self, results, test_file, pytest_data)
+        TraceSummaryWindow(window, path, describe_summary(tracer.summary()))
 
     def _run_pytest_if_needed(
-        self, test_cases: Sequence[TestCase], test_file: Path
-    ) -> Optional[Tuple[int, str]]:
+        self,
+        test_cases: Sequence[TestCase],
+        test_file: Path,
+        token: CancelToken,
+        recorded: Optional[Sequence[TestResult]] = None,
+        encoding: Optional[str] = None,
+    ) -> Optional[PytestReport]:
+        """Run pytest on *test_file*; with *recorded* it replays those results.
+
+        pytest runs in this process, so later runs reuse the modules it has
+        already imported.
+        """
+
         if not any(case.expected_output for case in test_cases):
             return None
 
-        try:
-            completed = subprocess.run(
-                [sys.executable, "-m", "pytest", str(test_file)],
-                capture_output=True,
-                text=True,
-            )
-        except Exception as exc:  # pragma: no cover - GUI feedback
-            messagebox.showwarning("pytest", f"Не удалось запустить pytest: {exc}")
+        with span("pytest", recorded=recorded is not None):
+            recorded_results = None
+            if recorded is not None:
+                recorded_results = write_recorded_results(recorded, test_file, encoding)
+            report = run_pytest(test_file, recorded_results=recorded_results, cancel=token)
+        if token.cancelled:
             return None
+        return report
+
+
+def _spilled_preview(path: str, fallback: str, encoding: str = "utf-8") -> str:
+    """Show the beginning and the end of a spilled output file via ``mmap``."""
+
+    try:
+        with open(path, "rb") as handle:
+            size = os.fstat(handle.fileno()).st_size
+            if not size:
+                return fallback
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                head = data[:SPILL_PREVIEW_HEAD].decode(encoding, "replace")
+                tail = ""
+                if size > SPILL_PREVIEW_HEAD + SPILL_PREVIEW_TAIL:
+                    tail = data[size - SPILL_PREVIEW_TAIL :].decode(encoding, "replace")
+    except (OSError, ValueError):
+        return fallback
+    lines = [f"[полный вывод: {path}, {size} байт]", head.rstrip()]
+    if tail:
+        skipped = size - SPILL_PREVIEW_HEAD - SPILL_PREVIEW_TAIL
+        lines += [f"… пропущено {skipped} байт …", tail.rstrip()]
+    return "\n".join(lines)
+
+
+def _format_optional(value: object, template: str) -> str:
+    return "—" if value is None else template.format(value)
+
+
+def _numeric_or_lowest(value: Optional[float]) -> float:
+    return float("-inf") if value is None else value
+
+
+def _finite_or_highest(value: float) -> float:
+    # NaN (a case that never ran) would break the total order the sort needs.
+    return value if math.isfinite(value) else float("inf")
+
+
+class _Descending:
+    """Sort key wrapper that reverses the order of the wrapped key."""
+
+    __slots__ = ("key",)
+
+    def __init__(self, key: object) -> None:
+        self.key = key
+
+    def __lt__(self, other: "_Descending") -> bool:
+        return other.key < self.key  # type: ignore[operator]
+
 
-        output = completed.stdout + "\n" + completed.stderr
-        return completed.returncode, output
+_STATUS_FILTERS: dict[str, Optional[frozenset[str]]] = {
+    "Все": None,
+    "Ошибки и несовпадения": frozenset({"failed", "error", MEMORY_LIMIT_STATUS}),
+    "Не совпадает": frozenset({"failed"}),
+    "Ошибка": frozenset({"error"}),
+    "Лимит памяти": frozenset({MEMORY_LIMIT_STATUS}),
+    "Совпадает": frozenset({"passed"}),
+    "Выполнено": frozenset({"executed"}),
+}
+
+
+_SORT_KEYS: dict[str, Callable[[TestResult], object]] = {
+    "#0": lambda result: result.case.index,
+    "label": lambda result: result.case.label,
+    "status": lambda result: result.status,
+    "time": lambda result: _finite_or_highest(result.elapsed),
+    "speedup": lambda result: _numeric_or_lowest(result.speedup),
+    "user": lambda result: _numeric_or_lowest(result.user_time),
+    "system": lambda result: _numeric_or_lowest(result.system_time),
+    "rss": lambda result: _numeric_or_lowest(result.max_rss_kib),
+    "vcsw": lambda result: _numeric_or_lowest(result.voluntary_switches),
+    "ivcsw": lambda result: _numeric_or_lowest(result.involuntary_switches),
+}
 
 
 class ResultsWindow(tk.Toplevel):
@@ -326,49 +996,394 @@ class ResultsWindow(tk.Toplevel):
         master: tk.Tk,
         results: Sequence[TestResult],
         test_file: Path,
-        pytest_data: Optional[Tuple[int, str]],
+        pytest_report: Optional[PytestReport],
+        *,
+        total: Optional[int] = None,
+        on_cancel: Optional[Callable[[], None]] = None,
+        note: Optional[str] = None,
+        encoding: Optional[str] = None,
     ) -> None:
+        """Show *results*; with *on_cancel* the window stays live.
+
+        A live window expects the remaining results through :meth:`add_result`
+        and is completed by :meth:`finish`.  Until then it shows the progress
+        towards *total* cases, an ETA and a Cancel button bound to *on_cancel*.
+        Texts of binary runs are decoded with *encoding* when they are shown.
+        """
+
         super().__init__(master)
         self.title("Результаты тестирования")
         self.geometry("960x640")
 
-        self._results = list(results)
-        self._pytest_data = pytest_data
+        # All results in the current sort order and, when a filter is set,
+        # the matching subset; only ``_page_size`` of them are in the tree.
+        self._results: List[TestResult] = []
+        self._sort_keys: List[object] = []
+        self._visible: List[TestResult] = self._results
+        self._visible_keys: List[object] = self._sort_keys
+        self._row_ids: List[str] = []
+        self._offset = 0
+        self._page_size = TABLE_PAGE_ROWS
+        self._selected: Optional[TestResult] = None
+        self._status_filter: Optional[frozenset[str]] = None
+        self._search = ""
+        self._refresh_job: Optional[str] = None
+        self._search_job: Optional[str] = None
+        self._sort_column = "#0"
+        self._sort_descending = False
+        self._totals = UsageTotals()
+        self._pytest_report = pytest_report
+        self._pytest_outcomes: Dict[int, PytestOutcome] = {}
+        self._total = total if total is not None else len(results)
+        self._on_cancel = on_cancel
+        self._encoding = encoding or text_encoding()
+        self._started = time.perf_counter()
+        self._finished = False
 
         container = ttk.Frame(self, padding=12)
         container.grid(row=0, column=0, sticky="nsew")
         self.columnconfigure(0, weight=1)
         self.rowconfigure(0, weight=1)
         container.columnconfigure(0, weight=1)
-        container.rowconfigure(1, weight=1)
+        container.rowconfigure(2, weight=1)
+        self._container = container
 
-        ttk.Label(container, text=f"Создан файл: {test_file}").grid(row=0, column=0, sticky="w")
+        header = f"Создан файл: {test_file}"
+        if note:
+            header += f" · {note}"
+        ttk.Label(container, text=header).grid(row=0, column=0, sticky="w")
 
+        self._build_progress(container)
         self._build_table(container)
         self._build_details(container)
-        if pytest_data is not None:
-            self._build_pytest(container)
+        for result in results:
+            self.add_result(result)
+
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        if on_cancel is None:
+            self.finish(pytest_report)
+
+    def add_result(self, result: TestResult) -> None:
+        """Add *result* to the table, keeping the current sort order."""
+
+        sort_key = self._row_key(result)
+        position = bisect.bisect(self._sort_keys, sort_key)
+        self._sort_keys.insert(position, sort_key)
+        self._results.insert(position, result)
+        if self._visible is not self._results and self._matches(result):
+            position = bisect.bisect(self._visible_keys, sort_key)
+            self._visible_keys.insert(position, sort_key)
+            self._visible.insert(position, result)
+
+        self._totals.add(result)
+        self._schedule_refresh()
+        self._update_progress()
+
+    def _row_key(self, result: TestResult) -> object:
+        value = _SORT_KEYS[self._sort_column](result)
+        key = (value, result.case.index)
+        return _Descending(key) if self._sort_descending else key
+
+    def _sort_by(self, column: str) -> None:
+        if column == self._sort_column:
+            self._sort_descending = not self._sort_descending
+        else:
+            self._sort_column = column
+            self._sort_descending = False
+
+        self._results.sort(key=self._row_key)
+        self._sort_keys[:] = [self._row_key(result) for result in self._results]
+        self._apply_filter()
+
+    def _matches(self, result: TestResult) -> bool:
+        if self._status_filter is not None and result.status not in self._status_filter:
+            return False
+        return not self._search or self._search in result.case.label.casefold()
+
+    def _apply_filter(self) -> None:
+        self._search_job = None
+        self._status_filter = _STATUS_FILTERS[self.filter_var.get()]
+        self._search = self.search_var.get().strip().casefold()
+        if self._status_filter is None and not self._search:
+            self._visible, self._visible_keys = self._results, self._sort_keys
+        else:
+            rows = [
+                (result, key)
+                for result, key in zip(self._results, self._sort_keys)
+                if self._matches(result)
+            ]
+            self._visible = [result for result, _ in rows]
+            self._visible_keys = [key for _, key in rows]
+        self._offset = 0
+        self._schedule_refresh()
+
+    def _on_search_changed(self, *_args: object) -> None:
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+        self._search_job = self.after(SEARCH_DELAY_MS, self._apply_filter)
+
+    def _schedule_refresh(self) -> None:
+        if self._refresh_job is None:
+            self._refresh_job = self.after_idle(self._refresh)
+
+    def _refresh(self) -> None:
+        """Redraw the visible page; the cost depends on the page size only."""
+
+        with span("treeview", rows=self._page_size):
+            self._fill_page()
+
+    def _fill_page(self) -> None:
+        self._refresh_job = None
+        self._update_totals()
+        if self._selected is None and self._visible:
+            self._select(self._visible[0])
+
+        total = len(self._visible)
+        self._offset = max(0, min(self._offset, total - self._page_size))
+        rows = self._visible[self._offset : self._offset + self._page_size]
+        while len(self._row_ids) < len(rows):
+            self._row_ids.append(self.tree.insert("", tk.END))
+        while len(self._row_ids) > len(rows):
+            self.tree.delete(self._row_ids.pop())
+
+        selected_row = None
+        for row_id, result in zip(self._row_ids, rows):
+            self.tree.item(row_id, text=str(result.case.index), values=self._row_values(result))
+            if result is self._selected:
+                selected_row = row_id
+        if selected_row is not None:
+            self.tree.selection_set(selected_row)
+            self.tree.focus(selected_row)
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+
+        if total:
+            self.scrollbar.set(self._offset / total, (self._offset + len(rows)) / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        self.shown_var.set(f"Показано {total} из {len(self._results)}")
+
+    def _row_values(self, result: TestResult) -> Tuple[str, ...]:
+        stdout_preview = self._text(result.stdout[:STDOUT_PREVIEW_SCAN]).strip().replace("\n", " ⏎ ")
+        if len(stdout_preview) > 60:
+            stdout_preview = stdout_preview[:57] + "…"
+        return (
+            result.case.label,
+            self._translate_status(result.status)
+            + (" (кэш)" if result.cached else "")
+            + (" (повтор)" if result.deduplicated else ""),
+            self._pytest_cell(result),
+            f"{result.elapsed:.4f}",
+            _format_optional(result.speedup, "×{:.2f}"),
+            _format_optional(result.user_time, "{:.3f}"),
+            _format_optional(result.system_time, "{:.3f}"),
+            _format_optional(
+                None if result.max_rss_kib is None else result.max_rss_kib / 1024, "{:.1f}"
+            ),
+            _format_optional(result.voluntary_switches, "{}"),
+            _format_optional(result.involuntary_switches, "{}"),
+            stdout_preview,
+            result.message,
+        )
+
+    def _text(self, value: str | bytes | None) -> str:
+        return display_text(value, self._encoding)
+
+    def _pytest_cell(self, result: TestResult) -> str:
+        outcome = self._pytest_outcomes.get(result.case.index)
+        return "" if outcome is None else self._translate_pytest_outcome(outcome.outcome)
+
+    def _scroll_to(self, offset: int) -> None:
+        limit = max(0, len(self._visible) - self._page_size)
+        offset = max(0, min(offset, limit))
+        if offset != self._offset:
+            self._offset = offset
+            self._schedule_refresh()
+
+    def _on_scrollbar(self, action: str, amount: str, unit: str = "units") -> None:
+        if action == "moveto":
+            self._scroll_to(round(float(amount) * len(self._visible)))
+        else:
+            step = self._page_size if unit == "pages" else 1
+            self._scroll_to(self._offset + int(amount) * step)
+
+    def _on_wheel(self, event: tk.Event) -> str:
+        if event.num == 4 or event.delta > 0:
+            self._scroll_to(self._offset - WHEEL_ROWS)
+        else:
+            self._scroll_to(self._offset + WHEEL_ROWS)
+        return "break"
+
+    def _on_resize(self, event: tk.Event) -> None:
+        row_height = int(ttk.Style(self).lookup("Treeview", "rowheight") or DEFAULT_ROW_HEIGHT)
+        page_size = max(1, (event.height - TABLE_HEADING_HEIGHT) // row_height)
+        if page_size != self._page_size:
+            self._page_size = page_size
+            self._schedule_refresh()
+
+    def _move_selection(self, delta: int) -> str:
+        if not self._visible:
+            return "break"
+        position = self._offset
+        if self._selected is not None:
+            found = bisect.bisect_left(self._visible_keys, self._row_key(self._selected))
+            if found < len(self._visible) and self._visible[found] is self._selected:
+                position = found
+        position = max(0, min(position + delta, len(self._visible) - 1))
+        if position < self._offset:
+            self._scroll_to(position)
+        elif position >= self._offset + self._page_size:
+            self._scroll_to(position - self._page_size + 1)
+        self._select(self._visible[position])
+        self._schedule_refresh()
+        return "break"
+
+    def _select(self, result: TestResult) -> None:
+        if result is not self._selected:
+            self._selected = result
+            self._show_details(result)
+
+    def _update_totals(self) -> None:
+        totals = self._totals
+        text = (
+            f"Итого: {totals.cases} тестов, {totals.elapsed:.3f} с · "
+            f"CPU user {totals.user_time:.3f} с, sys {totals.system_time:.3f} с · "
+            f"пик RSS {totals.max_rss_kib / 1024:.1f} МиБ · "
+            f"переключения {totals.voluntary_switches}/{totals.involuntary_switches}"
+        )
+        if totals.speedup is not None:
+            text += f" · ускорение относительно эталона ×{totals.speedup:.2f}"
+        if totals.deduplicated:
+            text += f" · повторных запусков пропущено: {totals.deduplicated}"
+        self.totals_var.set(text)
+
+    def finish(self, pytest_report: Optional[PytestReport], *, cancelled: bool = False) -> None:
+        """Mark the run as complete and show the pytest report, if any."""
+
+        self._finished = True
+        self._pytest_report = pytest_report
+        self.cancel_button.configure(state="disabled")
+        if self._on_cancel is None:
+            self.cancel_button.grid_remove()
+        elapsed = time.perf_counter() - self._started
+        done = len(self._results)
+        if cancelled:
+            self.progress_var.set(f"Отменено: выполнено {done} из {self._total}")
+        elif done < self._total:
+            self.progress_var.set(
+                f"Остановлено после ошибок: выполнено {done} из {self._total} за {elapsed:.1f} с"
+            )
+        elif self._on_cancel is None:
+            self.progress_var.set(f"Выполнено {done} из {self._total}")
+        else:
+            self.progress_var.set(f"Выполнено {done} из {self._total} за {elapsed:.1f} с")
+        if pytest_report is not None:
+            self._pytest_outcomes = pytest_report.by_index()
+            self._schedule_refresh()
+            if self._selected is not None:
+                self._show_details(self._selected)
+            self._build_pytest(self._container)
+
+    def _build_progress(self, parent: ttk.Frame) -> None:
+        frame = ttk.Frame(parent)
+        frame.grid(row=1, column=0, sticky="ew", pady=(8, 8))
+        frame.columnconfigure(0, weight=1)
+
+        self.progress = ttk.Progressbar(frame, mode="determinate", maximum=max(1, self._total))
+        self.progress.grid(row=0, column=0, sticky="ew")
+        self.progress_var = tk.StringVar()
+        ttk.Label(frame, textvariable=self.progress_var, width=40).grid(row=0, column=1, padx=(12, 0))
+        self.cancel_button = ttk.Button(frame, text="Отмена", command=self._cancel)
+        self.cancel_button.grid(row=0, column=2, padx=(12, 0))
+        self._update_progress()
+
+    def _update_progress(self) -> None:
+        done = len(self._results)
+        self.progress.configure(value=done)
+        if self._finished:
+            return
+        text = f"Выполнено {done} из {self._total}"
+        if 0 < done < self._total:
+            elapsed = time.perf_counter() - self._started
+            remaining = elapsed / done * (self._total - done)
+            text += f" · осталось ~{remaining:.0f} с"
+        self.progress_var.set(text)
+
+    def _cancel(self) -> None:
+        if self._on_cancel is not None and not self._finished:
+            self.cancel_button.configure(state="disabled")
+            self.progress_var.set("Отмена…")
+            self._on_cancel()
+
+    def _on_close(self) -> None:
+        self._cancel()
+        for job in (self._refresh_job, self._search_job):
+            if job is not None:
+                self.after_cancel(job)
+        self.destroy()
 
     def _build_table(self, parent: ttk.Frame) -> None:
         frame = ttk.LabelFrame(parent, text="Сводка", padding=10)
-        frame.grid(row=1, column=0, sticky="nsew")
+        frame.grid(row=2, column=0, sticky="nsew")
         frame.columnconfigure(0, weight=1)
-        frame.rowconfigure(0, weight=1)
+        frame.rowconfigure(1, weight=1)
 
-        columns = ("label", "status", "time", "stdout", "message")
+        toolbar = ttk.Frame(frame)
+        toolbar.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(0, 8))
+        toolbar.columnconfigure(3, weight=1)
+        ttk.Label(toolbar, text="Показать:").grid(row=0, column=0)
+        self.filter_var = tk.StringVar(value=next(iter(_STATUS_FILTERS)))
+        filter_box = ttk.Combobox(
+            toolbar,
+            textvariable=self.filter_var,
+            values=list(_STATUS_FILTERS),
+            state="readonly",
+            width=24,
+        )
+        filter_box.grid(row=0, column=1, padx=(4, 12))
+        filter_box.bind("<<ComboboxSelected>>", lambda _event: self._apply_filter())
+        ttk.Label(toolbar, text="Поиск по названию:").grid(row=0, column=2)
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", self._on_search_changed)
+        ttk.Entry(toolbar, textvariable=self.search_var).grid(row=0, column=3, sticky="ew", padx=(4, 12))
+        self.shown_var = tk.StringVar()
+        ttk.Label(toolbar, textvariable=self.shown_var).grid(row=0, column=4)
+
+        columns = (
+            "label",
+            "status",
+            "pytest",
+            "time",
+            "speedup",
+            "user",
+            "system",
+            "rss",
+            "vcsw",
+            "ivcsw",
+            "stdout",
+            "message",
+        )
         self.tree: ttk.Treeview = ttk.Treeview(
             frame,
             columns=columns,
             show="tree headings",
-            height=12,
+            height=TABLE_PAGE_ROWS,
+            selectmode="browse",
         )
-        self.tree.heading("#0", text="№")
+        self.tree.heading("#0", text="№", command=lambda: self._sort_by("#0"))
         self.tree.column("#0", width=50, anchor=tk.CENTER)
 
         headers = {
             "label": "Название",
             "status": "Статус",
+            "pytest": "pytest",
             "time": "Время (с)",
+            "speedup": "Ускорение",
+            "user": "CPU user (с)",
+            "system": "CPU sys (с)",
+            "rss": "Пик RSS (МиБ)",
+            "vcsw": "Добров. перекл.",
+            "ivcsw": "Принуд. перекл.",
             "stdout": "Вывод",
             "message": "Комментарий",
         }
@@ -376,50 +1391,55 @@ class ResultsWindow(tk.Toplevel):
         widths = {
             "label": 220,
             "status": 120,
+            "pytest": 90,
             "time": 100,
+            "speedup": 90,
+            "user": 100,
+            "system": 100,
+            "rss": 110,
+            "vcsw": 110,
+            "ivcsw": 110,
             "stdout": 260,
             "message": 260,
         }
 
         for column in columns:
-            self.tree.heading(column, text=headers[column])
+            heading_options: dict[str, object] = {"text": headers[column]}
+            if column in _SORT_KEYS:
+                heading_options["command"] = lambda column=column: self._sort_by(column)
+            self.tree.heading(column, **heading_options)
             self.tree.column(column, width=widths[column], anchor=tk.W)
 
-        y_scroll = ttk.Scrollbar(frame, orient="vertical", command=self.tree.yview)
-        y_scroll.grid(row=0, column=1, sticky="ns")
+        # The tree only ever holds the visible page, so the vertical
+        # scrollbar is driven by the position in the result list instead.
+        self.scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.grid(row=1, column=1, sticky="ns")
         x_scroll = ttk.Scrollbar(frame, orient="horizontal", command=self.tree.xview)
-        x_scroll.grid(row=1, column=0, sticky="ew")
-        self.tree.configure(yscrollcommand=y_scroll.set, xscrollcommand=x_scroll.set)
-        self.tree.grid(row=0, column=0, sticky="nsew")
+        x_scroll.grid(row=2, column=0, sticky="ew")
+        self.tree.configure(xscrollcommand=x_scroll.set)
+        self.tree.grid(row=1, column=0, sticky="nsew")
 
-        for result in self._results:
-            stdout_preview = result.stdout.strip().replace("\n", " ⏎ ")
-            if len(stdout_preview) > 60:
-                stdout_preview = stdout_preview[:57] + "…"
-            self.tree.insert(
-                "",
-                "end",
-                text=str(result.case.index),
-                values=(
-                    result.case.label,
-                    self._translate_status(result.status),
-                    f"{result.elapsed:.4f}",
-                    stdout_preview,
-                    result.message,
-                ),
-            )
+        self.totals_var = tk.StringVar()
+        ttk.Label(frame, textvariable=self.totals_var).grid(row=3, column=0, sticky="w", pady=(8, 0))
 
         self.tree.bind("<<TreeviewSelect>>", self._on_select)
-
-        if self._results:
-            first_item = self.tree.get_children()[0]
-            self.tree.selection_set(first_item)
-            self.tree.focus(first_item)
-            self._on_select()
+        self.tree.bind("<Configure>", self._on_resize)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(sequence, self._on_wheel)
+        moves: dict[str, Callable[[], int]] = {
+            "<Up>": lambda: -1,
+            "<Down>": lambda: 1,
+            "<Prior>": lambda: -self._page_size,
+            "<Next>": lambda: self._page_size,
+            "<Home>": lambda: -len(self._visible),
+            "<End>": lambda: len(self._visible),
+        }
+        for sequence, delta in moves.items():
+            self.tree.bind(sequence, lambda _event, delta=delta: self._move_selection(delta()))
 
     def _build_details(self, parent: ttk.Frame) -> None:
         frame = ttk.LabelFrame(parent, text="Детали", padding=10)
-        frame.grid(row=2, column=0, sticky="nsew", pady=(12, 0))
+        frame.grid(row=3, column=0, sticky="nsew", pady=(12, 0))
         frame.columnconfigure(0, weight=1)
         frame.rowconfigure(0, weight=1)
 
@@ -436,7 +1456,7 @@ class ResultsWindow(tk.Toplevel):
 
     def _build_pytest(self, parent: ttk.Frame) -> None:
         frame = ttk.LabelFrame(parent, text="pytest", padding=10)
-        frame.grid(row=3, column=0, sticky="nsew", pady=(12, 0))
+        frame.grid(row=4, column=0, sticky="nsew", pady=(12, 0))
         frame.columnconfigure(0, weight=1)
         frame.rowconfigure(0, weight=1)
 
@@ -449,41 +1469,99 @@ class ResultsWindow(tk.Toplevel):
         x_scroll.grid(row=1, column=0, sticky="ew")
         text.configure(yscrollcommand=y_scroll.set, xscrollcommand=x_scroll.set)
 
-        assert self._pytest_data is not None
-        exit_code, output = self._pytest_data
-        text.insert(tk.END, f"Код выхода: {exit_code}\n\n{output.strip()}\n")
+        report = self._pytest_report
+        assert report is not None
+        counts = ", ".join(
+            f"{self._translate_pytest_outcome(outcome)}: {count}"
+            for outcome, count in sorted(report.counts().items())
+        )
+        lines = [f"Код выхода: {report.exit_code}", f"Тестов: {len(report.outcomes)} ({counts or '—'})"]
+        for outcome in report.outcomes:
+            if outcome.failed:
+                number = "—" if outcome.index is None else str(outcome.index)
+                lines.append(f"№{number} {self._translate_pytest_outcome(outcome.outcome)}: {outcome.message}")
+        lines += ["", report.output.strip()]
+        text.insert(tk.END, "\n".join(lines) + "\n")
         text.configure(state="disabled")
 
     def _on_select(self, _event: Optional[tk.Event] = None) -> None:
         selection = self.tree.selection()
         if not selection:
             return
+        row = self.tree.index(selection[0])
+        if self._offset + row < len(self._visible):
+            self._select(self._visible[self._offset + row])
 
-        index = self.tree.index(selection[0])
-        result = self._results[index]
+    def _show_details(self, result: TestResult) -> None:
         lines = [
             f"Тест №{result.case.index}: {result.case.label}",
             f"Статус: {self._translate_status(result.status)}",
             f"Время выполнения: {result.elapsed:.4f} с",
+        ]
+        if result.startup is not None:
+            lines.append(f"  из них запуск: {result.startup:.4f} с")
+        if result.reference_elapsed is not None:
+            lines.append(f"Эталонное решение: {result.reference_elapsed:.4f} с")
+            if result.speedup is not None:
+                lines.append(f"  ускорение: ×{result.speedup:.2f}")
+        if result.user_time is not None and result.system_time is not None:
+            lines.append(f"CPU: user {result.user_time:.4f} с, sys {result.system_time:.4f} с")
+        if result.max_rss_kib is not None:
+            line = f"Пик памяти (RSS): {result.max_rss_kib / 1024:.1f} МиБ"
+            if result.status == MEMORY_LIMIT_STATUS:
+                line += " — лимит превышен"
+            lines.append(line)
+        if result.voluntary_switches is not None:
+            lines.append(
+                "Переключения контекста: "
+                f"добровольные {result.voluntary_switches}, "
+                f"принудительные {result.involuntary_switches}"
+            )
+        if result.cached:
+            lines.append("Результат взят из кэша")
+        if result.deduplicated:
+            lines.append("Результат взят у теста с такими же входными данными")
+        pytest_outcome = self._pytest_outcomes.get(result.case.index)
+        if pytest_outcome is not None:
+            lines.append(
+                f"pytest: {self._translate_pytest_outcome(pytest_outcome.outcome)} "
+                f"за {pytest_outcome.duration:.4f} с"
+            )
+        if result.divergence_line is not None:
+            lines.append(
+                f"Расхождение с ожидаемым: строка {result.divergence_line}, "
+                f"{'байт' if isinstance(result.stdout, bytes) else 'символ'} {result.divergence_offset}"
+            )
+        if result.stdout_file is not None or result.stderr_file is not None:
+            lines.append("Вывод слишком велик и сохранён во временный файл")
+        stdout = self._text(result.stdout).rstrip() or "<пусто>"
+        if result.stdout_file is not None:
+            stdout = _spilled_preview(result.stdout_file, stdout, self._encoding)
+        stderr = self._text(result.stderr).rstrip() or "<пусто>"
+        if result.stderr_file is not None:
+            stderr = _spilled_preview(result.stderr_file, stderr, self._encoding)
+        lines += [
             "",
             "Входные данные:",
-            result.case.input_data.rstrip() or "<пусто>",
+            self._text(result.case.input_data).rstrip() or "<пусто>",
             "",
             "Вывод скрипта:",
-            result.stdout.rstrip() or "<пусто>",
+            stdout,
             "",
             "Стандартная ошибка:",
-            result.stderr.rstrip() or "<пусто>",
+            stderr,
             "",
             "Комментарий:",
             result.message,
         ]
+        if pytest_outcome is not None and pytest_outcome.message:
+            lines += ["", "Сообщение pytest:", pytest_outcome.message]
         if result.case.expected_output:
             lines.extend(
                 [
                     "",
                     "Ожидаемый вывод:",
-                    result.case.expected_output.rstrip(),
+                    self._text(result.case.expected_output).rstrip(),
                 ]
             )
 
@@ -498,10 +1576,227 @@ class ResultsWindow(tk.Toplevel):
             "passed": "Совпадает",
             "failed": "Не совпадает",
             "error": "Ошибка",
+            MEMORY_LIMIT_STATUS: "Лимит памяти",
             "executed": "Выполнено",
         }
         return mapping.get(status, status)
 
+    @staticmethod
+    def _translate_pytest_outcome(outcome: str) -> str:
+        mapping = {
+            "passed": "пройден",
+            "failed": "провален",
+            "error": "ошибка",
+            "skipped": "пропущен",
+        }
+        return mapping.get(outcome, outcome)
+
+
+class TraceSummaryWindow(tk.Toplevel):
+    """Shows where a traced run spent its time and where the trace was saved."""
+
+    def __init__(self, master: tk.Misc, path: Path, lines: Sequence[str]) -> None:
+        super().__init__(master)
+        self.title("Трассировка")
+        self.geometry("720x360")
+
+        container = ttk.Frame(self, padding=12)
+        container.grid(row=0, column=0, sticky="nsew")
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+        container.columnconfigure(0, weight=1)
+        container.rowconfigure(1, weight=1)
+
+        ttk.Label(
+            container, text=f"Сохранена в {path} (откройте в ui.perfetto.dev или chrome://tracing)"
+        ).grid(row=0, column=0, sticky="w")
+        text = tk.Text(container, wrap=tk.NONE, height=12, font=("Fira Code", 11))
+        text.grid(row=1, column=0, sticky="nsew", pady=(8, 0))
+        text.insert("1.0", "\n".join(lines))
+        text.configure(state="disabled")
+
+
+class BenchmarkWindow(tk.Toplevel):
+    """Runs a benchmark in the background and compares it with a baseline."""
+
+    def __init__(
+        self,
+        master: tk.Tk,
+        test_cases: Sequence[TestCase],
+        script_path: Path,
+        *,
+        repeat: int,
+        warmup: int,
+        timeout: Optional[float],
+        mode: str,
+    ) -> None:
+        super().__init__(master)
+        self.title("Бенчмарк")
+        self.geometry("960x480")
+
+        self._benchmarks: List[CaseBenchmark] = []
+        self._token = CancelToken()
+        self._events: queue.Queue[Tuple[str, object]] = queue.Queue()
+
+        container = ttk.Frame(self, padding=12)
+        container.grid(row=0, column=0, sticky="nsew")
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+        container.columnconfigure(0, weight=1)
+        container.rowconfigure(1, weight=1)
+
+        self.status_var = tk.StringVar(value=f"Прогрев: {warmup}, повторов: {repeat}")
+        ttk.Label(container, textvariable=self.status_var).grid(row=0, column=0, sticky="w")
+
+        columns = ("label", "status", "min", "median", "p95", "stddev", "base", "change")
+        headers = {
+            "label": "Название",
+            "status": "Статус",
+            "min": "Мин (с)",
+            "median": "Медиана (с)",
+            "p95": "p95 (с)",
+            "stddev": "σ (с)",
+            "base": "Эталон (с)",
+            "change": "Изменение",
+        }
+        self.tree = ttk.Treeview(container, columns=columns, show="tree headings", height=14)
+        self.tree.heading("#0", text="№")
+        self.tree.column("#0", width=50, anchor=tk.CENTER)
+        for column in columns:
+            self.tree.heading(column, text=headers[column])
+            self.tree.column(column, width=220 if column == "label" else 100, anchor=tk.W)
+        self.tree.tag_configure("regressed", foreground="#b00020")
+        self.tree.grid(row=1, column=0, sticky="nsew", pady=(8, 0))
+        y_scroll = ttk.Scrollbar(container, orient="vertical", command=self.tree.yview)
+        y_scroll.grid(row=1, column=1, sticky="ns", pady=(8, 0))
+        self.tree.configure(yscrollcommand=y_scroll.set)
+
+        buttons = ttk.Frame(container)
+        buttons.grid(row=2, column=0, sticky="e", pady=(12, 0))
+        self.save_button = ttk.Button(
+            buttons, text="Сохранить как эталон…", command=self._save, state="disabled"
+        )
+        self.save_button.grid(row=0, column=0)
+        self.compare_button = ttk.Button(
+            buttons, text="Сравнить с эталоном…", command=self._compare, state="disabled"
+        )
+        self.compare_button.grid(row=0, column=1, padx=(12, 0))
+        self.cancel_button = ttk.Button(buttons, text="Отмена", command=self._token.cancel)
+        self.cancel_button.grid(row=0, column=2, padx=(12, 0))
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+
+        def worker() -> None:
+            try:
+                benchmarks = benchmark_cases(
+                    test_cases,
+                    script_path,
+                    repeat=repeat,
+                    warmup=warmup,
+                    timeout=timeout,
+                    mode=mode,
+                    cancel=self._token,
+                    on_round=lambda done, total: self._events.put(("round", (done, total))),
+                )
+            except Exception as exc:  # pragma: no cover - GUI feedback
+                self._events.put(("error", exc))
+                return
+            self._events.put(("done", benchmarks))
+
+        threading.Thread(target=worker, name="benchmark", daemon=True).start()
+        self._poll()
+
+    def _poll(self) -> None:
+        if not self.winfo_exists():
+            return
+        while True:
+            try:
+                kind, payload = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "round":
+                done, total = payload  # type: ignore[misc]
+                self.status_var.set(f"Выполнено прогонов: {done} из {total}")
+            elif kind == "error":
+                self.cancel_button.configure(state="disabled")
+                messagebox.showerror("Бенчмарк", str(payload), parent=self)
+                return
+            else:
+                self._show(payload, [])  # type: ignore[arg-type]
+                return
+        self.after(POLL_INTERVAL_MS, self._poll)
+
+    def _show(self, benchmarks: List[CaseBenchmark], comparisons: List[BaselineComparison]) -> None:
+        self._benchmarks = benchmarks
+        self.cancel_button.configure(state="disabled")
+        state = "normal" if benchmarks and benchmarks[0].samples else "disabled"
+        self.save_button.configure(state=state)
+        self.compare_button.configure(state=state)
+        if self._token.cancelled:
+            self.status_var.set("Бенчмарк отменён")
+        elif comparisons:
+            regressions = sum(comparison.regressed for comparison in comparisons)
+            self.status_var.set(f"Сравнение с эталоном: заметно медленнее {regressions} тест(ов)")
+        else:
+            self.status_var.set(f"Готово: {len(benchmarks[0].samples) if benchmarks else 0} замеров на тест")
+
+        by_index = {comparison.benchmark.case.index: comparison for comparison in comparisons}
+        self.tree.delete(*self.tree.get_children())
+        for item in benchmarks:
+            comparison = by_index.get(item.case.index)
+            base = change = ""
+            tags: Tuple[str, ...] = ()
+            if comparison is not None and comparison.baseline is not None:
+                base = f"{comparison.baseline['median']:.4f}"
+                change = f"{(comparison.ratio - 1) * 100:+.1f}%"
+                if comparison.regressed:
+                    tags = ("regressed",)
+                    change += " ▲"
+            self.tree.insert(
+                "",
+                "end",
+                text=str(item.case.index),
+                values=(
+                    item.case.label,
+                    ResultsWindow._translate_status(item.status),
+                    f"{item.minimum:.4f}",
+                    f"{item.median:.4f}",
+                    f"{item.p95:.4f}",
+                    f"{item.stddev:.4f}",
+                    base,
+                    change,
+                ),
+                tags=tags,
+            )
+
+    def _save(self) -> None:
+        path = filedialog.asksaveasfilename(
+            parent=self,
+            title="Сохранить эталон",
+            defaultextension=".json",
+            filetypes=[("JSON", "*.json")],
+        )
+        if path:
+            save_baseline(self._benchmarks, Path(path))
+
+    def _compare(self) -> None:
+        path = filedialog.askopenfilename(
+            parent=self,
+            title="Файл эталона",
+            filetypes=[("JSON", "*.json"), ("Все файлы", "*.*")],
+        )
+        if not path:
+            return
+        try:
+            baseline = load_baseline(Path(path))
+        except (OSError, ValueError, KeyError) as exc:
+            messagebox.showerror("Эталон", f"Не удалось прочитать эталон:\n{exc}", parent=self)
+            return
+        self._show(self._benchmarks, compare_to_baseline(self._benchmarks, baseline))
+
+    def _on_close(self) -> None:
+        self._token.cancel()
+        self.destroy()
+
 
 def main() -> None:
     app = Application()
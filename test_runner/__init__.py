@@ -1,14 +1,79 @@
-"""Helper utilities for building and executing generated tests."""
-
-from .cases import TestCase, parse_cases
-from .executor import TestResult, run_test_cases
-from .generator import ensure_pytest_available, generate_pytest_file
-
-__all__ = [
-    "TestCase",
-    "parse_cases",
-    "TestResult",
-    "run_test_cases",
-    "ensure_pytest_available",
-    "generate_pytest_file",
-]
+"""Helper utilities for building and executing generated tests.
+
+Names are imported from their submodules on first access, so that
+``python -m test_runner`` and other light users do not pay for asyncio,
+sqlite3 or pytest support they never touch.
+"""
+
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ._text import display_text
+    from .aio import aiter_test_results, run_test_cases_async
+    from .cache import ResultCache
+    from .cases import ParseError, TestCase, case_key, iter_cases, parse_cases
+    from .compare import Comparator, get_comparator
+    from .distributed import Coordinator, run_worker
+    from .executor import CancelToken, TestResult, iter_test_results, run_test_cases
+    from .forkserver import ForkServer
+    from .generate import SuiteSpec, write_suite
+    from .generator import ensure_pytest_available, generate_pytest_file
+    from .history import AdaptiveTimeout, RunHistory
+    from .pytest_session import PytestOutcome, PytestReport, run_pytest
+    from .suite import CaseSuite
+    from .tracing import Tracer, span, traced
+    from .usage import UsageTotals, suite_totals
+
+_EXPORTS = {
+    "TestCase": "cases",
+    "ParseError": "cases",
+    "iter_cases": "cases",
+    "parse_cases": "cases",
+    "case_key": "cases",
+    "Comparator": "compare",
+    "get_comparator": "compare",
+    "TestResult": "executor",
+    "run_test_cases": "executor",
+    "iter_test_results": "executor",
+    "CancelToken": "executor",
+    "Coordinator": "distributed",
+    "run_worker": "distributed",
+    "run_test_cases_async": "aio",
+    "aiter_test_results": "aio",
+    "ForkServer": "forkserver",
+    "ResultCache": "cache",
+    "RunHistory": "history",
+    "AdaptiveTimeout": "history",
+    "SuiteSpec": "generate",
+    "write_suite": "generate",
+    "ensure_pytest_available": "generator",
+    "generate_pytest_file": "generator",
+    "run_pytest": "pytest_session",
+    "PytestReport": "pytest_session",
+    "PytestOutcome": "pytest_session",
+    "CaseSuite": "suite",
+    "Tracer": "tracing",
+    "span": "tracing",
+    "traced": "tracing",
+    "UsageTotals": "usage",
+    "suite_totals": "usage",
+    "display_text": "_text",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> object:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
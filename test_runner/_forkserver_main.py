@@ -0,0 +1,406 @@
+"""Warm interpreter process used by :mod:`test_runner.forkserver`.
+
+The module is executed as a standalone script (it must not import anything
+from :mod:`test_runner`) with the path of the script under test as its only
+argument.  It imports the modules the target depends on once and then serves
+requests from its parent: every request forks a child that runs the target as
+``__main__`` with the provided stdin, while the server waits for the child,
+enforces the timeout and the output kill limit (optionally comparing stdout
+with the expected answer while it is written) and sends back the captured
+output.  Output files larger than the in-memory buffer are left in the spill
+directory named by the request and only their path and prefix are sent.
+Every child leads its own process group and applies the request's resource
+limits to itself; the server kills the whole group when the child is done
+or stopped, and on ``SIGTERM`` kills the running child's group and exits.
+
+Messages are pickled dictionaries prefixed with their length as a 4-byte
+big-endian integer.
+"""
+
+from __future__ import annotations
+
+import ast
+import atexit
+import importlib
+import importlib.util
+import os
+import pickle
+import select
+import signal
+import struct
+import sys
+import tempfile
+import time
+import traceback
+import types
+
+_HEADER = struct.Struct(">I")
+# How often output files are checked while a limit or a matcher watches them.
+_WATCH_POLL = 0.005
+_READ_CHUNK = 64 * 1024
+_COMPARE_MODULE = "_test_runner_compare"
+_TERMINATE = {signal.SIGTERM}
+
+try:
+    import resource
+except ModuleNotFoundError:  # pragma: no cover - the server needs fork anyway
+    resource = None
+
+# Process group of the child being served, killed on SIGTERM.
+_current_child: int | None = None
+
+
+def _read_exact(fd: int, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = os.read(fd, size)
+        if not chunk:
+            raise EOFError
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _receive(fd: int) -> dict:
+    (size,) = _HEADER.unpack(_read_exact(fd, _HEADER.size))
+    return pickle.loads(_read_exact(fd, size))
+
+
+def _send(fd: int, message: dict) -> None:
+    payload = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    view = memoryview(_HEADER.pack(len(payload)) + payload)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def _imported_modules(source: str) -> list[str]:
+    names: list[str] = []
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names.append(node.module)
+    return names
+
+
+def _preload(source: str) -> None:
+    for name in _imported_modules(source):
+        try:
+            importlib.import_module(name)
+        except BaseException:  # noqa: BLE001 - the child reports real failures
+            continue
+
+
+def _exit_code(exc: SystemExit) -> int:
+    code = exc.code
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+def _kill_group(pid: int) -> None:
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _terminate(signum: int, frame: object) -> None:
+    if _current_child is not None:
+        _kill_group(_current_child)
+    os._exit(1)
+
+
+def _run_child(
+    script: str,
+    code: types.CodeType | SyntaxError,
+    stdin_fd: int,
+    stdout_fd: int,
+    stderr_fd: int,
+    ready_fd: int,
+    rlimits: list,
+) -> None:
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, _TERMINATE)
+    os.setpgid(0, 0)
+    for kind, soft, hard in rlimits:
+        resource.setrlimit(kind, (soft, hard))
+    os.dup2(stdin_fd, 0)
+    os.dup2(stdout_fd, 1)
+    os.dup2(stderr_fd, 2)
+    os.write(ready_fd, struct.pack(">d", time.perf_counter()))
+    os.close(ready_fd)
+
+    main = types.ModuleType("__main__")
+    main.__file__ = script
+    main.__builtins__ = __builtins__
+    sys.modules["__main__"] = main
+    sys.argv = [script]
+
+    status = 0
+    try:
+        if isinstance(code, SyntaxError):
+            raise code
+        exec(code, main.__dict__)
+    except SystemExit as exc:
+        status = _exit_code(exc)
+    except BaseException as exc:  # noqa: BLE001 - mirror the interpreter
+        tb = exc.__traceback__.tb_next if exc is not code else None
+        traceback.print_exception(type(exc), exc, tb)
+        status = 1
+
+    try:
+        atexit._run_exitfuncs()
+        sys.stdout.flush()
+        sys.stderr.flush()
+    except BaseException:  # noqa: BLE001 - the exit status is already decided
+        pass
+    os._exit(status)
+
+
+def _usage(usage: object) -> tuple:
+    return (
+        usage.ru_utime,
+        usage.ru_stime,
+        usage.ru_maxrss,
+        usage.ru_nvcsw,
+        usage.ru_nivcsw,
+    )
+
+
+def _load_compare() -> types.ModuleType:
+    """Load ``test_runner/compare.py`` without importing the package."""
+
+    module = sys.modules.get(_COMPARE_MODULE)
+    if module is None:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "compare.py")
+        spec = importlib.util.spec_from_file_location(_COMPARE_MODULE, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[_COMPARE_MODULE] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+class _Watch:
+    """Checks a running child's output files against the request's limits.
+
+    ``reason`` is set to ``"overflow"`` or ``"diverged"`` when :meth:`check`
+    decides that the child has to be killed.
+    """
+
+    def __init__(self, stdout_fd: int, stderr_fd: int, request: dict) -> None:
+        self.outputs = (stdout_fd, stderr_fd)
+        self.kill_limit = request["kill"]
+        self.matcher = None
+        if request.get("expected") is not None:
+            compare = _load_compare()
+            comparator = compare.get_comparator(request.get("comparator"))
+            self.matcher = comparator.matcher(request["expected"], request["encoding"])
+        self.reason: str | None = None
+        self._read = 0
+
+    @property
+    def active(self) -> bool:
+        return self.kill_limit is not None or self.matcher is not None
+
+    def check(self) -> bool:
+        if self.kill_limit is not None and any(
+            os.fstat(fd).st_size > self.kill_limit for fd in self.outputs
+        ):
+            self.reason = "overflow"
+        elif self.matcher is not None and not self.drain():
+            self.reason = "diverged"
+        return self.reason is not None
+
+    def drain(self) -> bool:
+        """Feed the stdout written so far to the matcher."""
+
+        while chunk := os.pread(self.outputs[0], _READ_CHUNK, self._read):
+            self._read += len(chunk)
+            if not self.matcher.feed(chunk):
+                return False
+        return True
+
+    def outcome(self, stopped: bool) -> tuple | None:
+        if self.matcher is None:
+            return None
+        if self.reason is None:
+            self.drain()
+        result = self.matcher.finish()
+        return result.matched, result.offset, result.line, stopped
+
+
+def _wait(pid: int, timeout: float | None, watch: _Watch) -> tuple[int | None, bool, tuple | None]:
+    """Reap *pid*, killing it once *timeout* expires or *watch* objects.
+
+    Returns the exit code (``None`` after a timeout), whether the timeout
+    fired and the child's rusage values.
+    """
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    pidfd = os.pidfd_open(pid) if hasattr(os, "pidfd_open") else None
+    try:
+        while True:
+            reaped, status, usage = os.wait4(pid, os.WNOHANG)
+            if reaped:
+                return os.waitstatus_to_exitcode(status), False, _usage(usage)
+            if watch.check():
+                _kill_group(pid)
+                _, status, usage = os.wait4(pid, 0)
+                return os.waitstatus_to_exitcode(status), False, _usage(usage)
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                _kill_group(pid)
+                _, _, usage = os.wait4(pid, 0)
+                return None, True, _usage(usage)
+            if watch.active:
+                # Output files cannot be waited on, so poll them.
+                remaining = _WATCH_POLL if remaining is None else min(remaining, _WATCH_POLL)
+            if pidfd is not None:
+                select.select([pidfd], [], [], remaining)
+            else:
+                time.sleep(0.001 if remaining is None else min(0.001, remaining))
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
+
+
+def _collect(
+    handle: object,
+    path: str,
+    buffer: int,
+    kill_limit: int | None,
+    keep: bool,
+) -> tuple[bytes, str | None]:
+    """Return the in-memory prefix of an output file and its path if it is kept."""
+
+    fd = handle.fileno()
+    if kill_limit is not None and os.fstat(fd).st_size > kill_limit:
+        os.ftruncate(fd, kill_limit)
+    handle.seek(0)
+    head = handle.read(buffer)
+    if keep and os.fstat(fd).st_size > buffer:
+        return head, path
+    os.unlink(path)
+    return head, None
+
+
+def _output_file(spill_dir: str, suffix: str) -> tuple[object, str]:
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=spill_dir)
+    return os.fdopen(fd, "w+b"), path
+
+
+def _serve_one(
+    script: str,
+    code: types.CodeType | SyntaxError,
+    request: dict,
+    control: tuple[int, int],
+) -> dict:
+    global _current_child
+    received = time.perf_counter()
+    stdout, stdout_path = _output_file(request["spill_dir"], ".stdout")
+    stderr, stderr_path = _output_file(request["spill_dir"], ".stderr")
+    with tempfile.TemporaryFile() as stdin, stdout, stderr:
+        stdin.write(request["input"])
+        stdin.flush()
+        stdin.seek(0)
+        ready_r, ready_w = os.pipe()
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        # SIGTERM waits until the child is known, so that it cannot be missed.
+        signal.pthread_sigmask(signal.SIG_BLOCK, _TERMINATE)
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.close(ready_r)
+                for fd in control:
+                    os.close(fd)
+                _run_child(
+                    script,
+                    code,
+                    stdin.fileno(),
+                    stdout.fileno(),
+                    stderr.fileno(),
+                    ready_w,
+                    request.get("rlimits", []),
+                )
+            finally:
+                os._exit(1)
+        try:
+            # Also set here, so the group exists before the child runs.
+            os.setpgid(pid, pid)
+        except OSError:
+            pass
+        _current_child = pid
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, _TERMINATE)
+
+        os.close(ready_w)
+        watch = _Watch(stdout.fileno(), stderr.fileno(), request)
+        try:
+            returncode, timed_out, usage = _wait(pid, request["timeout"], watch)
+        finally:
+            # Whatever the script left running in the background.
+            _kill_group(pid)
+            _current_child = None
+        finished = time.perf_counter()
+        stamp = os.read(ready_r, 8)
+        os.close(ready_r)
+        started = struct.unpack(">d", stamp)[0] if len(stamp) == 8 else finished
+
+        # The output of a timed-out case is discarded, so its files are not kept.
+        limits = (request["buffer"], request["kill"], not timed_out)
+        stdout_head, stdout_file = _collect(stdout, stdout_path, *limits)
+        stderr_head, stderr_file = _collect(stderr, stderr_path, *limits)
+        return {
+            "returncode": returncode,
+            "timed_out": timed_out,
+            "overflowed": watch.reason == "overflow",
+            "match": None if timed_out else watch.outcome(watch.reason == "diverged"),
+            "rusage": usage,
+            "stdout": stdout_head,
+            "stderr": stderr_head,
+            "stdout_file": stdout_file,
+            "stderr_file": stderr_file,
+            "startup": started - received,
+            "elapsed": finished - received,
+        }
+
+
+def main() -> None:
+    signal.signal(signal.SIGTERM, _terminate)
+    script = os.path.abspath(sys.argv[1])
+    control = (os.dup(0), os.dup(1))
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+
+    sys.argv = [script]
+    sys.path[0] = os.path.dirname(script)
+    with open(script, "rb") as handle:
+        source = handle.read()
+    try:
+        code: types.CodeType | SyntaxError = compile(source, script, "exec")
+    except SyntaxError as exc:
+        code = exc
+    else:
+        _preload(source)
+    sys.stdout.flush()
+
+    request_fd, reply_fd = control
+    _send(reply_fd, {"ready": True})
+    while True:
+        try:
+            request = _receive(request_fd)
+        except EOFError:
+            return
+        _send(reply_fd, _serve_one(script, code, request, control))
+
+
+if __name__ == "__main__":
+    main()
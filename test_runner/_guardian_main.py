@@ -0,0 +1,46 @@
+"""Watchdog that outlives a distributed worker to stop the cases it left behind.
+
+The module is executed as a standalone script (it must not import anything
+from :mod:`test_runner`).  The worker writes ``+<pid>`` to its stdin when a
+case's process group starts and ``-<pid>`` when it is gone.  Once stdin
+closes — the worker exited, crashed or was killed with ``SIGKILL`` — every
+group still registered gets ``SIGTERM`` (which fork servers turn into killing
+their child's group), then ``SIGKILL`` after a grace period.
+"""
+
+from __future__ import annotations
+
+import os
+import signal
+import sys
+import time
+
+_TERMINATE_GRACE = 1.0
+
+
+def _signal_groups(groups: set[int], signum: int) -> None:
+    for pid in groups:
+        try:
+            os.killpg(pid, signum)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+def main() -> None:
+    # The worker's Ctrl+C must not take the guardian down before it acts.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    groups: set[int] = set()
+    for line in sys.stdin.buffer:
+        line = line.strip()
+        if line[:1] == b"+":
+            groups.add(int(line[1:]))
+        elif line[:1] == b"-":
+            groups.discard(int(line[1:]))
+    if groups:
+        _signal_groups(groups, signal.SIGTERM)
+        time.sleep(_TERMINATE_GRACE)
+        _signal_groups(groups, signal.SIGKILL)
+
+
+if __name__ == "__main__":
+    main()
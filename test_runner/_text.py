@@ -0,0 +1,56 @@
+"""Text codec helpers shared by the execution backends."""
+
+from __future__ import annotations
+
+import codecs
+import locale
+import sys
+from typing import Optional
+
+__all__ = ["text_encoding", "decode_output", "as_bytes", "display_text"]
+
+
+def text_encoding() -> str:
+    """Return the codec ``subprocess`` uses for ``text=True`` pipes."""
+
+    return "utf-8" if sys.flags.utf8_mode else locale.getencoding()
+
+
+def decode_output(data: bytes, *, final: bool = True, encoding: Optional[str] = None) -> str:
+    """Decode child output exactly like ``subprocess`` does in text mode.
+
+    With ``final=False`` *data* is a prefix of the output and an incomplete
+    multi-byte sequence at its end is dropped instead of raising.  *encoding*
+    defaults to :func:`text_encoding`.
+    """
+
+    encoding = encoding or text_encoding()
+    if final:
+        text = data.decode(encoding)
+    else:
+        text = codecs.getincrementaldecoder(encoding)().decode(data, final=False)
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def as_bytes(value: str | bytes, encoding: Optional[str] = None, errors: str = "strict") -> bytes:
+    """Encode *value* with *encoding* (:func:`text_encoding` by default); bytes pass through."""
+
+    if isinstance(value, bytes):
+        return value
+    return value.encode(encoding or text_encoding(), errors)
+
+
+def display_text(value: str | bytes | None, encoding: Optional[str] = None) -> str:
+    """Return *value* as text for people to read.
+
+    Bytes (from a binary-mode run) are decoded with *encoding* (by default
+    :func:`text_encoding`), replacing undecodable sequences, and their line
+    endings are normalized; ``None`` becomes an empty string.
+    """
+
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    text = value.decode(encoding or text_encoding(), "replace")
+    return text.replace("\r\n", "\n").replace("\r", "\n")
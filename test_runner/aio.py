@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import AsyncIterator, Iterable, List, Optional
+
+from ._text import as_bytes, text_encoding
+from .capture import DEFAULT_OUTPUT_BUFFER, DEFAULT_OUTPUT_KILL_LIMIT, OutputCapture, OutputLimits
+from .cases import TestCase
+from .compare import Comparator, get_comparator
+from .executor import (
+    TestResult,
+    _build_result,
+    _case_comparator,
+    _Codec,
+    _default_workers,
+    _timeout_result,
+)
+from .limits import ResourceLimits, kill_process_group
+
+__all__ = ["aiter_test_results", "run_test_cases_async"]
+
+
+_CHUNK_SIZE = 64 * 1024
+
+
+def _kill(process: asyncio.subprocess.Process) -> None:
+    """Kill a running child together with its process group."""
+
+    if process.returncode is None:
+        kill_process_group(process.pid)
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+
+
+async def _feed_async(stream: asyncio.StreamWriter, data: bytes) -> None:
+    try:
+        stream.write(data)
+        await stream.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+    finally:
+        stream.close()
+
+
+async def _pump_async(
+    stream: asyncio.StreamReader,
+    capture: OutputCapture,
+    process: asyncio.subprocess.Process,
+) -> None:
+    try:
+        while chunk := await stream.read(_CHUNK_SIZE):
+            if not capture.write(chunk):
+                _kill(process)
+                while await stream.read(_CHUNK_SIZE):
+                    pass
+                return
+    finally:
+        capture.close()
+
+
+async def _communicate_async(
+    process: asyncio.subprocess.Process,
+    data: bytes,
+    stdout: OutputCapture,
+    stderr: OutputCapture,
+) -> None:
+    assert process.stdin and process.stdout and process.stderr
+    await asyncio.gather(
+        _feed_async(process.stdin, data),
+        _pump_async(process.stdout, stdout, process),
+        _pump_async(process.stderr, stderr, process),
+    )
+    await process.wait()
+
+
+async def _run_case_async(
+    case: TestCase,
+    script: Path,
+    timeout: float | None,
+    semaphore: asyncio.Semaphore,
+    limits: OutputLimits,
+    stop_on_divergence: bool,
+    codec: _Codec,
+    comparator: Comparator,
+    resources: ResourceLimits,
+) -> TestResult:
+    case = codec.case(case)
+    comparator = _case_comparator(case, comparator)
+    matcher = None
+    if stop_on_divergence and case.expected_output is not None:
+        matcher = comparator.matcher(case.expected_output, codec.encoding)
+    stdout = OutputCapture(limits, ".stdout", matcher)
+    stderr = OutputCapture(limits, ".stderr")
+    async with semaphore:
+        start = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            str(script),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            **resources.popen_kwargs(),
+        )
+        try:
+            resources.apply_to(process.pid)
+            await asyncio.wait_for(
+                _communicate_async(
+                    process, as_bytes(case.input_data, codec.encoding), stdout, stderr
+                ),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            _kill(process)
+            await process.wait()
+            stdout.discard()
+            stderr.discard()
+            return _timeout_result(case, timeout, binary=codec.binary)
+        except BaseException:
+            # Cancelled (or failed) while the child was running: never leak it.
+            if process.returncode is None:
+                _kill(process)
+                await asyncio.shield(process.wait())
+            raise
+        finally:
+            # Whatever the script left running in the background.
+            kill_process_group(process.pid)
+        elapsed = time.perf_counter() - start
+
+    assert process.returncode is not None
+    diverged = stdout.diverged
+    return _build_result(
+        case,
+        process.returncode,
+        codec.output(stdout),
+        codec.output(stderr),
+        elapsed,
+        encoding=codec.encoding,
+        comparator=comparator,
+        stdout_file=stdout.path,
+        stderr_file=stderr.path,
+        overflowed=stdout.overflowed or stderr.overflowed,
+        match=None if matcher is None else matcher.finish(),
+        diverged=diverged,
+        resources=resources,
+    )
+
+
+async def aiter_test_results(
+    test_cases: Iterable[TestCase],
+    script_path: Path,
+    *,
+    timeout: float | None = None,
+    workers: int | None = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    output_buffer: int = DEFAULT_OUTPUT_BUFFER,
+    output_kill_limit: Optional[int] = DEFAULT_OUTPUT_KILL_LIMIT,
+    stop_on_divergence: bool = False,
+    binary: bool = False,
+    encoding: Optional[str] = None,
+    comparator: str | Comparator | None = None,
+    cpu_limit: Optional[float] = None,
+    memory_limit: Optional[int] = None,
+) -> AsyncIterator[TestResult]:
+    """Asynchronously yield a :class:`TestResult` per case as it finishes.
+
+    This is the asyncio counterpart of
+    :func:`~test_runner.executor.iter_test_results` for the cold-start mode.
+    At most *workers* cases of this call are in flight; pass a shared
+    *semaphore* to cap the number of child processes across many concurrent
+    calls (for example one call per graded submission).  Cancelling the
+    consuming task, or closing the iterator early, kills the running children.
+    Output limits, *stop_on_divergence*, *binary*, *encoding*,
+    *comparator*, *cpu_limit* and *memory_limit* work as in the synchronous
+    backend.
+    """
+
+    script = script_path.resolve()
+    if workers is None:
+        workers = _default_workers()
+    workers = max(1, workers)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(workers)
+    limits = OutputLimits(output_buffer, output_kill_limit)
+    codec = _Codec(encoding or text_encoding(), binary)
+    default_comparator = get_comparator(comparator)
+    resources = ResourceLimits(cpu=cpu_limit, memory=memory_limit)
+    resources.rlimits()
+
+    pending = iter(test_cases)
+    in_flight: dict[asyncio.Task[TestResult], int] = {}
+    try:
+        while True:
+            while len(in_flight) < workers:
+                case = next(pending, None)
+                if case is None:
+                    break
+                task = asyncio.ensure_future(
+                    _run_case_async(
+                        case,
+                        script,
+                        timeout,
+                        semaphore,
+                        limits,
+                        stop_on_divergence,
+                        codec,
+                        default_comparator,
+                        resources,
+                    )
+                )
+                in_flight[task] = case.index
+            if not in_flight:
+                return
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=in_flight.__getitem__):
+                del in_flight[task]
+                yield task.result()
+    finally:
+        for task in in_flight:
+            task.cancel()
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+
+async def run_test_cases_async(
+    test_cases: Iterable[TestCase],
+    script_path: Path,
+    *,
+    timeout: float | None = None,
+    workers: int | None = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    output_buffer: int = DEFAULT_OUTPUT_BUFFER,
+    output_kill_limit: Optional[int] = DEFAULT_OUTPUT_KILL_LIMIT,
+    stop_on_divergence: bool = False,
+    binary: bool = False,
+    encoding: Optional[str] = None,
+    comparator: str | Comparator | None = None,
+    cpu_limit: Optional[float] = None,
+    memory_limit: Optional[int] = None,
+) -> List[TestResult]:
+    """Awaitable version of :func:`~test_runner.executor.run_test_cases`."""
+
+    results = [
+        result
+        async for result in aiter_test_results(
+            test_cases,
+            script_path,
+            timeout=timeout,
+            workers=workers,
+            semaphore=semaphore,
+            output_buffer=output_buffer,
+            output_kill_limit=output_kill_limit,
+            stop_on_divergence=stop_on_divergence,
+            binary=binary,
+            encoding=encoding,
+            comparator=comparator,
+            cpu_limit=cpu_limit,
+            memory_limit=memory_limit,
+        )
+    ]
+    results.sort(key=lambda result: result.case.index)
+    return results
@@ -0,0 +1,241 @@
+"""Repeated, statistically summarized timing of a suite.
+
+Besides the Python API the module can be run from CI::
+
+    python -m test_runner.benchmark script.py suite.txt --repeat 10 \
+        --warmup 2 --baseline bench.json [--save]
+
+It prints one line per case and exits with status 1 when a case got
+significantly slower than the baseline.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import statistics
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from .cases import TestCase, case_key, iter_cases
+from .executor import CancelToken, TestResult, iter_test_results
+
+__all__ = [
+    "CaseBenchmark",
+    "BaselineComparison",
+    "benchmark_cases",
+    "save_baseline",
+    "load_baseline",
+    "compare_to_baseline",
+]
+
+DEFAULT_THRESHOLD = 0.10
+
+
+@dataclass(slots=True)
+class CaseBenchmark:
+    """Timing samples of one case and their summary statistics."""
+
+    case: TestCase
+    samples: List[float] = field(default_factory=list)
+    status: str = "executed"
+
+    @property
+    def minimum(self) -> float:
+        return min(self.samples) if self.samples else math.nan
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.samples) if self.samples else math.nan
+
+    @property
+    def p95(self) -> float:
+        if len(self.samples) < 2:
+            return self.minimum
+        return statistics.quantiles(self.samples, n=20, method="inclusive")[18]
+
+    @property
+    def stddev(self) -> float:
+        return statistics.stdev(self.samples) if len(self.samples) > 1 else 0.0
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "min": self.minimum,
+            "median": self.median,
+            "p95": self.p95,
+            "stddev": self.stddev,
+            "runs": len(self.samples),
+        }
+
+
+@dataclass(slots=True)
+class BaselineComparison:
+    """How one case compares with its entry in a saved baseline."""
+
+    benchmark: CaseBenchmark
+    baseline: Optional[Dict[str, float]]
+    ratio: float
+    regressed: bool
+
+
+def benchmark_cases(
+    test_cases: Iterable[TestCase],
+    script_path: Path,
+    *,
+    repeat: int = 5,
+    warmup: int = 1,
+    timeout: float | None = None,
+    workers: int = 1,
+    mode: str = "cold",
+    cancel: CancelToken | None = None,
+    on_round: Optional[Callable[[int, int], None]] = None,
+) -> List[CaseBenchmark]:
+    """Run every case ``warmup + repeat`` times and keep the last *repeat* timings.
+
+    Rounds run the whole suite one after another, so a case's samples are
+    spread over the session rather than taken back to back.  *workers*
+    defaults to ``1`` because concurrent cases disturb each other's timings.
+    *on_round* is called with ``(finished_rounds, total_rounds)``.
+    """
+
+    if repeat < 1:
+        raise ValueError("Количество повторов должно быть положительным")
+
+    cases = list(test_cases)
+    benchmarks = {case.index: CaseBenchmark(case) for case in cases}
+    total_rounds = warmup + repeat
+    for round_number in range(total_rounds):
+        results: List[TestResult] = list(
+            iter_test_results(
+                cases,
+                script_path,
+                timeout=timeout,
+                workers=workers,
+                mode=mode,
+                cancel=cancel,
+                deduplicate=False,
+            )
+        )
+        if cancel is not None and cancel.cancelled:
+            break
+        if round_number >= warmup:
+            for result in results:
+                benchmark = benchmarks[result.case.index]
+                benchmark.samples.append(result.elapsed)
+                if benchmark.status not in ("error", "failed"):
+                    benchmark.status = result.status
+        if on_round is not None:
+            on_round(round_number + 1, total_rounds)
+
+    return [benchmarks[case.index] for case in cases]
+
+
+def save_baseline(benchmarks: Sequence[CaseBenchmark], path: Path) -> Path:
+    payload = {
+        "version": 1,
+        "cases": {case_key(item.case): item.summary() for item in benchmarks},
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    return path
+
+
+def load_baseline(path: Path) -> Dict[str, Dict[str, float]]:
+    payload = json.loads(path.read_text(encoding="utf-8"))
+    return payload["cases"]
+
+
+def compare_to_baseline(
+    benchmarks: Sequence[CaseBenchmark],
+    baseline: Dict[str, Dict[str, float]],
+    *,
+    threshold: float = DEFAULT_THRESHOLD,
+) -> List[BaselineComparison]:
+    """Compare medians with the baseline and flag significant slowdowns.
+
+    A case regresses when its median is more than *threshold* (relative)
+    above the baseline median and the difference also exceeds twice the
+    larger of the two standard deviations, so noisy cases are not flagged
+    for differences within their usual spread.
+    """
+
+    comparisons = []
+    for item in benchmarks:
+        reference = baseline.get(case_key(item.case))
+        if reference is None or not reference["median"]:
+            comparisons.append(BaselineComparison(item, reference, math.nan, False))
+            continue
+        ratio = item.median / reference["median"]
+        noise = 2 * max(item.stddev, reference["stddev"])
+        regressed = ratio > 1 + threshold and item.median - reference["median"] > noise
+        comparisons.append(BaselineComparison(item, reference, ratio, regressed))
+    return comparisons
+
+
+def _format_row(comparison: BaselineComparison) -> str:
+    item = comparison.benchmark
+    line = (
+        f"{item.case.index:>5} {item.case.label[:30]:<30} "
+        f"min={item.minimum:.4f} med={item.median:.4f} "
+        f"p95={item.p95:.4f} sd={item.stddev:.4f}"
+    )
+    if comparison.baseline is not None:
+        line += f" base={comparison.baseline['median']:.4f} x{comparison.ratio:.2f}"
+    if comparison.regressed:
+        line += "  SLOWER"
+    return line
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m test_runner.benchmark",
+        description="Benchmark a script on a suite and compare with a baseline.",
+    )
+    parser.add_argument("script", type=Path)
+    parser.add_argument("suite", type=Path)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=None)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--mode", choices=("cold", "fork"), default="cold")
+    parser.add_argument("--baseline", type=Path, default=None)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+    if args.save and args.baseline is None:
+        parser.error("--save requires --baseline")
+
+    with args.suite.open("rb") as stream:
+        cases = list(iter_cases(stream))
+    benchmarks = benchmark_cases(
+        cases,
+        args.script,
+        repeat=args.repeat,
+        warmup=args.warmup,
+        timeout=args.timeout,
+        workers=args.workers,
+        mode=args.mode,
+    )
+
+    baseline = {}
+    if args.baseline is not None and args.baseline.exists() and not args.save:
+        baseline = load_baseline(args.baseline)
+    comparisons = compare_to_baseline(benchmarks, baseline, threshold=args.threshold)
+    for comparison in comparisons:
+        print(_format_row(comparison))
+
+    if args.save:
+        save_baseline(benchmarks, args.baseline)
+
+    regressions = sum(comparison.regressed for comparison in comparisons)
+    if regressions:
+        print(f"{regressions} case(s) got significantly slower", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
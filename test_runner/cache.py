@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import ast
+import base64
+import hashlib
+import json
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import fields
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from .cases import TestCase
+from .executor import TestResult
+from .limits import ResourceLimits
+
+__all__ = ["ResultCache", "DEFAULT_CACHE_BYTES"]
+
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+# Fields that describe the case or the lookup rather than the execution.
+_SKIPPED_FIELDS = {"case", "cached", "deduplicated", "worker"}
+# JSON stand-in for the ``bytes`` outputs of binary runs.
+_BYTES_TAG = "base64"
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, bytes):
+        return {_BYTES_TAG: base64.b64encode(value).decode("ascii")}
+    return value
+
+
+def _from_json(value: Any) -> Any:
+    if isinstance(value, dict) and _BYTES_TAG in value:
+        return base64.b64decode(value[_BYTES_TAG])
+    return value
+
+
+def _local_modules(script: Path) -> Iterator[Path]:
+    """Yield the source files of modules *script* imports from its own folder."""
+
+    root = script.parent
+    seen = {script}
+    queue = [script]
+    while queue:
+        current = queue.pop()
+        try:
+            tree = ast.parse(current.read_bytes())
+        except (OSError, SyntaxError, ValueError):
+            continue
+        names: list[str] = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names.extend(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names.append(node.module)
+        for name in names:
+            base = root.joinpath(*name.split("."))
+            for candidate in (base.with_suffix(".py"), base / "__init__.py"):
+                if candidate.is_file() and candidate not in seen:
+                    seen.add(candidate)
+                    queue.append(candidate)
+                    yield candidate
+
+
+class ResultCache:
+    """On-disk, content-addressed store of :class:`TestResult` objects.
+
+    A result is keyed by the script source (and, with *include_imports*, the
+    sources of the modules it imports from its own directory), the
+    interpreter, the case input, the timeout, the resource limits and, for
+    text runs, the encoding the output was decoded with, so editing one
+    case only invalidates that case.  Entries live in a single SQLite database and the
+    least recently used ones are evicted once the stored payloads exceed
+    *max_bytes*.  Instances may be shared between threads.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        max_bytes: int = DEFAULT_CACHE_BYTES,
+        include_imports: bool = True,
+    ) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.include_imports = include_imports
+        self.hits = 0
+        self.misses = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " payload BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+        (self._size,) = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def script_digest(self, script: Path) -> str:
+        """Hash everything about the script and interpreter that affects results."""
+
+        digest = hashlib.sha256()
+        digest.update(f"{sys.executable}\0{sys.version}\0".encode())
+        digest.update(script.read_bytes())
+        if self.include_imports:
+            for module in sorted(_local_modules(script)):
+                digest.update(b"\0" + str(module.relative_to(script.parent)).encode() + b"\0")
+                digest.update(module.read_bytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def key(
+        script_digest: str,
+        case: TestCase,
+        timeout: float | None,
+        *,
+        encoding: Optional[str] = None,
+        resources: Optional[ResourceLimits] = None,
+    ) -> str:
+        """Key of *case*; binary cases (``bytes`` input) never share keys with text ones.
+
+        *encoding* is the codec of a text run: the input is encoded and the
+        stored output decoded with it, so runs with other codecs miss.
+        *resources* are the limits the case ran under: a result obtained
+        without a limit says nothing about a run with one.
+        """
+
+        limits = resources if resources is not None else ResourceLimits()
+        digest = hashlib.sha256()
+        digest.update(
+            f"{script_digest}\0{timeout!r}\0{encoding}\0{limits.cpu!r}\0{limits.memory!r}\0".encode()
+        )
+        if isinstance(case.input_data, bytes):
+            digest.update(b"binary\0")
+            digest.update(case.input_data)
+        else:
+            digest.update(case.input_data.encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
+
+    def get(self, key: str, case: TestCase) -> Optional[TestResult]:
+        with self._lock:
+            row = self._db.execute("SELECT payload FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        values = {name: _from_json(value) for name, value in json.loads(row[0]).items()}
+        return TestResult(case=case, cached=True, **values)
+
+    def put(self, key: str, result: TestResult) -> None:
+        payload = json.dumps(
+            {
+                field.name: _to_json(getattr(result, field.name))
+                for field in fields(result)
+                if field.name not in _SKIPPED_FIELDS
+            },
+            ensure_ascii=False,
+        ).encode("utf-8")
+        with self._lock:
+            previous = self._db.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (key, payload, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, payload, len(payload), time.time()),
+            )
+            self._size += len(payload) - (previous[0] if previous else 0)
+            self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM results")
+            self._size = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes:
+            rows = self._db.execute(
+                "SELECT key, size FROM results ORDER BY accessed LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._size = 0
+                return
+            for key, size in rows:
+                self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._size -= size
+                if self._size <= self.max_bytes:
+                    return
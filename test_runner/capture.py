@@ -0,0 +1,252 @@
+"""Bounded capture of child process output.
+
+Each stream keeps at most ``OutputLimits.buffer`` bytes in memory.  Once a
+stream grows past that, everything it produced goes to a spill file in
+:func:`spill_directory` and only the first ``buffer`` bytes stay in memory
+as a preview.  A separate ``OutputLimits.kill`` stops the child altogether.
+"""
+
+from __future__ import annotations
+
+import atexit
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from ._text import decode_output, text_encoding
+from .compare import Comparator, MatchOutcome, StreamMatcher, get_comparator
+
+__all__ = [
+    "DEFAULT_OUTPUT_BUFFER",
+    "DEFAULT_OUTPUT_KILL_LIMIT",
+    "OutputLimits",
+    "OutputCapture",
+    "communicate",
+    "spill_directory",
+    "match_spilled_output",
+    "spilled_output_matches",
+]
+
+DEFAULT_OUTPUT_BUFFER = 1024 * 1024
+DEFAULT_OUTPUT_KILL_LIMIT = 256 * 1024 * 1024
+
+_CHUNK_SIZE = 64 * 1024
+
+_spill_lock = threading.Lock()
+_spill_dir: Optional[str] = None
+
+
+def spill_directory() -> str:
+    """Return the per-session directory for spill files (removed at exit)."""
+
+    global _spill_dir
+    with _spill_lock:
+        if _spill_dir is None:
+            _spill_dir = tempfile.mkdtemp(prefix="test_runner-output-")
+            atexit.register(shutil.rmtree, _spill_dir, True)
+        return _spill_dir
+
+
+@dataclass(slots=True, frozen=True)
+class OutputLimits:
+    """Per-stream capture limits in bytes; ``kill`` of ``None`` disables it."""
+
+    buffer: int = DEFAULT_OUTPUT_BUFFER
+    kill: Optional[int] = DEFAULT_OUTPUT_KILL_LIMIT
+
+    def __post_init__(self) -> None:
+        if self.buffer < 0:
+            raise ValueError("Лимит буфера вывода не может быть отрицательным")
+        if self.kill is not None and self.kill < self.buffer:
+            raise ValueError("Лимит остановки по выводу меньше лимита буфера")
+
+
+class OutputCapture:
+    """Collects one output stream within :class:`OutputLimits`.
+
+    :meth:`write` returns ``False`` once the stream has passed the kill
+    limit (the data past the limit is dropped) or, with a *matcher*, once
+    the output can no longer match the expected answer.
+    """
+
+    def __init__(
+        self,
+        limits: OutputLimits,
+        suffix: str = ".out",
+        matcher: Optional[StreamMatcher] = None,
+    ) -> None:
+        self.limits = limits
+        self.matcher = matcher
+        self.size = 0
+        self.overflowed = False
+        self.path: Optional[str] = None
+        self._suffix = suffix
+        self._head = bytearray()
+        self._file: Optional[io.BufferedWriter] = None
+
+    @property
+    def spilled(self) -> bool:
+        return self.path is not None
+
+    @property
+    def diverged(self) -> bool:
+        return self.matcher is not None and self.matcher.diverged
+
+    def write(self, data: bytes) -> bool:
+        if self.overflowed or self.diverged:
+            return False
+        kill = self.limits.kill
+        if kill is not None and self.size + len(data) > kill:
+            data = data[: kill - self.size]
+            self.overflowed = True
+        self.size += len(data)
+
+        if self._file is None and self.size > self.limits.buffer:
+            fd, self.path = tempfile.mkstemp(suffix=self._suffix, dir=spill_directory())
+            self._file = os.fdopen(fd, "wb")
+            self._file.write(self._head)
+        if self._file is not None:
+            self._file.write(data)
+            room = self.limits.buffer - len(self._head)
+            if room > 0:
+                self._head += data[:room]
+        else:
+            self._head += data
+        if self.matcher is not None and not self.matcher.feed(data):
+            return False
+        return not self.overflowed
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+    def discard(self) -> None:
+        """Close the capture and delete its spill file, if any."""
+
+        self.close()
+        if self.path is not None:
+            os.unlink(self.path)
+            self.path = None
+
+    def text(self, encoding: Optional[str] = None) -> str:
+        """Decode the in-memory part, dropping a multi-byte tail cut by the limit."""
+
+        return decode_output(bytes(self._head), final=not self.spilled, encoding=encoding)
+
+    def data(self) -> bytes:
+        """The in-memory part as it was written (binary mode)."""
+
+        return bytes(self._head)
+
+
+def pump(stream: io.BufferedReader, capture: OutputCapture, on_stop: Callable[[], None]) -> None:
+    """Copy *stream* into *capture* until EOF, calling *on_stop* once it refuses data."""
+
+    try:
+        while True:
+            # read1() hands over whatever the child has written so far.
+            chunk = stream.read1(_CHUNK_SIZE)
+            if not chunk:
+                break
+            if not capture.write(chunk):
+                on_stop()
+                # Keep draining so the child never blocks on a full pipe.
+                while stream.read(_CHUNK_SIZE):
+                    pass
+                break
+    finally:
+        stream.close()
+        capture.close()
+
+
+def _feed(stream: io.RawIOBase, data: bytes) -> None:
+    try:
+        if data:
+            stream.write(data)
+    except (BrokenPipeError, ValueError):
+        pass
+    finally:
+        try:
+            stream.close()
+        except BrokenPipeError:
+            pass
+
+
+def communicate(
+    process: subprocess.Popen,
+    data: bytes,
+    timeout: float | None,
+    stdout: OutputCapture,
+    stderr: OutputCapture,
+) -> bool:
+    """Feed *data* to a binary-pipe *process* and capture its output.
+
+    Behaves like :meth:`subprocess.Popen.communicate` but streams the output
+    into the captures and kills the process as soon as either refuses more
+    data.  Returns ``True`` when the process was killed on *timeout*.
+    """
+
+    def kill() -> None:
+        try:
+            process.kill()
+        except OSError:
+            pass
+
+    readers = [
+        threading.Thread(target=pump, args=(process.stdout, stdout, kill), daemon=True),
+        threading.Thread(target=pump, args=(process.stderr, stderr, kill), daemon=True),
+    ]
+    writer = threading.Thread(target=_feed, args=(process.stdin, data), daemon=True)
+    for thread in (writer, *readers):
+        thread.start()
+
+    # The readers finish when the child closes its pipes, which normally
+    # happens on exit; joining them avoids Popen.wait()'s polling loop.
+    deadline = None if timeout is None else time.monotonic() + timeout
+    timed_out = False
+    for reader in readers:
+        reader.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        if reader.is_alive():
+            timed_out = True
+            kill()
+            break
+    try:
+        process.wait(None if deadline is None else max(0.0, deadline - time.monotonic()))
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        kill()
+        process.wait()
+    for thread in (writer, *readers):
+        thread.join()
+    return timed_out
+
+
+def match_spilled_output(
+    path: str,
+    expected: str | bytes,
+    encoding: Optional[str] = None,
+    comparator: Optional[Comparator] = None,
+) -> MatchOutcome:
+    """Compare a spill file with *expected* without loading the whole file.
+
+    A ``bytes`` *expected* compares the raw file; text is decoded with
+    *encoding* (:func:`~test_runner._text.text_encoding` by default).
+    *comparator* defaults to the exact rule.
+    """
+
+    matcher = get_comparator(comparator).matcher(expected, encoding or text_encoding())
+    with open(path, "rb") as handle:
+        while chunk := handle.read(_CHUNK_SIZE):
+            if not matcher.feed(chunk):
+                break
+    return matcher.finish()
+
+
+def spilled_output_matches(path: str, expected: str | bytes, encoding: Optional[str] = None) -> bool:
+    return match_spilled_output(path, expected, encoding).matched
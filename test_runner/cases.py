@@ -1,35 +1,62 @@
 from __future__ import annotations
 
-import re
+import hashlib
+import io
 from dataclasses import dataclass
-from typing import Iterable, List, Optional
+from typing import IO, Iterator, List, Optional
 
-__all__ = ["TestCase", "ParseError", "parse_cases"]
+from ._text import as_bytes
+from .compare import get_comparator
+from .tracing import traced
+
+__all__ = ["TestCase", "ParseError", "iter_cases", "parse_cases", "case_key"]
 
 
 @dataclass(slots=True)
 class TestCase:
-    """Representation of a single test case."""
+    """Representation of a single test case.
+
+    Parsed cases hold text; in binary runs the input and the expected
+    output are ``bytes`` (see ``binary`` of
+    :func:`~test_runner.executor.run_test_cases`).  ``comparator`` is the
+    spec of the rule this case is judged by (see
+    :func:`~test_runner.compare.get_comparator`); ``None`` leaves the
+    choice to the run.
+    """
 
     index: int
     label: str
-    input_data: str
-    expected_output: Optional[str] = None
+    input_data: str | bytes
+    expected_output: Optional[str | bytes] = None
+    comparator: Optional[str] = None
 
-    def normalized_input(self) -> str:
+    def normalized_input(self) -> str | bytes:
         return self.input_data.strip()
 
-    def normalized_expected(self) -> Optional[str]:
+    def normalized_expected(self) -> Optional[str | bytes]:
         if self.expected_output is None:
             return None
         return self.expected_output.strip()
 
 
+def case_key(case: TestCase) -> str:
+    """Identify a case across runs by its label and the hash of its input."""
+
+    digest = hashlib.sha256(as_bytes(case.input_data, "utf-8", "surrogatepass")).hexdigest()
+    return f"{case.label}#{digest[:16]}"
+
+
 class ParseError(ValueError):
     """Raised when user-provided test definitions cannot be parsed."""
 
+    def __init__(self, message: str, lineno: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.lineno = lineno
+
 
 _COMMENT_PREFIXES = ("#", "//")
+# A comment starting with this word picks the comparator of its case.
+_COMPARATOR_DIRECTIVES = ("@compare", "@сравнение")
 _SEPARATOR_TOKENS = {
     "=>",
     "->",
@@ -42,65 +69,74 @@ _SEPARATOR_TOKENS = {
 }
 
 
-def _split_blocks(raw_text: str) -> List[str]:
-    stripped = raw_text.strip()
-    if not stripped:
-        return []
-    return [block.strip() for block in re.split(r"(?:\r?\n){2,}", stripped) if block.strip()]
-
-
 def _is_comment(line: str) -> bool:
     stripped = line.strip()
     return any(stripped.startswith(prefix) for prefix in _COMMENT_PREFIXES)
 
 
-def _extract_label(lines: Iterable[str]) -> Optional[str]:
-    for line in lines:
-        stripped = line.strip()
-        for prefix in _COMMENT_PREFIXES:
-            if stripped.startswith(prefix):
-                value = stripped[len(prefix) :].strip()
-                if value:
-                    return value
+def _comment_label(line: str) -> Optional[str]:
+    stripped = line.strip()
+    for prefix in _COMMENT_PREFIXES:
+        if stripped.startswith(prefix):
+            return stripped[len(prefix) :].strip() or None
     return None
 
 
-def _split_input_output(lines: List[str]) -> tuple[List[str], Optional[List[str]]]:
-    for index, line in enumerate(lines):
-        if line.strip().upper() in _SEPARATOR_TOKENS:
-            return lines[:index], lines[index + 1 :]
-    return lines, None
-
-
-def parse_cases(raw_text: str) -> List[TestCase]:
-    """Parse raw text describing a suite of tests.
-
-    Each test case is separated by one or more blank lines.  Lines that begin
-    with ``#`` or ``//`` are treated as comments and are used to derive the test
-    label.  To provide an expected output, insert a separator line containing
-    one of the tokens defined in ``_SEPARATOR_TOKENS`` (for example ``=>`` or
-    ``EXPECTED:``).  Content after the separator becomes the expected output.
-    """
-
-    blocks = _split_blocks(raw_text)
-    cases: List[TestCase] = []
-
-    for index, block in enumerate(blocks, start=1):
-        lines = [line.rstrip("\n") for line in block.splitlines()]
-        label = _extract_label(lines) or f"Тест {index}"
-
-        payload_lines = [line for line in lines if not _is_comment(line)]
-        input_lines, expected_lines = _split_input_output(payload_lines)
-        input_data = "\n".join(line.rstrip() for line in input_lines).strip()
-
+def _is_blank_separator(raw_line: str) -> bool:
+    # Mirrors the ``(?:\r?\n){2,}`` block separator: an empty line, optionally
+    # carrying a lone carriage return.
+    return raw_line.rstrip("\n") in ("", "\r")
+
+
+class _BlockBuilder:
+    """Accumulates the lines of one block and turns them into a test case."""
+
+    __slots__ = (
+        "start_line",
+        "label",
+        "comparator",
+        "input_lines",
+        "expected_lines",
+        "has_content",
+    )
+
+    def __init__(self, start_line: int) -> None:
+        self.start_line = start_line
+        self.label: Optional[str] = None
+        self.comparator: Optional[str] = None
+        self.input_lines: List[str] = []
+        self.expected_lines: Optional[List[str]] = None
+        self.has_content = False
+
+    def add(self, line: str) -> None:
+        if line.strip():
+            self.has_content = True
+        if _is_comment(line):
+            text = _comment_label(line)
+            directive, _, spec = (text or "").partition(" ")
+            if directive.lower() in _COMPARATOR_DIRECTIVES:
+                self.comparator = spec.strip()
+            elif self.label is None:
+                self.label = text
+            return
+        if self.expected_lines is None and line.strip().upper() in _SEPARATOR_TOKENS:
+            self.expected_lines = []
+            return
+        target = self.input_lines if self.expected_lines is None else self.expected_lines
+        target.append(line.rstrip())
+
+    def build(self, index: int) -> TestCase:
+        input_data = "\n".join(self.input_lines).strip()
         if not input_data:
             raise ParseError(
-                f"Тест {index} не содержит входных данных. Добавьте хотя бы одну строку входа."
+                f"Тест {index} (строка {self.start_line}) не содержит входных данных. "
+                "Добавьте хотя бы одну строку входа.",
+                self.start_line,
             )
 
         expected_output = None
-        if expected_lines is not None:
-            expected_output = "\n".join(line.rstrip() for line in expected_lines).strip()
+        if self.expected_lines is not None:
+            expected_output = "\n".join(self.expected_lines).strip()
             if expected_output == "":
                 expected_output = None
 
@@ -111,13 +147,68 @@ def parse_cases(raw_text: str) -> List[TestCase]:
         if expected_output is not None and not expected_output.endswith("\n"):
             expected_output = f"{expected_output}\n"
 
-        cases.append(
-            TestCase(
-                index=index,
-                label=label,
-                input_data=input_data,
-                expected_output=expected_output,
-            )
+        comparator = None
+        if self.comparator is not None:
+            try:
+                comparator = get_comparator(self.comparator).spec
+            except ValueError as exc:
+                raise ParseError(
+                    f"Тест {index} (строка {self.start_line}): {exc}", self.start_line
+                ) from None
+
+        return TestCase(
+            index=index,
+            label=self.label or f"Тест {index}",
+            input_data=input_data,
+            expected_output=expected_output,
+            comparator=comparator,
         )
 
-    return cases
+
+def iter_cases(stream: IO[str] | IO[bytes], *, encoding: str = "utf-8") -> Iterator[TestCase]:
+    """Lazily parse a suite from a text or binary file object.
+
+    The stream is read line by line and every test case is yielded as soon as
+    its block ends, so memory use is bounded by the largest single case rather
+    than by the size of the suite.  The format is the one accepted by
+    :func:`parse_cases`; binary streams are decoded with *encoding*.
+    :class:`ParseError` reports the line on which the offending block starts.
+    """
+
+    index = 0
+    block: Optional[_BlockBuilder] = None
+    for lineno, raw_line in enumerate(stream, start=1):
+        if isinstance(raw_line, bytes):
+            raw_line = raw_line.decode(encoding)
+
+        if _is_blank_separator(raw_line):
+            if block is not None and block.has_content:
+                index += 1
+                yield block.build(index)
+            block = None
+            continue
+
+        if block is None:
+            block = _BlockBuilder(lineno)
+        for line in raw_line.splitlines() or [""]:
+            block.add(line)
+
+    if block is not None and block.has_content:
+        index += 1
+        yield block.build(index)
+
+
+@traced()
+def parse_cases(raw_text: str) -> List[TestCase]:
+    """Parse raw text describing a suite of tests.
+
+    Each test case is separated by one or more blank lines.  Lines that begin
+    with ``#`` or ``//`` are treated as comments and are used to derive the test
+    label.  To provide an expected output, insert a separator line containing
+    one of the tokens defined in ``_SEPARATOR_TOKENS`` (for example ``=>`` or
+    ``EXPECTED:``).  Content after the separator becomes the expected output.
+    A comment of the form ``# @compare <spec>`` (for example ``# @compare
+    numeric abs=1e-6``) sets the case's comparator instead of its label.
+    """
+
+    return list(iter_cases(io.StringIO(raw_text)))
@@ -0,0 +1,337 @@
+"""Headless command line interface: ``python -m test_runner script suite``.
+
+The module keeps its own imports to the minimum needed for a plain run;
+the cache, the run history and the report writers (with their json and
+XML dependencies) are imported only when the corresponding option is used.
+Exit codes: ``0`` when every case passed (or ran without an expected
+output), ``1`` when some case failed or errored, ``2`` for invalid arguments
+or an unreadable suite.
+"""
+
+from __future__ import annotations
+
+import argparse
+import codecs
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from .cases import TestCase
+    from .compare import Comparator
+    from .executor import TestResult
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m test_runner",
+        description="Run a Python script on every case of a suite file.",
+    )
+    parser.add_argument("script", type=Path, help="script under test")
+    parser.add_argument("suite", type=Path, help="file with test definitions")
+    parser.add_argument("--timeout", type=float, default=None, help="per-case timeout in seconds")
+    parser.add_argument(
+        "--cpu-limit", type=float, default=None, help="per-case CPU time limit in seconds"
+    )
+    parser.add_argument(
+        "--memory-limit", type=float, default=None, metavar="MIB", help="per-case memory limit in MiB"
+    )
+    parser.add_argument(
+        "--adaptive-timeout",
+        type=float,
+        default=None,
+        metavar="FACTOR",
+        help="time out each case at FACTOR x its historical p95 (needs --history;"
+        " --timeout is the ceiling)",
+    )
+    parser.add_argument(
+        "--timeout-floor", type=float, default=None, help="lowest adaptive timeout in seconds"
+    )
+    parser.add_argument("--workers", type=int, default=None, help="parallel cases (CPU count)")
+    parser.add_argument("--mode", choices=("cold", "fork"), default="cold")
+    parser.add_argument("--json", type=Path, default=None, help="write a JSON report")
+    parser.add_argument("--junit", type=Path, default=None, help="write a JUnit XML report")
+    parser.add_argument("--cache", type=Path, default=None, help="result cache database")
+    parser.add_argument("--history", type=Path, default=None, help="run history database")
+    parser.add_argument("--max-failures", type=int, default=None)
+    parser.add_argument("--stop-on-divergence", action="store_true")
+    parser.add_argument(
+        "--reference", type=Path, default=None, help="judge the script by this reference script"
+    )
+    parser.add_argument(
+        "--no-dedup",
+        dest="deduplicate",
+        action="store_false",
+        help="run every case even if its input repeats (nondeterministic scripts)",
+    )
+    parser.add_argument(
+        "--binary", action="store_true", help="keep input and output as bytes, compare bytes"
+    )
+    parser.add_argument(
+        "--encoding", default=None, help="encoding of the suite and of the script's input/output"
+    )
+    parser.add_argument(
+        "--compare",
+        default=None,
+        metavar="SPEC",
+        help='output comparison: exact, tokens, "numeric abs=1e-6 rel=1e-6" or unordered',
+    )
+    parser.add_argument(
+        "--distribute",
+        default=None,
+        metavar="HOST:PORT",
+        help="hand the cases out to workers connecting to this address"
+        " (python -m test_runner.distributed HOST:PORT)",
+    )
+    parser.add_argument(
+        "--local-workers", type=int, default=0, help="start this many workers on this machine"
+    )
+    parser.add_argument("--batch-size", type=int, default=None, help="cases per worker batch")
+    parser.add_argument(
+        "--trace",
+        type=Path,
+        default=None,
+        help="write a Chrome/Perfetto trace of the run phases and print their totals",
+    )
+    parser.add_argument("-q", "--quiet", action="store_true", help="print only the summary")
+    return parser
+
+
+def _print_result(result: TestResult) -> None:
+    line = f"{result.case.index:>5} {result.status:<8} {result.elapsed:8.3f}s  {result.case.label}"
+    if result.speedup is not None:
+        line += f"  ×{result.speedup:.2f}"
+    if result.has_error:
+        line += f"  — {result.message}"
+    print(line)
+
+
+def _run_distributed(
+    cases: Iterable[TestCase],
+    args: argparse.Namespace,
+    address: Tuple[str, int],
+    options: Dict[str, Any],
+) -> Optional[List[TestResult]]:
+    """Run the suite through a coordinator; ``None`` when it cannot start."""
+
+    import os
+    import secrets
+
+    from .distributed import (
+        AUTHKEY_ENV,
+        DEFAULT_BATCH_SIZE,
+        Coordinator,
+        describe_worker_stats,
+        spawn_local_workers,
+    )
+
+    authkey = None
+    if args.distribute is None and not os.environ.get(AUTHKEY_ENV):
+        # Only the workers started here can connect; any key will do.
+        authkey = secrets.token_hex(16).encode()
+    try:
+        coordinator = Coordinator(
+            address, authkey=authkey, batch_size=args.batch_size or DEFAULT_BATCH_SIZE
+        )
+    except (RuntimeError, OSError) as exc:
+        print(exc, file=sys.stderr)
+        return None
+    workers = []
+    try:
+        host, port = coordinator.address
+        print(f"Координатор ожидает исполнителей на {host}:{port}", file=sys.stderr)
+        if args.local_workers:
+            workers = spawn_local_workers(
+                coordinator.address,
+                args.local_workers,
+                authkey=authkey,
+                workers=args.workers or 1,
+                mode=args.mode,
+            )
+        try:
+            results = coordinator.run(cases, args.script, **options)
+        except RuntimeError as exc:
+            print(exc, file=sys.stderr)
+            return None
+        if not args.quiet:
+            for line in describe_worker_stats(coordinator.stats()):
+                print(line, file=sys.stderr)
+        return results
+    finally:
+        coordinator.close()
+        for worker in workers:
+            worker.wait()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    started = time.perf_counter()
+    args = _parser().parse_args(argv)
+    for path in (args.script, args.reference):
+        if path is not None and not path.is_file():
+            print(f"Файл {path} не найден", file=sys.stderr)
+            return EXIT_USAGE
+    if args.encoding is not None:
+        try:
+            codecs.lookup(args.encoding)
+        except LookupError:
+            print(f"Неизвестная кодировка: {args.encoding}", file=sys.stderr)
+            return EXIT_USAGE
+
+    if args.adaptive_timeout is not None and args.history is None:
+        print("--adaptive-timeout требует --history", file=sys.stderr)
+        return EXIT_USAGE
+
+    address = None
+    if args.distribute is not None or args.local_workers:
+        if args.cache is not None:
+            print("Кэш результатов не поддерживается при распределённом запуске", file=sys.stderr)
+            return EXIT_USAGE
+        if args.adaptive_timeout is not None:
+            print("--adaptive-timeout недоступен при распределённом запуске", file=sys.stderr)
+            return EXIT_USAGE
+        from .distributed import parse_address
+
+        try:
+            address = parse_address(args.distribute or "127.0.0.1:0")
+        except ValueError as exc:
+            print(exc, file=sys.stderr)
+            return EXIT_USAGE
+
+    from .compare import get_comparator
+
+    try:
+        comparator = get_comparator(args.compare)
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        return EXIT_USAGE
+
+    if args.trace is None:
+        return _run(args, started, address, comparator)
+    from .tracing import Tracer, describe_summary
+
+    with Tracer() as tracer:
+        code = _run(args, started, address, comparator)
+    tracer.write_chrome_trace(args.trace)
+    print(f"Трассировка сохранена в {args.trace}", file=sys.stderr)
+    for line in describe_summary(tracer.summary()):
+        print(line, file=sys.stderr)
+    return code
+
+
+def _run(
+    args: argparse.Namespace,
+    started: float,
+    address: Optional[Tuple[str, int]],
+    comparator: Comparator,
+) -> int:
+    """Read the suite, run it and report; the part of :func:`main` that ``--trace`` covers."""
+
+    from .cases import ParseError
+    from .executor import run_test_cases
+    from .suite import CaseSuite, describe_stats
+    from .tracing import span
+
+    try:
+        with args.suite.open("rb") as stream:
+            cases = CaseSuite.from_stream(stream, encoding=args.encoding or "utf-8")
+    except OSError as exc:
+        print(f"Не удалось прочитать {args.suite}: {exc}", file=sys.stderr)
+        return EXIT_USAGE
+    except (ParseError, UnicodeDecodeError) as exc:
+        print(f"{args.suite}: {exc}", file=sys.stderr)
+        return EXIT_USAGE
+
+    if not args.quiet and len(cases):
+        print(f"Набор: {describe_stats(cases.stats())}", file=sys.stderr)
+
+    cache = history = None
+    if args.cache is not None:
+        from .cache import ResultCache
+
+        cache = ResultCache(args.cache)
+    if args.history is not None:
+        from .history import RunHistory
+
+        history = RunHistory(args.history)
+
+    adaptive_timeout = None
+    if args.adaptive_timeout is not None:
+        from .history import AdaptiveTimeout
+
+        adaptive_timeout = AdaptiveTimeout(
+            factor=args.adaptive_timeout,
+            floor=args.timeout_floor if args.timeout_floor is not None else AdaptiveTimeout.floor,
+            ceiling=args.timeout if args.timeout is not None else AdaptiveTimeout.ceiling,
+        )
+
+    prepared = time.perf_counter() - started
+    options = dict(
+        timeout=args.timeout,
+        cpu_limit=args.cpu_limit,
+        memory_limit=None if args.memory_limit is None else int(args.memory_limit * 1024 * 1024),
+        adaptive_timeout=adaptive_timeout,
+        history=history,
+        max_failures=args.max_failures,
+        stop_on_divergence=args.stop_on_divergence,
+        reference=args.reference,
+        deduplicate=args.deduplicate,
+        binary=args.binary,
+        encoding=args.encoding,
+        comparator=comparator,
+    )
+    try:
+        if address is not None:
+            results = _run_distributed(
+                cases.iter_bytes() if args.binary else cases, args, address, options
+            )
+            if results is None:
+                return EXIT_USAGE
+        else:
+            results = run_test_cases(
+                cases.iter_bytes() if args.binary else cases,
+                args.script,
+                workers=args.workers,
+                mode=args.mode,
+                cache=cache,
+                **options,
+            )
+    finally:
+        if cache is not None:
+            cache.close()
+        if history is not None:
+            history.close()
+
+    if not args.quiet:
+        for result in results:
+            _print_result(result)
+    failures = sum(result.has_error for result in results)
+    summary = f"{len(results)} из {len(cases)} тестов выполнено, ошибок: {failures}; "
+    saved = sum(result.deduplicated for result in results)
+    if saved:
+        summary += f"повторных запусков пропущено: {saved}; "
+    if args.reference is not None:
+        from .usage import suite_totals
+
+        speedup = suite_totals(results).speedup
+        if speedup is not None:
+            summary += f"ускорение относительно эталона ×{speedup:.2f}; "
+    summary += f"подготовка {prepared * 1000:.0f} мс, всего {time.perf_counter() - started:.2f} с"
+    print(summary, file=sys.stderr)
+
+    if args.json is not None or args.junit is not None:
+        from .reports import write_json_report, write_junit_report
+
+        with span("reports"):
+            if args.json is not None:
+                write_json_report(results, args.json, script=args.script, suite=args.suite)
+            if args.junit is not None:
+                write_junit_report(results, args.junit, suite_name=args.suite.stem)
+
+    if failures or len(results) < len(cases):
+        return EXIT_FAILED
+    return EXIT_OK
@@ -0,0 +1,509 @@
+"""Incremental comparison of program output with the expected answer.
+
+The module only depends on the standard library and uses no relative
+imports: the fork server loads it straight from its file so the warm
+interpreter can compare output while the child is still running, and
+generated pytest modules import it to judge their cases by the same rules.
+
+A :class:`Comparator` is a comparison rule, named by a short *spec* string
+such as ``"tokens"`` or ``"numeric abs=1e-6 rel=1e-9"`` (see
+:func:`get_comparator`).  Its :meth:`~Comparator.matcher` starts one
+streaming comparison: output is fed chunk by chunk, every matcher keeps only
+a bounded amount of it (at most one unfinished token or line) and reports
+the first place where the output can no longer match.
+"""
+
+from __future__ import annotations
+
+import codecs
+import functools
+import io
+import math
+import re
+from dataclasses import dataclass
+from typing import ClassVar, Dict, Optional, Union
+
+__all__ = [
+    "MatchOutcome",
+    "StreamMatcher",
+    "OutputMatcher",
+    "TokenMatcher",
+    "NumericMatcher",
+    "UnorderedLinesMatcher",
+    "Comparator",
+    "ExactComparator",
+    "TokenComparator",
+    "NumericComparator",
+    "UnorderedLinesComparator",
+    "COMPARATORS",
+    "get_comparator",
+    "outputs_match",
+]
+
+# What ``bytes.strip()`` removes.
+_ASCII_WHITESPACE = frozenset(b" \t\n\r\x0b\x0c")
+_TEXT_TOKEN = re.compile(r"\S+")
+_BYTES_TOKEN = re.compile(rb"\S+")
+# Longest number a numeric matcher keeps while waiting for its end.
+_NUMBER_LIMIT = 4096
+
+
+def _strip_bounds(data: Union[bytes, memoryview]) -> tuple[int, int]:
+    start, end = 0, len(data)
+    while start < end and data[start] in _ASCII_WHITESPACE:
+        start += 1
+    while end > start and data[end - 1] in _ASCII_WHITESPACE:
+        end -= 1
+    return start, end
+
+
+def outputs_match(output: Union[str, bytes], expected: Union[str, bytes]) -> bool:
+    """The executor's rule, ``output.strip() == expected.strip()``.
+
+    Two ``bytes`` values are compared through memoryviews of their stripped
+    parts, so a large output is not copied to be compared.
+    """
+
+    if isinstance(output, str) or isinstance(expected, str):
+        return output.strip() == expected.strip()
+    start, end = _strip_bounds(output)
+    expected_start, expected_end = _strip_bounds(expected)
+    if end - start != expected_end - expected_start:
+        return False
+    return memoryview(output)[start:end] == memoryview(expected)[expected_start:expected_end]
+
+
+@dataclass(slots=True)
+class MatchOutcome:
+    """Whether the output matched and, if not, where it went wrong.
+
+    ``offset`` is the index of the first character of the (newline
+    normalized) output that cannot be part of a matching answer, or of the
+    first byte of the raw output in binary mode, and ``line`` the 1-based
+    line it is on.  For an output that is only too short they
+    point just past its end.
+    """
+
+    matched: bool
+    offset: Optional[int] = None
+    line: Optional[int] = None
+
+
+class StreamMatcher:
+    """Base of the matchers: decoding, position tracking and the outcome.
+
+    :meth:`feed` returns ``False`` as soon as no continuation of the output
+    can match any more, so the producer may be stopped right away.  With a
+    ``bytes`` *expected* the matcher works in binary mode: chunks are
+    compared as they are, without decoding or newline translation, and
+    *encoding* is not used.  Subclasses implement :meth:`_feed` and
+    :meth:`_end`.
+    """
+
+    def __init__(self, expected: Union[str, bytes], encoding: str) -> None:
+        self.binary = isinstance(expected, bytes)
+        self._empty: Union[str, bytes] = expected[:0]
+        self._newline: Union[str, bytes] = b"\n" if self.binary else "\n"
+        self._decoder = (
+            None
+            if self.binary
+            else io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(encoding)(), translate=True)
+        )
+        self._consumed = 0
+        self._lines = 1
+        self.diverged = False
+        self.offset: Optional[int] = None
+        self.line: Optional[int] = None
+
+    def feed(self, data: bytes) -> bool:
+        if self._decoder is None:
+            return self._feed(data)
+        return self._feed(self._decoder.decode(data))
+
+    def feed_text(self, text: str) -> bool:
+        """Feed already decoded output (text mode only)."""
+
+        return self._feed(text)
+
+    def finish(self) -> MatchOutcome:
+        """Flush the decoder and return the final :class:`MatchOutcome`."""
+
+        if not self.diverged and self._decoder is not None:
+            self._feed(self._decoder.decode(b"", final=True))
+        if not self.diverged:
+            self._end()
+        return MatchOutcome(not self.diverged, self.offset, self.line)
+
+    def _feed(self, text: Union[str, bytes]) -> bool:
+        raise NotImplementedError
+
+    def _end(self) -> None:
+        """Called once all output was fed; diverges if the answer is incomplete."""
+
+        raise NotImplementedError
+
+    def _advance(self, text: Union[str, bytes]) -> None:
+        self._consumed += len(text)
+        self._lines += text.count(self._newline)
+
+    def _diverge(self, matched_prefix: Union[str, bytes]) -> bool:
+        self._advance(matched_prefix)
+        return self._diverge_at(self._consumed, self._lines)
+
+    def _diverge_at(self, offset: int, line: int) -> bool:
+        self.diverged = True
+        self.offset = offset
+        self.line = line
+        return False
+
+
+class OutputMatcher(StreamMatcher):
+    """Exact comparison: ``output.strip() == expected.strip()``."""
+
+    def __init__(self, expected: Union[str, bytes], encoding: str) -> None:
+        super().__init__(expected, encoding)
+        self._expected = expected.strip()
+        self._position = 0
+        self._started = False
+
+    def _feed(self, text: Union[str, bytes]) -> bool:
+        if self.diverged:
+            return False
+        if not self._started:
+            stripped = text.lstrip()
+            self._advance(text[: len(text) - len(stripped)])
+            text = stripped
+            if not text:
+                return True
+            self._started = True
+
+        expected = self._expected
+        taken = text[: len(expected) - self._position]
+        if expected[self._position : self._position + len(taken)] != taken:
+            mismatch = next(
+                i for i, char in enumerate(taken) if char != expected[self._position + i]
+            )
+            return self._diverge(taken[:mismatch])
+        self._position += len(taken)
+        rest = text[len(taken) :]
+        garbage = rest.strip()
+        if garbage:
+            return self._diverge(taken + rest[: rest.index(garbage[0])])
+        self._advance(text)
+        return True
+
+    def _end(self) -> None:
+        if self._position < len(self._expected):
+            self._diverge(self._empty)
+
+
+class TokenMatcher(StreamMatcher):
+    """Compares the whitespace-separated tokens of the output one by one.
+
+    Any run of whitespace (including line breaks) separates tokens, so the
+    layout of the answer does not matter.  Only a token cut by a chunk
+    boundary is kept between chunks.
+    """
+
+    def __init__(self, expected: Union[str, bytes], encoding: str) -> None:
+        super().__init__(expected, encoding)
+        self._pattern = _BYTES_TOKEN if self.binary else _TEXT_TOKEN
+        self._expected = self._pattern.finditer(expected)
+        self._next: Union[str, bytes, None] = None
+        self._carry = self._empty
+        self._token_start = 0
+        self._token_line = 1
+
+    def _same(self, token: Union[str, bytes], expected: Union[str, bytes]) -> bool:
+        return token == expected
+
+    def _limit(self, expected: Union[str, bytes]) -> int:
+        """Longest unfinished token that can still match *expected*."""
+
+        return len(expected)
+
+    def _peek(self) -> Union[str, bytes, None]:
+        if self._next is None:
+            match = next(self._expected, None)
+            self._next = None if match is None else match.group()
+        return self._next
+
+    def _check(self, token: Union[str, bytes], start: int, line: int) -> bool:
+        expected = self._peek()
+        if expected is None or not self._same(token, expected):
+            return self._diverge_at(start, line)
+        self._next = None
+        return True
+
+    def _settle(self) -> bool:
+        token, self._carry = self._carry, self._empty
+        return self._check(token, self._token_start, self._token_line)
+
+    def _feed(self, text: Union[str, bytes]) -> bool:
+        if self.diverged:
+            return False
+        if not text:
+            return True
+        base = self._consumed
+        self._consumed += len(text)
+        if self._carry and text[:1].isspace() and not self._settle():
+            return False
+        scanned = 0
+        for match in self._pattern.finditer(text):
+            start, end = match.span()
+            if start == 0 and self._carry:
+                token = self._carry + match.group()
+                token_start, token_line = self._token_start, self._token_line
+            else:
+                self._lines += text.count(self._newline, scanned, start)
+                scanned = start
+                token = match.group()
+                token_start, token_line = base + start, self._lines
+            if end < len(text):
+                self._carry = self._empty
+                if not self._check(token, token_start, token_line):
+                    return False
+                continue
+            # The token may go on in the next chunk.
+            expected = self._peek()
+            if expected is None or len(token) > self._limit(expected):
+                return self._diverge_at(token_start, token_line)
+            self._carry, self._token_start, self._token_line = token, token_start, token_line
+        self._lines += text.count(self._newline, scanned)
+        return True
+
+    def _end(self) -> None:
+        if self._carry and not self._settle():
+            return
+        if self._peek() is not None:
+            self._diverge_at(self._consumed, self._lines)
+
+
+class NumericMatcher(TokenMatcher):
+    """Like :class:`TokenMatcher`, with numbers equal within a tolerance.
+
+    Two tokens that both parse as ``float`` match when
+    ``math.isclose(output, expected, rel_tol=rel_tol, abs_tol=abs_tol)``
+    (two NaNs match too); other tokens must be identical.
+    """
+
+    def __init__(
+        self,
+        expected: Union[str, bytes],
+        encoding: str,
+        *,
+        abs_tol: float,
+        rel_tol: float,
+    ) -> None:
+        super().__init__(expected, encoding)
+        self.abs_tol = abs_tol
+        self.rel_tol = rel_tol
+
+    def _same(self, token: Union[str, bytes], expected: Union[str, bytes]) -> bool:
+        if token == expected:
+            return True
+        try:
+            value = float(token)
+            reference = float(expected)
+        except ValueError:
+            return False
+        if math.isnan(value) or math.isnan(reference):
+            return math.isnan(value) and math.isnan(reference)
+        return math.isclose(value, reference, rel_tol=self.rel_tol, abs_tol=self.abs_tol)
+
+    def _limit(self, expected: Union[str, bytes]) -> int:
+        return max(len(expected), _NUMBER_LIMIT)
+
+
+class UnorderedLinesMatcher(StreamMatcher):
+    """Compares the multisets of lines: their order does not matter.
+
+    Lines are stripped of surrounding whitespace and blank lines are
+    ignored.  The expected lines are counted once; every output line
+    removes one occurrence, so an output line that is not (or no longer)
+    expected fails at once.  Only a line cut by a chunk boundary is kept
+    between chunks.
+    """
+
+    def __init__(self, expected: Union[str, bytes], encoding: str) -> None:
+        super().__init__(expected, encoding)
+        self._counts: Dict[Union[str, bytes], int] = {}
+        for line in expected.split(self._newline):
+            line = line.strip()
+            if line:
+                self._counts[line] = self._counts.get(line, 0) + 1
+        self._remaining = sum(self._counts.values())
+        self._longest = max(map(len, self._counts), default=0)
+        self._carry = self._empty
+        self._line_start = 0
+
+    def _take(self, line: Union[str, bytes], start: int) -> bool:
+        key = line.strip()
+        if not key:
+            return True
+        count = self._counts.get(key, 0)
+        if not count:
+            return self._diverge_at(start, self._lines)
+        self._counts[key] = count - 1
+        self._remaining -= 1
+        return True
+
+    def _feed(self, text: Union[str, bytes]) -> bool:
+        if self.diverged:
+            return False
+        if not text:
+            return True
+        base = self._consumed
+        self._consumed += len(text)
+        *lines, rest = text.split(self._newline)
+        position = base
+        for line in lines:
+            start = position
+            position += len(line) + 1
+            if self._carry:
+                line, self._carry = self._carry + line, self._empty
+                start = self._line_start
+            if not self._take(line, start):
+                return False
+            self._lines += 1
+        if rest:
+            if not self._carry:
+                self._line_start = position
+            self._carry += rest
+            if len(self._carry) > self._longest and len(self._carry.strip()) > self._longest:
+                return self._diverge_at(self._line_start, self._lines)
+        return True
+
+    def _end(self) -> None:
+        if self._carry:
+            line, self._carry = self._carry, self._empty
+            if not self._take(line, self._line_start):
+                return
+        if self._remaining:
+            self._diverge_at(self._consumed, self._lines)
+
+
+@dataclass(frozen=True, slots=True)
+class Comparator:
+    """A comparison rule; :meth:`matcher` starts one streaming comparison.
+
+    ``spec`` is the string form accepted by :func:`get_comparator`, which
+    is how a rule travels to the fork server and into generated modules.
+    """
+
+    name: ClassVar[str] = ""
+    options: ClassVar[Dict[str, str]] = {}
+
+    @property
+    def spec(self) -> str:
+        return self.name
+
+    def matcher(self, expected: Union[str, bytes], encoding: str = "utf-8") -> StreamMatcher:
+        raise NotImplementedError
+
+    def match(
+        self,
+        output: Union[str, bytes],
+        expected: Union[str, bytes],
+        encoding: str = "utf-8",
+    ) -> MatchOutcome:
+        """Compare a whole *output* that is already in memory."""
+
+        matcher = self.matcher(expected, encoding)
+        if isinstance(output, str):
+            matcher.feed_text(output)
+        else:
+            matcher.feed(output)
+        return matcher.finish()
+
+
+@dataclass(frozen=True, slots=True)
+class ExactComparator(Comparator):
+    """The whole stripped output equals the stripped answer."""
+
+    name: ClassVar[str] = "exact"
+
+    def matcher(self, expected: Union[str, bytes], encoding: str = "utf-8") -> StreamMatcher:
+        return OutputMatcher(expected, encoding)
+
+
+@dataclass(frozen=True, slots=True)
+class TokenComparator(Comparator):
+    """The same whitespace-separated tokens, however they are laid out."""
+
+    name: ClassVar[str] = "tokens"
+
+    def matcher(self, expected: Union[str, bytes], encoding: str = "utf-8") -> StreamMatcher:
+        return TokenMatcher(expected, encoding)
+
+
+@dataclass(frozen=True, slots=True)
+class NumericComparator(Comparator):
+    """Tokens, with numbers compared within *abs_tol* or *rel_tol*."""
+
+    name: ClassVar[str] = "numeric"
+    options: ClassVar[Dict[str, str]] = {"abs": "abs_tol", "rel": "rel_tol"}
+
+    abs_tol: float = 1e-6
+    rel_tol: float = 1e-6
+
+    def __post_init__(self) -> None:
+        if self.abs_tol < 0 or self.rel_tol < 0 or math.isnan(self.abs_tol + self.rel_tol):
+            raise ValueError("Допуск сравнения должен быть неотрицательным числом")
+
+    @property
+    def spec(self) -> str:
+        return f"{self.name} abs={self.abs_tol!r} rel={self.rel_tol!r}"
+
+    def matcher(self, expected: Union[str, bytes], encoding: str = "utf-8") -> StreamMatcher:
+        return NumericMatcher(expected, encoding, abs_tol=self.abs_tol, rel_tol=self.rel_tol)
+
+
+@dataclass(frozen=True, slots=True)
+class UnorderedLinesComparator(Comparator):
+    """The same lines in any order."""
+
+    name: ClassVar[str] = "unordered"
+
+    def matcher(self, expected: Union[str, bytes], encoding: str = "utf-8") -> StreamMatcher:
+        return UnorderedLinesMatcher(expected, encoding)
+
+
+_COMPARATOR_CLASSES = {
+    cls.name: cls
+    for cls in (ExactComparator, TokenComparator, NumericComparator, UnorderedLinesComparator)
+}
+
+COMPARATORS = tuple(_COMPARATOR_CLASSES)
+
+
+@functools.lru_cache(maxsize=64)
+def _parse_spec(spec: str) -> Comparator:
+    name, *options = spec.split() or [ExactComparator.name]
+    cls = _COMPARATOR_CLASSES.get(name)
+    if cls is None:
+        raise ValueError(f"Неизвестный способ сравнения: {name!r}")
+    values: Dict[str, float] = {}
+    for option in options:
+        key, separator, value = option.partition("=")
+        if not separator or key not in cls.options:
+            raise ValueError(f"Неизвестный параметр сравнения {name!r}: {option!r}")
+        try:
+            values[cls.options[key]] = float(value)
+        except ValueError:
+            raise ValueError(f"Параметр сравнения {key!r} должен быть числом") from None
+    return cls(**values)
+
+
+def get_comparator(spec: Union[str, Comparator, None] = None) -> Comparator:
+    """Return the comparator for *spec*.
+
+    *spec* is a rule name from :data:`COMPARATORS` optionally followed by
+    ``key=value`` options, e.g. ``"numeric abs=1e-6 rel=0"``; ``None`` or
+    an empty string mean ``"exact"``.  Comparator objects are returned as
+    they are.  Raises :class:`ValueError` for an unknown rule or option.
+    """
+
+    if isinstance(spec, Comparator):
+        return spec
+    return _parse_spec((spec or "").strip())
@@ -0,0 +1,724 @@
+"""Run a suite on several worker processes, possibly on other machines.
+
+A :class:`Coordinator` listens on a TCP address; workers started with
+``python -m test_runner.distributed HOST:PORT`` (or :func:`run_worker`)
+connect to it and stay connected between runs.  For every run the
+coordinator ships the script (with the modules it imports from its own
+folder) to the workers, splits the cases into batches and keeps every
+worker supplied with up to two batches, so a worker never waits for the
+network between batches.  A worker runs each batch with
+:func:`~test_runner.executor.iter_test_results` and streams every
+:class:`~test_runner.executor.TestResult` back as soon as it finishes.
+
+When a worker disconnects (it died, was killed or lost the network) the
+cases it had not reported yet go back to the front of the queue and are
+picked up by the remaining workers.  A worker that loses the coordinator
+kills the process groups of its running cases; one that dies itself leaves
+that to a small guardian process, so its cases do not run on unattended.  :meth:`Coordinator.stats` reports the
+throughput of every worker.
+
+Messages are pickled, so both ends authenticate with a shared *authkey*
+(``multiprocessing.connection`` HMAC handshake); by default it is taken
+from the ``TEST_RUNNER_AUTHKEY`` environment variable.  Spill files of
+truncated results (``TestResult.stdout_file``) are paths on the worker's
+machine.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection, Listener
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from ._text import text_encoding
+from .cases import TestCase
+from .compare import get_comparator
+from .executor import (
+    EXECUTION_MODES,
+    CancelToken,
+    TestResult,
+    _Codec,
+    _duplicate_key,
+    _fan_out,
+    iter_test_results,
+)
+
+if TYPE_CHECKING:
+    from .compare import Comparator
+    from .history import RunHistory
+
+__all__ = [
+    "Coordinator",
+    "WorkerStats",
+    "run_worker",
+    "spawn_local_workers",
+    "describe_worker_stats",
+    "parse_address",
+    "AUTHKEY_ENV",
+    "DEFAULT_BATCH_SIZE",
+]
+
+AUTHKEY_ENV = "TEST_RUNNER_AUTHKEY"
+DEFAULT_BATCH_SIZE = 32
+# Batches a worker holds at once: the one it runs and the next one.
+_PREFETCH_BATCHES = 2
+# How often idle loops look for new work, cancellation and dead workers.
+_POLL_INTERVAL = 0.05
+
+_ADDRESS_ERROR = "Адрес должен иметь вид ХОСТ:ПОРТ"
+_GUARDIAN_MAIN = Path(__file__).with_name("_guardian_main.py")
+
+
+def parse_address(text: str) -> Tuple[str, int]:
+    """Parse ``HOST:PORT`` (``[::1]:PORT`` for IPv6 hosts)."""
+
+    host, separator, port = text.rpartition(":")
+    if not separator or not port.isdigit():
+        raise ValueError(_ADDRESS_ERROR)
+    return host.strip("[]") or "127.0.0.1", int(port)
+
+
+def _authkey(authkey: Optional[bytes]) -> bytes:
+    if authkey is not None:
+        return authkey
+    value = os.environ.get(AUTHKEY_ENV)
+    if not value:
+        raise RuntimeError(f"Не задан общий ключ: установите переменную окружения {AUTHKEY_ENV}")
+    return value.encode()
+
+
+@dataclass(slots=True)
+class WorkerStats:
+    """Work done by one worker during the last run.
+
+    ``busy`` is the sum of the ``elapsed`` times of its cases; ``wall`` the
+    time from the first batch it received to its last result.  ``requeued``
+    counts the cases it still held when it was lost.
+    """
+
+    name: str
+    slots: int
+    cases: int = 0
+    failures: int = 0
+    busy: float = 0.0
+    requeued: int = 0
+    alive: bool = True
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+    @property
+    def wall(self) -> float:
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+    @property
+    def throughput(self) -> Optional[float]:
+        """Cases per second over :attr:`wall`."""
+
+        wall = self.wall
+        return self.cases / wall if wall > 0 else None
+
+
+def describe_worker_stats(stats: Sequence[WorkerStats]) -> List[str]:
+    """One Russian line per worker, for logs and the command line."""
+
+    lines = []
+    for worker in stats:
+        throughput = worker.throughput
+        line = (
+            f"{worker.name}: тестов {worker.cases}, ошибок {worker.failures}, "
+            f"{f'{throughput:.1f} тест/с' if throughput is not None else '— тест/с'} "
+            f"(потоков {worker.slots}, занято {worker.busy:.2f} с из {worker.wall:.2f} с)"
+        )
+        if not worker.alive:
+            line += f"; отключился, передано другим: {worker.requeued}"
+        lines.append(line)
+    return lines
+
+
+def _script_files(script: Path) -> Dict[str, bytes]:
+    """The script and the modules it imports from its folder, by relative path."""
+
+    from .cache import _local_modules
+
+    root = script.parent
+    files = {script.name: script.read_bytes()}
+    for module in _local_modules(script):
+        files[module.relative_to(root).as_posix()] = module.read_bytes()
+    return files
+
+
+class _Run:
+    """State of one distributed run, shared by the connection handlers."""
+
+    def __init__(self, number: int, cases: List[TestCase], setup: Dict[str, Any]) -> None:
+        self.number = number
+        self.cases = cases
+        # Positions in ``cases`` not handed to any worker yet.
+        self.pending: Deque[int] = deque(range(len(cases)))
+        # ``(position, result)`` pairs reported by the workers.
+        self.results: queue.Queue[Tuple[int, TestResult]] = queue.Queue()
+        self.setup = setup
+        self.finished = False
+
+
+class Coordinator:
+    """Hands out batches of cases to connected workers and collects results.
+
+    *address* is where workers connect (port ``0`` picks a free port, see
+    :attr:`address`).  Workers may connect before or during a run; one run
+    may be in progress at a time.
+    """
+
+    def __init__(
+        self,
+        address: Tuple[str, int] = ("127.0.0.1", 0),
+        *,
+        authkey: Optional[bytes] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> None:
+        self.batch_size = max(1, batch_size)
+        self._authkey = _authkey(authkey)
+        self._listener = Listener(address, authkey=self._authkey)
+        self.address: Tuple[str, int] = self._listener.address
+        self._condition = threading.Condition()
+        self._run: Optional[_Run] = None
+        self._run_numbers = itertools.count(1)
+        self._stats: Dict[str, WorkerStats] = {}
+        self._connections: List[Connection] = []
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+        self._acceptor = threading.Thread(target=self._accept, name="coordinator-accept", daemon=True)
+        self._acceptor.start()
+
+    def __enter__(self) -> "Coordinator":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    # Connections ------------------------------------------------------
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                connection = self._listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                if self._closed:
+                    return
+                # A failed handshake (wrong key) or a client that went away.
+                continue
+            if self._closed:
+                connection.close()
+                return
+            thread = threading.Thread(target=self._serve, args=(connection,), daemon=True)
+            with self._condition:
+                self._connections.append(connection)
+                self._threads.append(thread)
+            thread.start()
+
+    def _register(self, hello: Dict[str, Any]) -> WorkerStats:
+        base = str(hello.get("name") or "worker")
+        with self._condition:
+            name = base
+            for number in itertools.count(2):
+                if name not in self._stats or not self._stats[name].alive:
+                    break
+                name = f"{base}#{number}"
+            worker = self._stats[name] = WorkerStats(name, max(1, int(hello.get("slots", 1))))
+            self._condition.notify_all()
+        return worker
+
+    def _serve(self, connection: Connection) -> None:
+        worker: Optional[WorkerStats] = None
+        run: Optional[_Run] = None
+        # Position in ``run.cases`` -> case, for cases the worker holds.
+        assigned: Dict[int, TestCase] = {}
+        prepared = False
+        try:
+            kind, hello = connection.recv()
+            if kind != "hello":
+                return
+            worker = self._register(hello)
+            while True:
+                batch: List[int] = []
+                with self._condition:
+                    if self._closed:
+                        return
+                    if run is not None and self._run is not run:
+                        if prepared:
+                            connection.send(("end", run.number))
+                        run, assigned, prepared = None, {}, False
+                    if run is None and self._run is not None and not self._run.finished:
+                        run = self._run
+                    if run is not None and len(assigned) <= (_PREFETCH_BATCHES - 1) * self.batch_size:
+                        while run.pending and len(batch) < self.batch_size:
+                            batch.append(run.pending.popleft())
+                if batch:
+                    assert run is not None
+                    if not prepared:
+                        connection.send(("setup", run.number, run.setup))
+                        prepared = True
+                    for position in batch:
+                        assigned[position] = run.cases[position]
+                    if worker.started is None:
+                        worker.started = time.monotonic()
+                    # Positions stand in for indexes, which need not be unique.
+                    connection.send(
+                        (
+                            "batch",
+                            run.number,
+                            [replace(run.cases[position], index=position) for position in batch],
+                        )
+                    )
+                    continue
+                if not connection.poll(_POLL_INTERVAL):
+                    continue
+                kind, number, result = connection.recv()
+                if run is None or number != run.number:
+                    # Late results of a finished or cancelled run.
+                    continue
+                case = assigned.pop(result.case.index, None)
+                if case is None:
+                    continue
+                position = result.case.index
+                result.case.index = case.index
+                result.worker = worker.name
+                # Only a complete result may reach the consumer thread.
+                run.results.put((position, result))
+                worker.cases += 1
+                worker.failures += result.has_error
+                if result.elapsed == result.elapsed:
+                    worker.busy += result.elapsed
+                worker.finished = time.monotonic()
+        except (EOFError, OSError, ValueError, TypeError):
+            pass
+        finally:
+            with self._condition:
+                if worker is not None:
+                    worker.alive = False
+                if run is not None and assigned and self._run is run:
+                    run.pending.extendleft(sorted(assigned, reverse=True))
+                    if worker is not None:
+                        worker.requeued += len(assigned)
+                if connection in self._connections:
+                    self._connections.remove(connection)
+                self._condition.notify_all()
+            connection.close()
+
+    # Runs -------------------------------------------------------------
+
+    def wait_for_workers(self, count: int = 1, timeout: Optional[float] = None) -> bool:
+        """Block until *count* workers are connected; ``False`` on timeout."""
+
+        with self._condition:
+            return self._condition.wait_for(lambda: len(self.workers()) >= count, timeout)
+
+    def workers(self) -> List[str]:
+        """Names of the connected workers."""
+
+        return [name for name, worker in self._stats.items() if worker.alive]
+
+    def stats(self) -> List[WorkerStats]:
+        """Per-worker figures of the current or last run, including lost workers."""
+
+        with self._condition:
+            return [replace(worker) for worker in self._stats.values()]
+
+    def iter_results(
+        self,
+        test_cases: Iterable[TestCase],
+        script_path: Path,
+        *,
+        cancel: Optional[CancelToken] = None,
+        history: Optional[RunHistory] = None,
+        max_failures: Optional[int] = None,
+        reference: Optional[Path] = None,
+        worker_timeout: Optional[float] = 60.0,
+        **options: Any,
+    ) -> Iterator[TestResult]:
+        """Yield a :class:`TestResult` for every case as the workers finish them.
+
+        *options* (``timeout``, ``stop_on_divergence``, ``deduplicate``,
+        ``binary``, ``encoding``, ``comparator``, ``output_buffer``,
+        ``output_kill_limit``) are passed to
+        :func:`~test_runner.executor.iter_test_results` on every worker;
+        each worker uses its own ``workers`` and ``mode``.  *history* orders
+        the cases before they are split and records the results.  The run
+        fails with :class:`RuntimeError` when no worker has been connected
+        for *worker_timeout* seconds while cases are waiting.
+        """
+
+        if options.get("adaptive_timeout") is not None:
+            raise ValueError("Адаптивный тайм-аут недоступен при распределённом запуске")
+        comparator: str | Comparator | None = options.get("comparator")
+        if comparator is not None and not isinstance(comparator, str):
+            options["comparator"] = comparator.spec
+        cases = list(test_cases)
+        if history is not None:
+            cases = history.order(cases, longest_first=True)
+        total = len(cases)
+
+        # Only the first case of every distinct input is sent out; the
+        # others reuse its result, as in a local run.
+        duplicates: Dict[int, List[TestCase]] = {}
+        if options.get("deduplicate", True):
+            key_expected = bool(options.get("stop_on_divergence")) and reference is None
+            first: Dict[bytes, int] = {}
+            unique: List[TestCase] = []
+            for case in cases:
+                key = _duplicate_key(case, key_expected)
+                position = first.get(key)
+                if position is None:
+                    first[key] = len(unique)
+                    unique.append(case)
+                else:
+                    duplicates.setdefault(position, []).append(case)
+            cases = unique
+        codec = _Codec(options.get("encoding") or text_encoding(), bool(options.get("binary")))
+        default_comparator = get_comparator(options.get("comparator"))
+
+        setup: Dict[str, Any] = {"script": _script_files(script_path.resolve()), "options": options}
+        if reference is not None:
+            setup["reference"] = _script_files(reference.resolve())
+        run = _Run(next(self._run_numbers), cases, setup)
+        with self._condition:
+            if self._run is not None:
+                raise RuntimeError("Координатор уже выполняет другой запуск")
+            self._run = run
+            for name, worker in list(self._stats.items()):
+                if worker.alive:
+                    worker.cases = worker.failures = worker.requeued = 0
+                    worker.busy = 0.0
+                    worker.started = worker.finished = None
+                else:
+                    del self._stats[name]
+            self._condition.notify_all()
+
+        remaining = total
+        failures = 0
+        idle_since: Optional[float] = None
+        try:
+            while remaining:
+                if cancel is not None and cancel.cancelled:
+                    return
+                if max_failures is not None and failures >= max_failures:
+                    return
+                try:
+                    position, result = run.results.get(timeout=_POLL_INTERVAL)
+                except queue.Empty:
+                    if self.workers():
+                        idle_since = None
+                    elif idle_since is None:
+                        idle_since = time.monotonic()
+                    elif worker_timeout is not None and time.monotonic() - idle_since > worker_timeout:
+                        raise RuntimeError("Нет подключённых исполнителей") from None
+                    continue
+                batch = [result]
+                for duplicate in duplicates.get(position, ()):
+                    batch.append(
+                        _fan_out(
+                            result,
+                            codec.case(duplicate),
+                            rejudge=reference is None,
+                            comparator=default_comparator,
+                            encoding=codec.encoding,
+                        )
+                    )
+                for result in batch:
+                    remaining -= 1
+                    failures += result.has_error
+                    if history is not None:
+                        history.record(result)
+                    yield result
+        finally:
+            with self._condition:
+                run.finished = True
+                run.pending.clear()
+                self._run = None
+                self._condition.notify_all()
+            if history is not None:
+                history.flush()
+
+    def run(self, test_cases: Iterable[TestCase], script_path: Path, **kwargs: Any) -> List[TestResult]:
+        """Collect :meth:`iter_results` in the order of ``TestCase.index``."""
+
+        return sorted(self.iter_results(test_cases, script_path, **kwargs), key=lambda result: result.case.index)
+
+    def close(self) -> None:
+        """Stop accepting workers and disconnect the connected ones."""
+
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            connections = list(self._connections)
+        # Wake the accepting thread, which is blocked in ``accept``.
+        try:
+            Client(self.address, authkey=self._authkey).close()
+        except (OSError, EOFError, AuthenticationError):
+            pass
+        self._listener.close()
+        for connection in connections:
+            try:
+                connection.close()
+            except OSError:
+                pass
+        self._acceptor.join()
+        for thread in self._threads:
+            thread.join()
+
+
+# Worker side ------------------------------------------------------------
+
+
+class _Guardian:
+    """Tells a watchdog process (see ``_guardian_main.py``) which process
+    groups of cases are running, so it can kill them if the worker dies."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._process: Optional[subprocess.Popen] = None
+        if hasattr(os, "killpg"):
+            self._process = subprocess.Popen(
+                [sys.executable, str(_GUARDIAN_MAIN)],
+                stdin=subprocess.PIPE,
+                start_new_session=True,
+            )
+
+    def _send(self, line: str) -> None:
+        if self._process is None:
+            return
+        assert self._process.stdin is not None
+        with self._lock:
+            try:
+                self._process.stdin.write(line.encode() + b"\n")
+                self._process.stdin.flush()
+            except (BrokenPipeError, ValueError):
+                pass
+
+    def add(self, pid: int) -> None:
+        self._send(f"+{pid}")
+
+    def discard(self, pid: int) -> None:
+        self._send(f"-{pid}")
+
+    def close(self) -> None:
+        if self._process is None:
+            return
+        assert self._process.stdin is not None
+        with self._lock:
+            try:
+                self._process.stdin.close()
+            except BrokenPipeError:
+                pass
+        self._process.wait()
+
+
+class _GuardedToken(CancelToken):
+    """A :class:`CancelToken` that registers every watched child with a
+    :class:`_Guardian` while it runs."""
+
+    def __init__(self, guardian: _Guardian) -> None:
+        super().__init__()
+        self._guardian = guardian
+
+    @contextmanager
+    def watch(self, victim: object) -> Iterator[None]:
+        # Cold children and fork servers both lead their own process group.
+        pid = getattr(victim, "pid", None)
+        if pid is not None:
+            self._guardian.add(pid)
+        try:
+            with super().watch(victim):
+                yield
+        finally:
+            if pid is not None:
+                self._guardian.discard(pid)
+
+
+class _WorkerSession:
+    """Files and cancellation of the run a worker is taking part in."""
+
+    def __init__(self, number: int, setup: Dict[str, Any], guardian: _Guardian) -> None:
+        self.number = number
+        self.token = _GuardedToken(guardian)
+        self.directory = Path(tempfile.mkdtemp(prefix="test_runner_worker_"))
+        self.options: Dict[str, Any] = dict(setup["options"])
+        self.script = self._unpack("script", setup["script"])
+        if "reference" in setup:
+            self.options["reference"] = self._unpack("reference", setup["reference"])
+
+    def _unpack(self, folder: str, files: Dict[str, bytes]) -> Path:
+        root = self.directory / folder
+        for name, content in files.items():
+            path = root / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(content)
+        # The script is always the first entry.
+        return root / next(iter(files))
+
+    def close(self) -> None:
+        self.token.cancel()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def run_worker(
+    address: Tuple[str, int],
+    *,
+    authkey: Optional[bytes] = None,
+    workers: Optional[int] = None,
+    mode: str = "cold",
+    name: Optional[str] = None,
+) -> None:
+    """Connect to a coordinator and run the batches it sends until it disconnects.
+
+    *workers* and *mode* are passed to
+    :func:`~test_runner.executor.iter_test_results` for every batch.  When
+    the connection drops, the running cases are killed together with the
+    processes they started.
+    """
+
+    if mode not in EXECUTION_MODES:
+        raise ValueError(f"Неизвестный режим запуска: {mode!r}")
+    slots = max(1, workers or os.cpu_count() or 1)
+    connection = Client(address, authkey=_authkey(authkey))
+    connection.send(("hello", {"name": name or f"{socket.gethostname()}:{os.getpid()}", "slots": slots}))
+    inbox: queue.Queue[Optional[tuple]] = queue.Queue()
+    sessions: Dict[int, _WorkerSession] = {}
+    lock = threading.Lock()
+    guardian = _Guardian()
+
+    def receive() -> None:
+        # Reads ahead so that an ``end`` cancels the batch in progress.
+        try:
+            while True:
+                message = connection.recv()
+                if message[0] == "end":
+                    with lock:
+                        session = sessions.get(message[1])
+                    if session is not None:
+                        session.token.cancel()
+                inbox.put(message)
+        except (EOFError, OSError):
+            with lock:
+                for session in sessions.values():
+                    session.token.cancel()
+            inbox.put(None)
+
+    reader = threading.Thread(target=receive, name="worker-receive", daemon=True)
+    reader.start()
+    try:
+        while (message := inbox.get()) is not None:
+            kind, number = message[0], message[1]
+            if kind == "setup":
+                with lock:
+                    sessions[number] = _WorkerSession(number, message[2], guardian)
+            elif kind == "end":
+                with lock:
+                    session = sessions.pop(number, None)
+                if session is not None:
+                    session.close()
+            elif kind == "batch":
+                session = sessions.get(number)
+                if session is None or session.token.cancelled:
+                    continue
+                results = iter_test_results(
+                    message[2],
+                    session.script,
+                    workers=slots,
+                    mode=mode,
+                    cancel=session.token,
+                    **session.options,
+                )
+                for result in results:
+                    connection.send(("result", number, result))
+    except (EOFError, OSError):
+        pass
+    finally:
+        connection.close()
+        for session in sessions.values():
+            session.close()
+        guardian.close()
+
+
+def spawn_local_workers(
+    address: Tuple[str, int],
+    count: int,
+    *,
+    authkey: Optional[bytes] = None,
+    workers: int = 1,
+    mode: str = "cold",
+) -> List[subprocess.Popen]:
+    """Start *count* worker processes on this machine connected to *address*.
+
+    The caller owns the processes; they exit when the coordinator closes.
+    """
+
+    host, port = address
+    environment = dict(os.environ, **{AUTHKEY_ENV: _authkey(authkey).decode()})
+    package_root = str(Path(__file__).resolve().parent.parent)
+    environment["PYTHONPATH"] = os.pathsep.join(filter(None, [package_root, environment.get("PYTHONPATH")]))
+    return [
+        subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "test_runner.distributed",
+                f"{host}:{port}",
+                "--workers",
+                str(workers),
+                "--mode",
+                mode,
+                "--name",
+                f"local-{number}",
+            ],
+            env=environment,
+            stdin=subprocess.DEVNULL,
+        )
+        for number in range(1, count + 1)
+    ]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m test_runner.distributed",
+        description=f"Run batches sent by a coordinator (shared key in ${AUTHKEY_ENV}).",
+    )
+    parser.add_argument("address", help="coordinator address, HOST:PORT")
+    parser.add_argument("--workers", type=int, default=None, help="parallel cases (CPU count)")
+    parser.add_argument("--mode", choices=EXECUTION_MODES, default="cold")
+    parser.add_argument("--name", default=None, help="name shown in the coordinator's statistics")
+    args = parser.parse_args(argv)
+    try:
+        address = parse_address(args.address)
+        run_worker(address, workers=args.workers, mode=args.mode, name=args.name)
+    except AuthenticationError:
+        print("Координатор отклонил ключ", file=sys.stderr)
+        return 2
+    except (ValueError, RuntimeError, OSError) as exc:
+        print(exc, file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        return 130
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
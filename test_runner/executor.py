@@ -1,101 +1,1044 @@
 from __future__ import annotations
 
+import hashlib
+import os
 import subprocess
 import sys
+import threading
 import time
-from dataclasses import dataclass
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Iterable, List
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Sequence
 
+from ._text import as_bytes, text_encoding
+from .capture import (
+    DEFAULT_OUTPUT_BUFFER,
+    DEFAULT_OUTPUT_KILL_LIMIT,
+    OutputCapture,
+    OutputLimits,
+    communicate,
+    match_spilled_output,
+)
 from .cases import TestCase
+from .compare import Comparator, ExactComparator, MatchOutcome, get_comparator, outputs_match
+from .forkserver import ForkServer, fork_available
+from .limits import LIMIT_MESSAGES, MEMORY_LIMIT_STATUS, ResourceLimits, kill_process_group
+from .tracing import record_span, span
+from .usage import ResourcePopen, usage_from_values
 
-__all__ = ["TestResult", "run_test_cases"]
+if TYPE_CHECKING:
+    from .cache import ResultCache
+    from .history import AdaptiveTimeout, RunHistory
+
+__all__ = [
+    "TestResult",
+    "CancelToken",
+    "iter_test_results",
+    "run_test_cases",
+    "is_timeout",
+    "is_output_overflow",
+    "EXECUTION_MODES",
+]
+
+EXECUTION_MODES = ("cold", "fork")
+_TIMEOUT_MESSAGE = LIMIT_MESSAGES["time"]
+_OUTPUT_OVERFLOW_MESSAGE = LIMIT_MESSAGES["output"]
+# Limits that stop a case for taking too long.
+_TIME_LIMITS = ("time", "cpu")
+_MATCH_MESSAGE = "Вывод совпадает с ожидаемым"
+_MISMATCH_MESSAGE = "Вывод отличается от ожидаемого"
+_EXECUTED_MESSAGE = "Скрипт выполнен успешно"
+_REFERENCE_MATCH_MESSAGE = "Вывод совпадает с эталонным решением"
+_REFERENCE_MISMATCH_MESSAGE = "Вывод отличается от эталонного решения"
 
 
 @dataclass(slots=True)
 class TestResult:
     case: TestCase
     status: str
-    stdout: str
-    stderr: str
+    # ``bytes`` in binary runs.
+    stdout: str | bytes
+    stderr: str | bytes
     elapsed: float
     message: str
+    startup: Optional[float] = None
+    cached: bool = False
+    returncode: Optional[int] = None
+    user_time: Optional[float] = None
+    system_time: Optional[float] = None
+    max_rss_kib: Optional[int] = None
+    voluntary_switches: Optional[int] = None
+    involuntary_switches: Optional[int] = None
+    # Set when the output outgrew the in-memory buffer: ``stdout``/``stderr``
+    # then hold only a prefix and the ``*_file`` paths point to the rest.
+    truncated: bool = False
+    stdout_file: Optional[str] = None
+    stderr_file: Optional[str] = None
+    # Where stdout stopped matching the expected output (character offset in
+    # ``stdout`` and 1-based line); only filled in divergence mode.
+    divergence_offset: Optional[int] = None
+    divergence_line: Optional[int] = None
+    # Wall time of the reference script on the same input (differential runs).
+    reference_elapsed: Optional[float] = None
+    # Copied from the run of another case with the same input.
+    deduplicated: bool = False
+    # Name of the worker that ran the case in a distributed run.
+    worker: Optional[str] = None
+    # The limit that stopped the case: "time" (wall clock), "cpu", "memory"
+    # or "output".
+    limit: Optional[str] = None
 
     @property
     def has_error(self) -> bool:
-        return self.status in {"error", "failed"}
+        return self.status in {"error", "failed", MEMORY_LIMIT_STATUS}
 
+    @property
+    def speedup(self) -> Optional[float]:
+        """How many times faster than the reference script the case ran."""
 
-def _normalize(text: str) -> str:
-    return text.strip()
+        if self.reference_elapsed is None or not self.elapsed > 0:
+            return None
+        return self.reference_elapsed / self.elapsed
 
 
-def run_test_cases(
-    test_cases: Iterable[TestCase],
-    script_path: Path,
+def _default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def is_timeout(result: TestResult) -> bool:
+    """Return ``True`` when *result*'s case ran out of wall-clock or CPU time."""
+
+    return result.limit in _TIME_LIMITS
+
+
+def is_output_overflow(result: TestResult) -> bool:
+    """Return ``True`` when *result*'s process was killed for printing too much."""
+
+    return result.message == _OUTPUT_OVERFLOW_MESSAGE
+
+
+def _timeout_result(
+    case: TestCase,
+    timeout: float | None,
     *,
-    timeout: float | None = None,
-) -> List[TestResult]:
-    results: List[TestResult] = []
-    script = script_path.resolve()
+    rusage: Optional[Sequence[float]] = None,
+    binary: bool = False,
+) -> TestResult:
+    empty = b"" if binary else ""
+    return TestResult(
+        case=case,
+        status="error",
+        stdout=empty,
+        stderr=empty,
+        elapsed=timeout if timeout is not None else float("nan"),
+        message=_TIMEOUT_MESSAGE,
+        limit="time",
+        **usage_from_values(rusage),  # type: ignore[arg-type]
+    )
 
-    for case in test_cases:
-        start = time.perf_counter()
+
+def _build_result(
+    case: TestCase,
+    returncode: int,
+    stdout: str | bytes,
+    stderr: str | bytes,
+    elapsed: float,
+    *,
+    encoding: Optional[str] = None,
+    comparator: Optional[Comparator] = None,
+    startup: Optional[float] = None,
+    rusage: Optional[Sequence[float]] = None,
+    stdout_file: Optional[str] = None,
+    stderr_file: Optional[str] = None,
+    overflowed: bool = False,
+    match: Optional[MatchOutcome] = None,
+    diverged: bool = False,
+    resources: Optional[ResourceLimits] = None,
+) -> TestResult:
+    usage = usage_from_values(rusage)
+    limit = None
+    if overflowed:
+        limit = "output"
+    elif resources is not None:
+        limit = resources.exceeded(returncode, usage, stderr)
+    if limit == "memory":
+        assert resources is not None and resources.memory is not None
+        status = MEMORY_LIMIT_STATUS
+        message = f"{LIMIT_MESSAGES[limit]} ({resources.memory / (1024 * 1024):.0f} МиБ)"
+        if usage["max_rss_kib"] is not None:
+            message += f", пик {usage['max_rss_kib'] / 1024:.1f} МиБ"
+    elif limit is not None:
+        status = "error"
+        message = LIMIT_MESSAGES[limit]
+    elif diverged:
+        assert match is not None
+        status = "failed"
+        message = f"{_MISMATCH_MESSAGE} (строка {match.line}), процесс остановлен досрочно"
+    elif returncode != 0:
+        status = "error"
+        message = (
+            "Скрипт завершился с ошибкой. "
+            f"Код выхода: {returncode}."
+        )
+    elif case.expected_output is not None:
+        if match is None and stdout_file is not None:
+            match = match_spilled_output(stdout_file, case.expected_output, encoding, comparator)
+        elif match is None and comparator is not None and not isinstance(comparator, ExactComparator):
+            match = comparator.match(stdout, case.expected_output, encoding or text_encoding())
+        if match is not None:
+            matches = match.matched
+        else:
+            matches = outputs_match(stdout, case.expected_output)
+        if matches:
+            status = "passed"
+            message = _MATCH_MESSAGE
+        else:
+            status = "failed"
+            message = _MISMATCH_MESSAGE
+            if match is not None:
+                message += f" (строка {match.line})"
+    else:
+        status = "executed"
+        message = _EXECUTED_MESSAGE
+
+    return TestResult(
+        case=case,
+        status=status,
+        stdout=stdout,
+        stderr=stderr,
+        elapsed=elapsed,
+        message=message,
+        startup=startup,
+        returncode=returncode,
+        truncated=overflowed or diverged or stdout_file is not None or stderr_file is not None,
+        stdout_file=stdout_file,
+        stderr_file=stderr_file,
+        divergence_offset=None if match is None else match.offset,
+        divergence_line=None if match is None else match.line,
+        limit=limit,
+        **usage,  # type: ignore[arg-type]
+    )
+
+
+class CancelToken:
+    """Cancels a running suite and kills the child processes it started.
+
+    Pass the token to :func:`iter_test_results` (or :func:`run_test_cases`)
+    and call :meth:`cancel` from any thread.  Cases that have not started yet
+    are skipped and running children are killed immediately.
+    """
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._victims: set[object] = set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        self._event.set()
+        with self._lock:
+            victims = list(self._victims)
+        for victim in victims:
+            _kill_quietly(victim)
+
+    @contextmanager
+    def watch(self, victim: object) -> Iterator[None]:
+        """Kill *victim* (anything with a ``kill()`` method) on cancellation."""
+
+        with self._lock:
+            self._victims.add(victim)
+        if self.cancelled:
+            _kill_quietly(victim)
         try:
-            completed = subprocess.run(
-                [sys.executable, str(script)],
-                input=case.input_data,
-                text=True,
-                capture_output=True,
-                timeout=timeout,
-                check=False,
-            )
+            yield
+        finally:
+            with self._lock:
+                self._victims.discard(victim)
+
+
+def _kill_quietly(victim: object) -> None:
+    try:
+        victim.kill()  # type: ignore[attr-defined]
+    except (OSError, ValueError):
+        pass
+
+
+class _ChildPopen(ResourcePopen):
+    """A case's child process; killing it kills its whole process group.
+
+    Started with ``start_new_session`` (see
+    :meth:`~test_runner.limits.ResourceLimits.popen_kwargs`), so processes
+    the script spawns do not outlive a timed-out or cancelled case.
+    """
+
+    def kill(self) -> None:
+        if self.returncode is None and hasattr(os, "killpg"):
+            kill_process_group(self.pid)
+        else:
+            super().kill()
+
+
+@dataclass(slots=True, frozen=True)
+class _Codec:
+    """How the texts of a run are represented: decoded, or raw ``bytes``."""
+
+    encoding: str
+    binary: bool
+
+    def case(self, case: TestCase) -> TestCase:
+        """Return *case* with its input and expected output in this representation."""
+
+        kind = bytes if self.binary else str
+        expected = case.expected_output
+        if isinstance(case.input_data, kind) and (expected is None or isinstance(expected, kind)):
+            return case
+        return replace(
+            case,
+            input_data=self._convert(case.input_data),
+            expected_output=None if expected is None else self._convert(expected),
+        )
+
+    def _convert(self, value: str | bytes) -> str | bytes:
+        if self.binary:
+            return as_bytes(value, self.encoding)
+        return value if isinstance(value, str) else value.decode(self.encoding)
+
+    def output(self, capture: OutputCapture) -> str | bytes:
+        return capture.data() if self.binary else capture.text(self.encoding)
+
+
+class _CaseRunner:
+    """Runs single cases by starting a fresh interpreter for each of them."""
+
+    def __init__(
+        self,
+        script: Path,
+        timeout: float | None,
+        token: CancelToken,
+        limits: OutputLimits,
+        stop_on_divergence: bool,
+        codec: _Codec,
+        comparator: Comparator,
+        resources: ResourceLimits = ResourceLimits(),
+        timeouts: Optional[Dict[int, float]] = None,
+    ) -> None:
+        self.script = script
+        self.timeout = timeout
+        self.token = token
+        self.limits = limits
+        self.stop_on_divergence = stop_on_divergence
+        self.codec = codec
+        self.comparator = comparator
+        self.resources = resources
+        self.timeouts = timeouts
+
+    def _comparator(self, case: TestCase) -> Comparator:
+        return _case_comparator(case, self.comparator)
+
+    def _timeout(self, case: TestCase) -> float | None:
+        """The case's own timeout (see *adaptive_timeout*), or the common one."""
+
+        if self.timeouts is None:
+            return self.timeout
+        return self.timeouts.get(case.index, self.timeout)
+
+    def _expected(self, case: TestCase) -> Optional[str | bytes]:
+        """The output to compare against while the case runs, if any."""
+
+        return case.expected_output if self.stop_on_divergence else None
+
+    def run(self, case: TestCase) -> TestResult:
+        expected = self._expected(case)
+        comparator = self._comparator(case)
+        matcher = None if expected is None else comparator.matcher(expected, self.codec.encoding)
+        stdout = OutputCapture(self.limits, ".stdout", matcher)
+        stderr = OutputCapture(self.limits, ".stderr")
+        timeout = self._timeout(case)
+        start = time.perf_counter()
+        with _ChildPopen(
+            [sys.executable, str(self.script)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            **self.resources.popen_kwargs(),
+        ) as process, self.token.watch(process):
+            try:
+                self.resources.apply_to(process.pid)
+                record_span("spawn", start, time.perf_counter())
+                with span("wait"):
+                    timed_out = communicate(
+                        process,
+                        as_bytes(case.input_data, self.codec.encoding),
+                        timeout,
+                        stdout,
+                        stderr,
+                    )
+            finally:
+                # Whatever the script left running in the background.
+                kill_process_group(process.pid)
             elapsed = time.perf_counter() - start
-        except subprocess.TimeoutExpired:
-            message = "Превышено время ожидания"
-            results.append(
-                TestResult(
-                    case=case,
-                    status="error",
-                    stdout="",
-                    stderr="",
-                    elapsed=timeout if timeout is not None else float("nan"),
-                    message=message,
-                )
+        if timed_out:
+            stdout.discard()
+            stderr.discard()
+            return _timeout_result(case, timeout, rusage=process.rusage, binary=self.codec.binary)
+        diverged = stdout.diverged
+
+        with span("compare"):
+            return _build_result(
+                case,
+                process.returncode,
+                self.codec.output(stdout),
+                self.codec.output(stderr),
+                elapsed,
+                encoding=self.codec.encoding,
+                comparator=comparator,
+                rusage=process.rusage,
+                stdout_file=stdout.path,
+                stderr_file=stderr.path,
+                overflowed=stdout.overflowed or stderr.overflowed,
+                match=None if matcher is None else matcher.finish(),
+                diverged=diverged,
+                resources=self.resources,
             )
-            continue
 
-        stdout = completed.stdout
-        stderr = completed.stderr
-        normalized_stdout = _normalize(stdout)
+    def close(self) -> None:
+        pass
+
+
+class _ForkRunner(_CaseRunner):
+    """Hands out one idle :class:`ForkServer` per concurrently running case."""
 
-        if completed.returncode != 0:
-            status = "error"
-            message = (
-                "Скрипт завершился с ошибкой. "
-                f"Код выхода: {completed.returncode}."
+    def __init__(
+        self,
+        script: Path,
+        timeout: float | None,
+        token: CancelToken,
+        limits: OutputLimits,
+        stop_on_divergence: bool,
+        codec: _Codec,
+        comparator: Comparator,
+        resources: ResourceLimits = ResourceLimits(),
+        timeouts: Optional[Dict[int, float]] = None,
+    ) -> None:
+        super().__init__(
+            script,
+            timeout,
+            token,
+            limits,
+            stop_on_divergence,
+            codec,
+            comparator,
+            resources,
+            timeouts,
+        )
+        self._idle: List[ForkServer] = []
+        self._all: List[ForkServer] = []
+        self._lock = threading.Lock()
+
+    def run(self, case: TestCase) -> TestResult:
+        comparator = self._comparator(case)
+        timeout = self._timeout(case)
+        with self._lock:
+            server = self._idle.pop() if self._idle else None
+        if server is None:
+            with span("fork_server_start"):
+                server = ForkServer(self.script)
+            with self._lock:
+                self._all.append(server)
+        try:
+            start = time.perf_counter()
+            with self.token.watch(server):
+                outcome = server.run(
+                    case.input_data,
+                    timeout=timeout,
+                    limits=self.limits,
+                    expected=self._expected(case),
+                    encoding=self.codec.encoding,
+                    binary=self.codec.binary,
+                    comparator=comparator.spec,
+                    rlimits=self.resources.rlimits(),
+                )
+            end = time.perf_counter()
+        finally:
+            if server.alive:
+                with self._lock:
+                    self._idle.append(server)
+        # The server measures how long the fork took before the script started.
+        started = start + (outcome.startup or 0.0)
+        record_span("spawn", start, started)
+        record_span("wait", started, end)
+
+        if outcome.timed_out or outcome.returncode is None:
+            result = _timeout_result(case, timeout, rusage=outcome.rusage, binary=self.codec.binary)
+            result.startup = outcome.startup
+            return result
+        with span("compare"):
+            return _build_result(
+                case,
+                outcome.returncode,
+                outcome.stdout,
+                outcome.stderr,
+                outcome.elapsed,
+                encoding=self.codec.encoding,
+                comparator=comparator,
+                startup=outcome.startup,
+                rusage=outcome.rusage,
+                stdout_file=outcome.stdout_file,
+                stderr_file=outcome.stderr_file,
+                overflowed=outcome.overflowed,
+                match=outcome.match,
+                diverged=outcome.diverged,
+                resources=self.resources,
             )
-        elif case.expected_output is not None:
-            expected = _normalize(case.expected_output)
-            if normalized_stdout == expected:
-                status = "passed"
-                message = "Вывод совпадает с ожидаемым"
-            else:
-                status = "failed"
-                message = "Вывод отличается от ожидаемого"
+
+    def close(self) -> None:
+        for server in self._all:
+            server.close()
+
+
+def _reference_output(reference: TestResult, encoding: str) -> str | bytes:
+    if reference.stdout_file is None:
+        return reference.stdout
+    if isinstance(reference.stdout, bytes):
+        with open(reference.stdout_file, "rb") as handle:
+            return handle.read()
+    with open(reference.stdout_file, encoding=encoding, errors="replace") as handle:
+        return handle.read()
+
+
+def _case_comparator(case: TestCase, default: Comparator) -> Comparator:
+    return get_comparator(case.comparator) if case.comparator else default
+
+
+def _judge(
+    result: TestResult,
+    expected: str | bytes,
+    *,
+    comparator: Optional[Comparator] = None,
+    encoding: Optional[str] = None,
+    match_message: str = _REFERENCE_MATCH_MESSAGE,
+    mismatch_message: str = _REFERENCE_MISMATCH_MESSAGE,
+) -> None:
+    """Compare a successfully finished *result* with *expected* in place."""
+
+    if result.stdout_file is not None:
+        match = match_spilled_output(result.stdout_file, expected, encoding, comparator)
+    else:
+        match = get_comparator(comparator).match(result.stdout, expected, encoding or text_encoding())
+    if match.matched:
+        result.status = "passed"
+        result.message = match_message
+        result.divergence_offset = result.divergence_line = None
+    else:
+        result.status = "failed"
+        result.message = f"{mismatch_message} (строка {match.line})"
+        result.divergence_offset = match.offset
+        result.divergence_line = match.line
+
+
+def _rejudge(result: TestResult, comparator: Comparator, encoding: str) -> None:
+    """Judge a finished *result* again by the expected output of its case, in place."""
+
+    if result.returncode != 0 or is_output_overflow(result):
+        return
+    if result.case.expected_output is None:
+        result.status = "executed"
+        result.message = _EXECUTED_MESSAGE
+        result.divergence_offset = result.divergence_line = None
+    else:
+        _judge(
+            result,
+            result.case.expected_output,
+            comparator=comparator,
+            encoding=encoding,
+            match_message=_MATCH_MESSAGE,
+            mismatch_message=_MISMATCH_MESSAGE,
+        )
+
+
+def _duplicate_key(case: TestCase, with_expected: bool) -> bytes:
+    digest = hashlib.blake2b(as_bytes(case.input_data, "utf-8", "surrogatepass"), digest_size=16)
+    if with_expected and case.expected_output is not None:
+        digest.update(b"\0" + as_bytes(case.expected_output, "utf-8", "surrogatepass"))
+        if case.comparator:
+            digest.update(b"\0" + case.comparator.encode("utf-8"))
+    return digest.digest()
+
+
+def _fan_out(
+    result: TestResult,
+    case: TestCase,
+    *,
+    rejudge: bool,
+    comparator: Comparator,
+    encoding: str,
+) -> TestResult:
+    """Reuse *result* of a case with the same input for *case*.
+
+    With *rejudge* a successful run is compared with the expected output
+    of *case* (by its own comparator, *comparator* by default); otherwise
+    the expected output of the original case (the reference output in
+    differential runs) is kept.
+    """
+
+    if not rejudge:
+        return replace(
+            result,
+            case=replace(case, expected_output=result.case.expected_output),
+            deduplicated=True,
+        )
+    copy = replace(result, case=case, deduplicated=True)
+    if (
+        case.expected_output != result.case.expected_output
+        or case.comparator != result.case.comparator
+    ):
+        _rejudge(copy, _case_comparator(case, comparator), encoding)
+    return copy
+
+
+class _Duplicates:
+    """Cases waiting for the run of an earlier case with the same input."""
+
+    __slots__ = ("result", "waiting")
+
+    def __init__(self) -> None:
+        self.result: Optional[TestResult] = None
+        self.waiting: List[TestCase] = []
+
+
+class _DifferentialRunner:
+    """Runs a candidate script and judges it by the output of a reference script.
+
+    The reference output of a case is looked up in *cache* (keyed by the
+    reference script and the input only) and otherwise computed by running
+    the reference while the candidate runs.  With a known reference output
+    the candidate runs against it directly, so stopping on divergence works;
+    results carry the reference output as the case's expected output.
+    """
+
+    def __init__(
+        self,
+        candidate: _CaseRunner,
+        reference: _CaseRunner,
+        *,
+        workers: int,
+        cache: Optional[ResultCache],
+        refresh: bool,
+    ) -> None:
+        self.candidate = candidate
+        self.reference = reference
+        self.cache = cache
+        self.refresh = refresh
+        self._digest = cache.script_digest(reference.script) if cache is not None else ""
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reference")
+
+    def _key(self, case: TestCase) -> str:
+        assert self.cache is not None
+        codec = self.reference.codec
+        encoding = None if codec.binary else codec.encoding
+        return self.cache.key(
+            self._digest, case, None, encoding=encoding, resources=self.reference.resources
+        )
+
+    def _cached_reference(self, case: TestCase) -> Optional[TestResult]:
+        if self.cache is None or self.refresh:
+            return None
+        return self.cache.get(self._key(case), case)
+
+    def _run_reference(self, case: TestCase) -> TestResult:
+        result = self.reference.run(case)
+        if (
+            self.cache is not None
+            and result.returncode == 0
+            and not is_timeout(result)
+            and not result.truncated
+        ):
+            self.cache.put(self._key(case), result)
+        return result
+
+    def run(self, case: TestCase) -> TestResult:
+        reference = self._cached_reference(case)
+        if reference is not None:
+            judged = replace(case, expected_output=reference.stdout)
+            result = self.candidate.run(judged)
         else:
-            status = "executed"
-            message = "Скрипт выполнен успешно"
-
-        results.append(
-            TestResult(
-                case=case,
-                status=status,
-                stdout=stdout,
-                stderr=stderr,
-                elapsed=elapsed,
-                message=message,
-            )
+            pending = self._pool.submit(self._run_reference, replace(case, expected_output=None))
+            result = self.candidate.run(replace(case, expected_output=None))
+            reference = pending.result()
+            judged = case
+            if reference.returncode == 0 and not is_timeout(reference):
+                encoding = self.candidate.codec.encoding
+                judged = replace(case, expected_output=_reference_output(reference, encoding))
+                if result.status == "executed":
+                    _judge(
+                        result,
+                        judged.expected_output,  # type: ignore[arg-type]
+                        comparator=self.candidate._comparator(case),
+                        encoding=encoding,
+                    )
+
+        result.case = judged
+        if reference.returncode != 0 or is_timeout(reference):
+            if result.status not in ("error", MEMORY_LIMIT_STATUS):
+                result.status = "error"
+                result.message = f"Эталонное решение: {reference.message}"
+            return result
+        result.reference_elapsed = reference.elapsed
+        if result.status == "passed":
+            result.message = _REFERENCE_MATCH_MESSAGE
+        elif result.status == "failed":
+            result.message = result.message.replace(_MISMATCH_MESSAGE, _REFERENCE_MISMATCH_MESSAGE)
+        return result
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self.candidate.close()
+        self.reference.close()
+
+
+def _run_case(runner: _CaseRunner | _DifferentialRunner, case: TestCase) -> TestResult:
+    with span("case", "case", index=case.index, label=case.label):
+        return runner.run(case)
+
+
+def iter_test_results(
+    test_cases: Iterable[TestCase],
+    script_path: Path,
+    *,
+    timeout: float | None = None,
+    workers: int | None = None,
+    mode: str = "cold",
+    cancel: CancelToken | None = None,
+    cache: Optional[ResultCache] = None,
+    refresh: bool = False,
+    output_buffer: int = DEFAULT_OUTPUT_BUFFER,
+    output_kill_limit: Optional[int] = DEFAULT_OUTPUT_KILL_LIMIT,
+    stop_on_divergence: bool = False,
+    history: Optional[RunHistory] = None,
+    max_failures: Optional[int] = None,
+    reference: Optional[Path] = None,
+    deduplicate: bool = True,
+    binary: bool = False,
+    encoding: Optional[str] = None,
+    comparator: str | Comparator | None = None,
+    cpu_limit: Optional[float] = None,
+    memory_limit: Optional[int] = None,
+    adaptive_timeout: Optional[AdaptiveTimeout] = None,
+) -> Iterator[TestResult]:
+    """Yield a :class:`TestResult` for every case as soon as it finishes.
+
+    Results arrive in completion order; the arguments have the same meaning as
+    for :func:`run_test_cases`.  At most *workers* cases are in flight at any
+    time, so the input iterable is consumed lazily (unless *history* has to
+    reorder it).  Setting *cancel* (or closing the generator) stops
+    scheduling and kills the running children.
+    """
+
+    if mode not in EXECUTION_MODES:
+        raise ValueError(f"Неизвестный режим запуска: {mode!r}")
+    if mode == "fork" and not fork_available():
+        raise RuntimeError("Режим fork недоступен на этой платформе")
+    if adaptive_timeout is not None and history is None:
+        raise ValueError("Адаптивному тайм-ауту нужна история запусков")
+
+    script = script_path.resolve()
+    token = cancel if cancel is not None else CancelToken()
+    if workers is None:
+        workers = _default_workers()
+    workers = max(1, workers)
+    limits = OutputLimits(output_buffer, output_kill_limit)
+    codec = _Codec(encoding or text_encoding(), binary)
+    default_comparator = get_comparator(comparator)
+    resources = ResourceLimits(cpu=cpu_limit, memory=memory_limit)
+    resources.rlimits()  # Fails early where limits are unavailable.
+    timeouts: Optional[Dict[int, float]] = None
+    if history is not None:
+        test_cases = history.order(test_cases, longest_first=workers > 1)
+        if adaptive_timeout is not None:
+            timeouts = history.timeouts(test_cases, adaptive_timeout)
+
+    runner_class = _ForkRunner if mode == "fork" else _CaseRunner
+    runner: _CaseRunner | _DifferentialRunner = runner_class(
+        script,
+        timeout,
+        token,
+        limits,
+        stop_on_divergence,
+        codec,
+        default_comparator,
+        resources,
+        timeouts,
+    )
+    if reference is not None:
+        runner = _DifferentialRunner(
+            runner,
+            runner_class(
+                reference.resolve(),
+                timeout,
+                token,
+                limits,
+                False,
+                codec,
+                default_comparator,
+                resources,
+            ),
+            workers=workers,
+            cache=cache,
+            refresh=refresh,
         )
+        # The cache now holds reference outputs; candidate results depend on
+        # them and are never cached.
+        cache = None
+
+    script_digest = cache.script_digest(script) if cache is not None else ""
+    output_encoding = None if codec.binary else codec.encoding
+
+    def cache_key(case: TestCase) -> str:
+        assert cache is not None
+        # The timeout the case actually runs with, adaptive or not.
+        case_timeout = timeout if timeouts is None else timeouts.get(case.index, timeout)
+        return cache.key(
+            script_digest, case, case_timeout, encoding=output_encoding, resources=resources
+        )
+
+    pending = iter(test_cases)
+    exhausted = False
+    failures = 0
+    in_flight: dict[Future[TestResult], TestCase] = {}
+    # Per distinct input (and, when stopping on divergence, expected output):
+    # its result, or the duplicates waiting for it while it runs.
+    duplicates: Dict[bytes, _Duplicates] = {}
+    rejudge = reference is None
+    key_expected = stop_on_divergence and rejudge
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        while True:
+            hits: List[TestResult] = []
+            while len(in_flight) < workers and len(hits) < workers and not token.cancelled:
+                if max_failures is not None and failures >= max_failures:
+                    exhausted = True
+                    break
+                case = next(pending, None)
+                if case is None:
+                    exhausted = True
+                    break
+                case = codec.case(case)
+                group = None
+                if deduplicate:
+                    key = _duplicate_key(case, key_expected)
+                    group = duplicates.get(key)
+                    if group is not None:
+                        if group.result is None:
+                            group.waiting.append(case)
+                        else:
+                            hit = _fan_out(
+                                group.result,
+                                case,
+                                rejudge=rejudge,
+                                comparator=default_comparator,
+                                encoding=codec.encoding,
+                            )
+                            hits.append(hit)
+                            failures += hit.has_error
+                        continue
+                    group = duplicates[key] = _Duplicates()
+                if cache is not None and not refresh:
+                    hit = cache.get(cache_key(case), case)
+                    if hit is not None:
+                        # The entry may have been judged by another answer or rule.
+                        _rejudge(hit, _case_comparator(case, default_comparator), codec.encoding)
+                        if group is not None:
+                            group.result = hit
+                        hits.append(hit)
+                        failures += hit.has_error
+                        continue
+                in_flight[executor.submit(_run_case, runner, case)] = case
+            yield from hits
+            if token.cancelled or (exhausted and not in_flight):
+                return
+            if not in_flight:
+                continue
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in sorted(done, key=lambda item: in_flight[item].index):
+                case = in_flight.pop(future)
+                if token.cancelled:
+                    return
+                result = future.result()
+                failures += result.has_error
+                if cache is not None and result.limit is None and not result.truncated:
+                    cache.put(cache_key(case), result)
+                if history is not None:
+                    history.record(result)
+                yield result
+                if deduplicate:
+                    group = duplicates[_duplicate_key(case, key_expected)]
+                    group.result = result
+                    waiting, group.waiting = group.waiting, []
+                    for duplicate in waiting:
+                        copy = _fan_out(
+                            result,
+                            duplicate,
+                            rejudge=rejudge,
+                            comparator=default_comparator,
+                            encoding=codec.encoding,
+                        )
+                        failures += copy.has_error
+                        yield copy
+    finally:
+        if in_flight:
+            token.cancel()
+        executor.shutdown(wait=True, cancel_futures=True)
+        runner.close()
+        if history is not None:
+            history.flush()
 
+
+def run_test_cases(
+    test_cases: Iterable[TestCase],
+    script_path: Path,
+    *,
+    timeout: float | None = None,
+    workers: int | None = None,
+    mode: str = "cold",
+    cancel: CancelToken | None = None,
+    cache: Optional[ResultCache] = None,
+    refresh: bool = False,
+    output_buffer: int = DEFAULT_OUTPUT_BUFFER,
+    output_kill_limit: Optional[int] = DEFAULT_OUTPUT_KILL_LIMIT,
+    stop_on_divergence: bool = False,
+    history: Optional[RunHistory] = None,
+    max_failures: Optional[int] = None,
+    reference: Optional[Path] = None,
+    deduplicate: bool = True,
+    binary: bool = False,
+    encoding: Optional[str] = None,
+    comparator: str | Comparator | None = None,
+    cpu_limit: Optional[float] = None,
+    memory_limit: Optional[int] = None,
+    adaptive_timeout: Optional[AdaptiveTimeout] = None,
+) -> List[TestResult]:
+    """Execute *script_path* once per test case and collect the results.
+
+    Cases are run concurrently by up to *workers* child processes (the CPU
+    count by default).  Every case is timed and timed out individually, so a
+    hanging case only occupies its own slot.  Results are returned in the
+    order of ``TestCase.index``.
+
+    With ``mode="cold"`` every case starts a fresh interpreter.  ``mode="fork"``
+    keeps one warm interpreter per worker (see :class:`ForkServer`) and forks
+    it for each case; ``TestResult.startup`` then reports the part of
+    ``elapsed`` spent before the script's code started running.
+
+    With a :class:`~test_runner.cache.ResultCache`, cases whose script,
+    interpreter, input, timeout (the case's own one with *adaptive_timeout*),
+    resource limits and encoding were seen before are answered from the
+    cache (``TestResult.cached`` is set) and only the rest are executed;
+    *refresh* forces every case to run again and overwrites its entry.
+    Results stopped by a limit are never cached.
+
+    Each output stream keeps at most *output_buffer* bytes in memory; a
+    longer stream is spilled to a temporary file named by
+    ``TestResult.stdout_file``/``stderr_file`` and the result is marked
+    ``truncated`` (such results are not cached either).  A process whose
+    stream passes *output_kill_limit* bytes is killed and reported as an
+    error; ``None`` disables that limit.
+
+    With *stop_on_divergence*, stdout of cases with an expected output is
+    compared while it arrives and the process is killed as soon as the
+    output can no longer match; such a case fails right away (its output is
+    ``truncated``) instead of running to completion or to the timeout.
+    ``TestResult.divergence_offset``/``divergence_line`` then tell where the
+    output went wrong, for every failed case.
+
+    With a :class:`~test_runner.history.RunHistory`, cases that failed last
+    time (or are new) start first and, with more than one worker, longer
+    cases start before shorter ones; every executed case updates the
+    history.  *max_failures* stops scheduling new cases once that many
+    results were errors or failures; cases already running still finish.
+
+    With a *reference* script every case is judged by the reference output
+    instead of its own expected output: the reference runs on the same
+    input in parallel with the candidate (a case fails when the outputs
+    differ and is an error when the reference itself fails), and
+    ``TestResult.reference_elapsed``/``speedup`` compare the two.  *cache*
+    then stores reference outputs, keyed by the reference script and the
+    input, so later runs execute only the candidate; candidate results are
+    not cached in this mode.  ``result.case.expected_output`` holds the
+    reference output.
+
+    With *deduplicate* (the default) each distinct input is executed once
+    and its result is copied to the other cases with that input
+    (``TestResult.deduplicated`` is set), judged against their own
+    expected outputs; turn it off for scripts whose output is not
+    determined by their input.  One result per distinct input is kept until
+    the run ends.
+
+    With *binary* the input, the expected output and the captured output of
+    every case stay ``bytes``: text cases are encoded once with *encoding*,
+    ``TestResult.stdout``/``stderr`` hold the raw output and comparisons
+    strip ASCII whitespace and compare bytes, with no newline translation
+    (divergence offsets count bytes).  Decode only for display, for example
+    with :func:`~test_runner._text.display_text`.  Otherwise output is
+    decoded with *encoding* and cases given as ``bytes`` are decoded first;
+    *encoding* defaults to the codec ``subprocess`` uses for text pipes.
+
+    *comparator* is the rule outputs are judged by (see
+    :func:`~test_runner.compare.get_comparator`): ``"exact"`` (the default,
+    ``output.strip() == expected.strip()``), ``"tokens"``, ``"numeric
+    abs=... rel=..."`` or ``"unordered"``; a case with its own
+    ``TestCase.comparator`` uses that one.  Every rule also works while the
+    output streams in, so *stop_on_divergence* and spilled outputs are
+    judged by it too.  Cached results are judged again on every hit, so
+    changing an expected output or a rule never needs a refresh.
+
+    *cpu_limit* caps the CPU time (user plus system, in whole seconds) of
+    every case; the kernel enforces it in the child, so cases slowed down
+    by running in parallel are not stopped by it, unlike by the wall-clock
+    *timeout*.  With an :class:`~test_runner.history.AdaptiveTimeout` and a
+    *history*, every case gets its own wall-clock timeout derived from its
+    past run times (*timeout* is then used for the reference script only).
+    *memory_limit* caps the memory (in bytes) every case may allocate; a
+    case that runs out gets the status ``"memory_limit"``, counted as an
+    error, and its message gives the peak RSS it reached.
+    Each case runs in its own process group, which is killed as a whole,
+    so processes it started do not outlive it.  ``TestResult.limit`` tells
+    which limit stopped a case: ``"time"``, ``"cpu"``, ``"memory"`` or
+    ``"output"``.
+
+    While a :class:`~test_runner.tracing.Tracer` is active, every executed
+    case is recorded as a ``case`` span holding its ``spawn``, ``wait`` and
+    ``compare`` phases.
+    """
+
+    results = list(
+        iter_test_results(
+            test_cases,
+            script_path,
+            timeout=timeout,
+            workers=workers,
+            mode=mode,
+            cancel=cancel,
+            cache=cache,
+            refresh=refresh,
+            output_buffer=output_buffer,
+            output_kill_limit=output_kill_limit,
+            stop_on_divergence=stop_on_divergence,
+            history=history,
+            max_failures=max_failures,
+            reference=reference,
+            deduplicate=deduplicate,
+            binary=binary,
+            encoding=encoding,
+            comparator=comparator,
+            cpu_limit=cpu_limit,
+            memory_limit=memory_limit,
+            adaptive_timeout=adaptive_timeout,
+        )
+    )
+    results.sort(key=lambda result: result.case.index)
     return results
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import os
+import pickle
+import signal
+import struct
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Sequence
+
+from ._text import as_bytes, decode_output, text_encoding
+from .capture import OutputLimits, spill_directory
+from .compare import MatchOutcome
+
+__all__ = ["ForkServer", "ForkRun", "fork_available"]
+
+_HEADER = struct.Struct(">I")
+_SERVER_MAIN = Path(__file__).with_name("_forkserver_main.py")
+# How long :meth:`ForkServer.kill` waits for the server to clean up.
+_TERMINATE_GRACE = 1.0
+
+
+def fork_available() -> bool:
+    """Return ``True`` when the platform supports the warm interpreter mode."""
+
+    return hasattr(os, "fork") and sys.platform != "win32"
+
+
+@dataclass(slots=True)
+class ForkRun:
+    """Outcome of a single case executed by a :class:`ForkServer`."""
+
+    returncode: Optional[int]
+    # Raw ``bytes`` when the case ran with ``binary=True``.
+    stdout: str | bytes
+    stderr: str | bytes
+    elapsed: float
+    startup: float
+    timed_out: bool
+    rusage: Optional[tuple[float, float, int, int, int]] = None
+    stdout_file: Optional[str] = None
+    stderr_file: Optional[str] = None
+    overflowed: bool = False
+    match: Optional[MatchOutcome] = None
+    diverged: bool = False
+
+
+class ForkServer:
+    """A warm interpreter that forks one child per test case.
+
+    The server process is started once per script: it compiles the script and
+    imports the modules it depends on, so every forked child skips interpreter
+    start-up and those imports.  ``startup_time`` holds the one-off cost of
+    bringing the server up; ``ForkRun.startup`` is the per-case cost of forking
+    a child up to the point where the script's own code begins to run.  The
+    server runs in its own session, so :meth:`kill` also takes down the child
+    it is currently serving.
+
+    Output beyond ``limits.buffer`` bytes per stream stays in a spill file
+    whose path is returned in ``ForkRun.stdout_file``/``stderr_file``; the
+    server kills a child whose stream grows past ``limits.kill``.  Given
+    *expected* output, the server compares stdout while it is written, kills
+    the child as soon as it can no longer match (``ForkRun.diverged``) and
+    reports the comparison in ``ForkRun.match``.  Text is encoded and output
+    decoded with *encoding* (the ``subprocess`` text codec by default); with
+    ``binary=True`` the output is returned undecoded.  *comparator* is the
+    spec of the rule (see :func:`~test_runner.compare.get_comparator`) the
+    server compares with, exact by default.  Every child runs in its own
+    process group, killed as a whole together with the child, and applies
+    *rlimits* (``(resource, soft, hard)`` triples, see
+    :meth:`~test_runner.limits.ResourceLimits.rlimits`) to itself before
+    the script starts.
+    """
+
+    def __init__(self, script_path: Path) -> None:
+        self.script = script_path.resolve()
+        start = time.perf_counter()
+        self._process = subprocess.Popen(
+            [sys.executable, str(_SERVER_MAIN), str(self.script)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            start_new_session=True,
+        )
+        self._receive()
+        self.startup_time = time.perf_counter() - start
+
+    def __enter__(self) -> "ForkServer":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    @property
+    def alive(self) -> bool:
+        return self._process.poll() is None
+
+    @property
+    def pid(self) -> int:
+        """Process id of the server, which leads its own process group."""
+
+        return self._process.pid
+
+    def run(
+        self,
+        input_data: str | bytes,
+        timeout: float | None = None,
+        limits: OutputLimits = OutputLimits(),
+        expected: Optional[str | bytes] = None,
+        encoding: Optional[str] = None,
+        binary: bool = False,
+        comparator: Optional[str] = None,
+        rlimits: Sequence[tuple[int, int, int]] = (),
+    ) -> ForkRun:
+        encoding = encoding or text_encoding()
+        self._send(
+            {
+                "input": as_bytes(input_data, encoding),
+                "timeout": timeout,
+                "buffer": limits.buffer,
+                "kill": limits.kill,
+                "spill_dir": spill_directory(),
+                "expected": expected,
+                "encoding": encoding,
+                "comparator": comparator,
+                "rlimits": list(rlimits),
+            }
+        )
+        reply = self._receive()
+        match = diverged = None
+        if reply["match"] is not None:
+            matched, offset, line, diverged = reply["match"]
+            match = MatchOutcome(matched, offset, line)
+        if binary:
+            stdout, stderr = reply["stdout"], reply["stderr"]
+        else:
+            stdout = decode_output(reply["stdout"], final=reply["stdout_file"] is None, encoding=encoding)
+            stderr = decode_output(reply["stderr"], final=reply["stderr_file"] is None, encoding=encoding)
+        return ForkRun(
+            returncode=reply["returncode"],
+            stdout=stdout,
+            stderr=stderr,
+            elapsed=reply["elapsed"],
+            startup=reply["startup"],
+            timed_out=reply["timed_out"],
+            rusage=reply.get("rusage"),
+            stdout_file=reply["stdout_file"],
+            stderr_file=reply["stderr_file"],
+            overflowed=reply["overflowed"],
+            match=match,
+            diverged=bool(diverged),
+        )
+
+    def kill(self) -> None:
+        """Kill the server together with the child it is currently running.
+
+        The child has a process group of its own, which only the server
+        knows: ``SIGTERM`` asks the server to kill it and exit, and
+        ``SIGKILL`` follows if the server does not.
+        """
+
+        if self.alive:
+            os.killpg(self._process.pid, signal.SIGTERM)
+            try:
+                self._process.wait(timeout=_TERMINATE_GRACE)
+            except subprocess.TimeoutExpired:
+                os.killpg(self._process.pid, signal.SIGKILL)
+        self._process.wait()
+
+    def close(self) -> None:
+        assert self._process.stdin is not None and self._process.stdout is not None
+        if self.alive:
+            try:
+                self._process.stdin.close()
+                self._process.wait(timeout=5)
+            except (BrokenPipeError, subprocess.TimeoutExpired):
+                self.kill()
+        for stream in (self._process.stdin, self._process.stdout):
+            try:
+                stream.close()
+            except BrokenPipeError:
+                pass
+
+    def _send(self, message: dict) -> None:
+        assert self._process.stdin is not None
+        payload = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+        self._process.stdin.write(_HEADER.pack(len(payload)) + payload)
+        self._process.stdin.flush()
+
+    def _receive(self) -> dict:
+        assert self._process.stdout is not None
+        header = self._process.stdout.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise RuntimeError("Сервер предзагрузки завершился неожиданно")
+        (size,) = _HEADER.unpack(header)
+        return pickle.loads(self._process.stdout.read(size))
@@ -0,0 +1,296 @@
+"""Batch generation of test suites in the :func:`~test_runner.cases.parse_cases` format.
+
+A :class:`SuiteSpec` describes the numbers of every case (an arithmetic
+range, or uniform or normal random integers with a seed), optional edge
+values mixed into them, the case sizes and the oracle that computes the
+expected answers.  Cases are produced in batches of equal size: with NumPy
+installed each batch is one 2-D array and both the values and the answers
+are computed with array operations; without it the same suite is built
+with plain Python (random suites then differ from the NumPy ones for the
+same seed).  :func:`write_suite` streams the text batch by batch, so the
+size of a suite is limited by the disk rather than by memory.
+"""
+
+from __future__ import annotations
+
+import math
+import random
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ModuleNotFoundError:  # pragma: no cover - optional dependency
+    np = None
+
+__all__ = [
+    "SuiteSpec",
+    "Oracle",
+    "ORACLES",
+    "DEFAULT_EDGE_VALUES",
+    "HAVE_NUMPY",
+    "size_sweep",
+    "iter_suite_chunks",
+    "suite_text",
+    "write_suite",
+]
+
+HAVE_NUMPY = np is not None
+
+# Upper bound on the numbers held by one batch.
+BATCH_VALUES = 1 << 20
+
+DISTRIBUTIONS = ("range", "uniform", "normal")
+_SEPARATORS = {"column": "\n", "space": " ", "comma": ","}
+DEFAULT_EDGE_VALUES = (0, 1, -1, 2**31 - 1, -(2**31))
+
+_NOT_ENOUGH_DATA = "<недостаточно данных>"
+
+# An oracle receives one batch (a 2-D ``int64`` array with NumPy, a list of
+# rows otherwise) and returns the expected answer of every row.
+Oracle = Callable[[Any], Sequence[str]]
+
+
+def _first_two_vs_rest_numpy(values: Any) -> List[str]:
+    if values.shape[1] < 2:
+        return [_NOT_ENOUGH_DATA] * len(values)
+    first_two = values[:, 0] + values[:, 1]
+    rest = values[:, 2:].sum(axis=1)
+    return np.where(first_two > rest, "yes", "no").tolist()
+
+
+def _first_two_vs_rest_python(rows: List[List[int]]) -> List[str]:
+    if rows and len(rows[0]) < 2:
+        return [_NOT_ENOUGH_DATA] * len(rows)
+    return ["yes" if row[0] + row[1] > sum(row[2:]) else "no" for row in rows]
+
+
+def _sorted_numpy(values: Any) -> List[str]:
+    return [" ".join(map(str, row)) for row in np.sort(values, axis=1).tolist()]
+
+
+def _sorted_python(rows: List[List[int]]) -> List[str]:
+    return [" ".join(map(str, sorted(row))) for row in rows]
+
+
+# Built-in oracles by name: (NumPy implementation, pure Python implementation).
+_BUILTIN_ORACLES: Dict[str, Tuple[Oracle, Oracle]] = {
+    "first_two_vs_rest": (_first_two_vs_rest_numpy, _first_two_vs_rest_python),
+    "sum": (
+        lambda values: list(map(str, values.sum(axis=1).tolist())),
+        lambda rows: [str(sum(row)) for row in rows],
+    ),
+    "max": (
+        lambda values: list(map(str, values.max(axis=1).tolist())),
+        lambda rows: [str(max(row)) for row in rows],
+    ),
+    "sorted": (_sorted_numpy, _sorted_python),
+}
+
+ORACLES = tuple(_BUILTIN_ORACLES)
+
+
+@dataclass(slots=True)
+class SuiteSpec:
+    """Description of a generated suite.
+
+    ``range`` cases continue one arithmetic progression (``start``,
+    ``step``) across the suite; ``uniform`` draws integers from
+    ``[low, high]`` and ``normal`` rounds draws with ``mean`` and
+    ``stddev``.  With ``edge_rate`` every number is replaced by one of
+    ``edge_values`` with that probability.  ``lengths`` are the case sizes,
+    spread over the suite in contiguous blocks (see :func:`size_sweep`).
+    ``oracle`` is the name of a built-in oracle, an :data:`Oracle` or
+    ``None`` for cases without an expected answer.
+    """
+
+    count: int
+    lengths: Sequence[int] = (5,)
+    distribution: str = "range"
+    start: int = 1
+    step: int = 1
+    low: int = 0
+    high: int = 100
+    mean: float = 0.0
+    stddev: float = 1.0
+    seed: Optional[int] = None
+    edge_values: Sequence[int] = DEFAULT_EDGE_VALUES
+    edge_rate: float = 0.0
+    arrangement: str = "column"
+    include_length: bool = True
+    oracle: Optional[str | Oracle] = "first_two_vs_rest"
+
+    def validate(self) -> None:
+        if self.count < 0:
+            raise ValueError("Количество тестов не может быть отрицательным")
+        if not self.lengths or min(self.lengths) < 1:
+            raise ValueError("В каждом тесте должно быть хотя бы одно число")
+        if self.distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Неизвестное распределение: {self.distribution!r}")
+        if self.distribution == "uniform" and self.low > self.high:
+            raise ValueError("Нижняя граница больше верхней")
+        if self.distribution == "normal" and self.stddev < 0:
+            raise ValueError("Стандартное отклонение не может быть отрицательным")
+        if not 0.0 <= self.edge_rate <= 1.0:
+            raise ValueError("Доля граничных значений должна быть от 0 до 1")
+        if self.edge_rate and not self.edge_values:
+            raise ValueError("Не заданы граничные значения")
+        if self.arrangement not in _SEPARATORS:
+            raise ValueError(f"Неизвестный формат чисел: {self.arrangement!r}")
+        if isinstance(self.oracle, str) and self.oracle not in _BUILTIN_ORACLES:
+            raise ValueError(f"Неизвестный оракул: {self.oracle!r}")
+
+
+def size_sweep(smallest: int, largest: int, steps: int, *, geometric: bool = True) -> List[int]:
+    """Return *steps* case sizes from *smallest* to *largest*.
+
+    Geometric sweeps suit sizes spanning several orders of magnitude;
+    duplicates produced by rounding are dropped.
+    """
+
+    if smallest < 1 or largest < smallest:
+        raise ValueError("Неверный диапазон размеров")
+    if steps <= 1 or smallest == largest:
+        return [smallest]
+    sizes: List[int] = []
+    for step in range(steps):
+        fraction = step / (steps - 1)
+        if geometric:
+            size = round(smallest * (largest / smallest) ** fraction)
+        else:
+            size = round(smallest + (largest - smallest) * fraction)
+        if not sizes or size != sizes[-1]:
+            sizes.append(size)
+    return sizes
+
+
+def _batches(spec: SuiteSpec, batch_values: int) -> Iterator[Tuple[int, int, int]]:
+    """Yield ``(first case, number of cases, length)`` for every batch."""
+
+    lengths = list(spec.lengths)
+    block = 0
+    first = 0
+    while first < spec.count:
+        block_end = math.ceil((block + 1) * spec.count / len(lengths))
+        length = lengths[block]
+        per_batch = max(1, batch_values // length)
+        while first < block_end:
+            cases = min(per_batch, block_end - first)
+            yield first, cases, length
+            first += cases
+        block += 1
+
+
+class _NumpyBackend:
+    def __init__(self, spec: SuiteSpec) -> None:
+        self.spec = spec
+        self.rng = np.random.default_rng(spec.seed)
+        self.edges = np.asarray(spec.edge_values, dtype=np.int64)
+
+    def values(self, position: int, cases: int, length: int) -> Any:
+        spec = self.spec
+        shape = (cases, length)
+        if spec.distribution == "range":
+            values = np.arange(position, position + cases * length, dtype=np.int64)
+            values = (values * spec.step + spec.start).reshape(shape)
+        elif spec.distribution == "uniform":
+            values = self.rng.integers(spec.low, spec.high, size=shape, dtype=np.int64, endpoint=True)
+        else:
+            values = np.rint(self.rng.normal(spec.mean, spec.stddev, size=shape)).astype(np.int64)
+        if spec.edge_rate:
+            mask = self.rng.random(shape) < spec.edge_rate
+            values[mask] = self.edges[self.rng.integers(0, len(self.edges), size=int(mask.sum()))]
+        return values
+
+    def oracle(self, oracle: str | Oracle, values: Any) -> Sequence[str]:
+        if isinstance(oracle, str):
+            oracle = _BUILTIN_ORACLES[oracle][0]
+        return oracle(values)
+
+    @staticmethod
+    def rows(values: Any) -> List[List[int]]:
+        return values.tolist()
+
+
+class _PythonBackend:
+    def __init__(self, spec: SuiteSpec) -> None:
+        self.spec = spec
+        self.rng = random.Random(spec.seed)
+
+    def values(self, position: int, cases: int, length: int) -> List[List[int]]:
+        spec = self.spec
+        rng = self.rng
+        if spec.distribution == "range":
+            rows = [
+                [spec.start + (position + row * length + column) * spec.step for column in range(length)]
+                for row in range(cases)
+            ]
+        elif spec.distribution == "uniform":
+            rows = [[rng.randint(spec.low, spec.high) for _ in range(length)] for _ in range(cases)]
+        else:
+            rows = [
+                [round(rng.gauss(spec.mean, spec.stddev)) for _ in range(length)]
+                for _ in range(cases)
+            ]
+        if spec.edge_rate:
+            for row in rows:
+                for column in range(length):
+                    if rng.random() < spec.edge_rate:
+                        row[column] = rng.choice(spec.edge_values)
+        return rows
+
+    def oracle(self, oracle: str | Oracle, rows: List[List[int]]) -> Sequence[str]:
+        if isinstance(oracle, str):
+            oracle = _BUILTIN_ORACLES[oracle][1]
+        return oracle(rows)
+
+    @staticmethod
+    def rows(values: List[List[int]]) -> List[List[int]]:
+        return values
+
+
+def iter_suite_chunks(spec: SuiteSpec, *, batch_values: int = BATCH_VALUES) -> Iterator[str]:
+    """Yield the text of the suite described by *spec*, one batch at a time."""
+
+    spec.validate()
+    backend = _NumpyBackend(spec) if HAVE_NUMPY else _PythonBackend(spec)
+    separator = _SEPARATORS[spec.arrangement]
+    position = 0
+    for first, cases, length in _batches(spec, batch_values):
+        values = backend.values(position, cases, length)
+        position += cases * length
+        answers = backend.oracle(spec.oracle, values) if spec.oracle is not None else None
+
+        # One format call per case: every case of a batch has the same shape.
+        template = "# Тест {}\n" + (f"{length}\n" if spec.include_length else "")
+        template += separator.join(["{}"] * length) + "\n"
+        template += "=>\n{}\n\n" if answers is not None else "\n"
+        rows = backend.rows(values)
+        if answers is None:
+            yield "".join(template.format(first + offset + 1, *row) for offset, row in enumerate(rows))
+        else:
+            yield "".join(
+                template.format(first + offset + 1, *row, answer)
+                for offset, (row, answer) in enumerate(zip(rows, answers))
+            )
+
+
+def suite_text(spec: SuiteSpec) -> str:
+    """Return the whole suite as one string; meant for small suites."""
+
+    return "".join(iter_suite_chunks(spec)).strip() + "\n"
+
+
+def write_suite(spec: SuiteSpec, target: Path | IO[str], *, batch_values: int = BATCH_VALUES) -> int:
+    """Stream the suite to *target* (a path or a text stream).
+
+    Returns the number of characters written.
+    """
+
+    if isinstance(target, (str, Path)):
+        path = Path(target)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8", newline="\n") as handle:
+            return write_suite(spec, handle, batch_values=batch_values)
+    return sum(target.write(chunk) for chunk in iter_suite_chunks(spec, batch_values=batch_values))
@@ -1,16 +1,34 @@
 from __future__ import annotations
 
 import json
+import os
 import subprocess
 import sys
 from pathlib import Path
-from typing import Sequence
+from typing import Iterable, Optional
 
+from ._text import display_text, text_encoding
 from .cases import TestCase
+from .compare import Comparator, get_comparator
+from .executor import TestResult, is_timeout
+from .tracing import traced
 
-__all__ = ["ensure_pytest_available", "generate_pytest_file"]
+__all__ = [
+    "ensure_pytest_available",
+    "generate_pytest_file",
+    "data_file_paths",
+    "write_recorded_results",
+    "RECORDED_RESULTS_ENV",
+    "CASE_INDEX_PROPERTY",
+]
 
+RECORDED_RESULTS_ENV = "TEST_RUNNER_RECORDED_RESULTS"
+# ``record_property`` name under which every generated test reports the
+# ``TestCase.index`` of its case.
+CASE_INDEX_PROPERTY = "case_index"
 
+
+@traced()
 def ensure_pytest_available() -> None:
     """Ensure that ``pytest`` is importable.
 
@@ -24,20 +42,138 @@ def ensure_pytest_available() -> None:
         subprocess.check_call([sys.executable, "-m", "pip", "install", "pytest"])
 
 
-def _case_to_dict(case: TestCase) -> dict[str, str | None]:
+def _case_to_dict(case: TestCase, encoding: str) -> dict[str, int | str | None]:
     return {
+        "index": case.index,
         "name": case.label,
-        "input": case.input_data,
-        "expected": case.expected_output,
+        "input": display_text(case.input_data, encoding),
+        "expected": None if case.expected_output is None else display_text(case.expected_output, encoding),
+        "comparator": case.comparator,
+    }
+
+
+def _write_if_changed(path: Path, text: str) -> None:
+    # Leaving an unchanged module alone keeps pytest's bytecode cache valid.
+    try:
+        if path.read_text(encoding="utf-8") == text:
+            return
+    except (FileNotFoundError, UnicodeDecodeError):
+        pass
+    path.write_text(text, encoding="utf-8")
+
+
+def data_file_paths(target_path: Path) -> tuple[Path, Path]:
+    """Return the case data file and its index for a generated module."""
+
+    return (
+        target_path.with_name(f"{target_path.stem}.cases.jsonl"),
+        target_path.with_name(f"{target_path.stem}.cases.idx"),
+    )
+
+
+class _OverwritingFile:
+    """Writes a file over its previous version, leaving it untouched while
+    the new content matches the old one.
+
+    An unchanged data file is only read, never rewritten; after the first
+    difference the rest is written from that offset on.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._file = path.open("r+b" if path.exists() else "w+b")
+        self._same = True
+
+    def write(self, data: bytes) -> None:
+        if self._same:
+            existing = self._file.read(len(data))
+            if existing == data:
+                return
+            self._same = False
+            self._file.seek(-len(existing), os.SEEK_CUR)
+        self._file.write(data)
+
+    def close(self) -> None:
+        with self._file:
+            # The old version may have been longer.
+            if self._file.tell() != os.fstat(self._file.fileno()).st_size:
+                self._file.truncate()
+
+    def __enter__(self) -> "_OverwritingFile":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def _write_data_file(
+    test_cases: Iterable[TestCase], data_path: Path, index_path: Path, encoding: str
+) -> None:
+    """Write one JSON object per line plus a ``offset<TAB>length<TAB>index<TAB>name``
+    index, where *index* is the case's ``TestCase.index``.
+
+    Like the module itself, the files are only written where their content
+    changed, so regenerating an unchanged suite leaves them alone.
+    """
+
+    offset = 0
+    with _OverwritingFile(data_path) as data, _OverwritingFile(index_path) as index:
+        for case in test_cases:
+            record = json.dumps(_case_to_dict(case, encoding), ensure_ascii=False).encode("utf-8")
+            data.write(record + b"\n")
+            name = " ".join(case.label.splitlines())
+            index.write(f"{offset}\t{len(record)}\t{case.index}\t{name}\n".encode("utf-8"))
+            offset += len(record) + 1
+
+
+def write_recorded_results(
+    results: Iterable[TestResult], target_path: Path, encoding: Optional[str] = None
+) -> Path:
+    """Save executor results for the generated module at *target_path*.
+
+    When pytest runs that module with :data:`RECORDED_RESULTS_ENV` pointing to
+    the returned file, every test whose case index is recorded checks the
+    recorded output instead of executing the script again, so a suite that
+    was just run by the executor costs a single execution per case.
+    Truncated results (spilled, stopped at the output limit or stopped at
+    the first divergence) are recorded with the executor's status, message,
+    limit, spill file and divergence point, and pytest takes that verdict
+    over instead of running the case again.  Binary outputs are decoded
+    with *encoding*, which should be the one the module was generated with.
+    """
+
+    path = target_path.with_name(f"{target_path.stem}.results.json")
+    records = {
+        str(result.case.index): {
+            "returncode": result.returncode,
+            "stdout": display_text(result.stdout, encoding),
+            "stderr": display_text(result.stderr, encoding),
+            "elapsed": result.elapsed,
+            "timed_out": is_timeout(result),
+            "complete": not result.truncated,
+            "status": result.status,
+            "message": result.message,
+            "limit": result.limit,
+            "stdout_file": result.stdout_file,
+            "divergence_offset": result.divergence_offset,
+            "divergence_line": result.divergence_line,
+        }
+        for result in results
     }
+    path.write_text(json.dumps(records, ensure_ascii=False), encoding="utf-8")
+    return path
 
 
+@traced()
 def generate_pytest_file(
-    test_cases: Sequence[TestCase],
+    test_cases: Iterable[TestCase],
     script_path: Path,
     target_path: Path,
     *,
     timeout: float | None = None,
+    mode: str = "cold",
+    data_file: bool = False,
+    comparator: str | Comparator | None = None,
+    encoding: Optional[str] = None,
 ) -> Path:
     """Write a pytest module that executes *script_path* for each test case.
 
@@ -50,74 +186,266 @@ def generate_pytest_file(
     target_path:
         Destination for the generated ``pytest`` file.
     timeout:
-        Optional timeout (in seconds) passed to ``subprocess.run`` within the
-        generated tests.
+        Optional timeout (in seconds) for every case run by the generated
+        tests.  Under :func:`~test_runner.pytest_session.run_pytest` the
+        script's process is also killed when the run is cancelled.
+    mode:
+        ``"cold"`` starts a new interpreter for every test.  ``"fork"`` makes
+        the generated module share one :class:`~test_runner.forkserver.ForkServer`
+        across its tests; the module then imports :mod:`test_runner` from the
+        location of this package.  Output the server spilled to a file is
+        read back in full, so long answers are judged whole, and the file
+        is removed.
+    data_file:
+        Store the cases next to the module (see :func:`data_file_paths`)
+        instead of embedding them.  Collection then reads only the small
+        index of names and byte offsets, and every test loads its own case
+        when it runs.  Such modules can be split between CI jobs with the
+        ``TEST_RUNNER_SHARD=k/n`` environment variable (1-based *k*), taking
+        a contiguous range of cases or, with ``TEST_RUNNER_SHARD_MODE=hash``,
+        the cases whose name hashes to that shard.
+    comparator:
+        Rule for cases without their own ``TestCase.comparator`` (see
+        :func:`~test_runner.compare.get_comparator`).  The module judges
+        outputs with :mod:`test_runner.compare`, imported from the location
+        of this package, so it applies exactly the executor's rules.
+    encoding:
+        Codec of the script's input and output, as in
+        :func:`~test_runner.executor.run_test_cases` (the ``subprocess``
+        text codec by default).  Binary cases are stored decoded with it.
     """
 
+    if mode not in ("cold", "fork"):
+        raise ValueError(f"Неизвестный режим запуска: {mode!r}")
+    encoding = encoding or text_encoding()
+    comparator_spec = get_comparator(comparator).spec
+
     target_path.parent.mkdir(parents=True, exist_ok=True)
     normalized_script = script_path.resolve()
-
-    payload = {
-        "cases": [_case_to_dict(case) for case in test_cases],
-        "timeout": timeout,
-    }
-
-    json_blob = json.dumps(payload, ensure_ascii=False, indent=4)
-    escaped_json = json_blob.replace("\\", "\\\\").replace('"""', '\\"\\"\\"')
     script_literal = str(normalized_script).replace("\\", "\\\\")
 
-    module_source = "\n".join(
-        [
-            '"""Auto-generated by main.py – do not edit manually."""',
+    header = [
+        '"""Auto-generated by main.py – do not edit manually."""',
+        "",
+        "from __future__ import annotations",
+        "",
+        "import json",
+        "import os",
+        "import subprocess",
+        "import sys",
+        "import time",
+        "from pathlib import Path",
+        "",
+        "import pytest",
+        "",
+    ]
+    if data_file:
+        header[7:7] = ["import zlib"]
+    package_root = str(Path(__file__).resolve().parent.parent).replace("\\", "\\\\")
+    header.extend([f"sys.path.insert(0, r\"{package_root}\")", ""])
+    header.append("from test_runner.compare import get_comparator  # noqa: E402")
+    header.append("from test_runner.pytest_session import watch_cancel  # noqa: E402")
+    if mode == "fork":
+        header.append("from test_runner.forkserver import ForkServer  # noqa: E402")
+    header.extend(["", f"_COMPARATOR = {comparator_spec!r}", ""])
+
+    if data_file:
+        data_path, index_path = data_file_paths(target_path)
+        _write_data_file(test_cases, data_path, index_path, encoding)
+        data_lines = [
+            "_HERE = Path(__file__).resolve().parent",
+            f"_DATA_FILE = _HERE / {data_path.name!r}",
+            f"_INDEX_FILE = _HERE / {index_path.name!r}",
+            f"_SCRIPT = Path(r\"{script_literal}\")",
+            f"_TIMEOUT = {timeout!r}",
+            f"_ENCODING = {encoding!r}",
             "",
-            "from __future__ import annotations",
             "",
-            "import json",
-            "import subprocess",
-            "import sys",
-            "import time",
-            "from pathlib import Path",
+            "def _load_index() -> list[tuple[int, int, int, str]]:",
+            "    entries = []",
+            "    with _INDEX_FILE.open(encoding=\"utf-8\") as handle:",
+            "        for line in handle:",
+            "            offset, length, index, name = line.rstrip(\"\\n\").split(\"\\t\", 3)",
+            "            entries.append((int(offset), int(length), int(index), name))",
+            "    return entries",
             "",
-            "import pytest",
             "",
+            "def _select_shard(entries: list[tuple[int, int, int, str]]) -> list[tuple[int, int, int, str]]:",
+            "    spec = os.environ.get(\"TEST_RUNNER_SHARD\")",
+            "    if not spec:",
+            "        return entries",
+            "    shard, total = (int(part) for part in spec.split(\"/\"))",
+            "    if os.environ.get(\"TEST_RUNNER_SHARD_MODE\") == \"hash\":",
+            "        return [",
+            "            entry for entry in entries",
+            "            if zlib.crc32(entry[3].encode(\"utf-8\")) % total == shard - 1",
+            "        ]",
+            "    size = -(-len(entries) // total)",
+            "    return entries[(shard - 1) * size : shard * size]",
+            "",
+            "",
+            "def _load_case(entry: tuple[int, int, int, str]) -> dict[str, str | None]:",
+            "    offset, length, _, _ = entry",
+            "    with _DATA_FILE.open(\"rb\") as handle:",
+            "        handle.seek(offset)",
+            "        return json.loads(handle.read(length))",
+            "",
+            "",
+            "_ENTRIES = _select_shard(_load_index())",
+            "",
+            "",
+        ]
+        parametrize = "@pytest.mark.parametrize(\"entry\", _ENTRIES, ids=lambda entry: entry[3])"
+        param_name = "entry"
+    else:
+        payload = {
+            "cases": [_case_to_dict(case, encoding) for case in test_cases],
+            "timeout": timeout,
+            "encoding": encoding,
+        }
+
+        json_blob = json.dumps(payload, ensure_ascii=False, indent=4)
+        escaped_json = json_blob.replace("\\", "\\\\").replace('"""', '\\"\\"\\"')
+        data_lines = [
             f"_DATA = json.loads(\"\"\"{escaped_json}\"\"\")",
             f"_SCRIPT = Path(r\"{script_literal}\")",
             "_TIMEOUT = _DATA[\"timeout\"]",
+            "_ENCODING = _DATA[\"encoding\"]",
             "_TEST_CASES = _DATA[\"cases\"]",
             "",
             "",
+        ]
+        parametrize = "@pytest.mark.parametrize(\"case\", _TEST_CASES, ids=lambda case: case[\"name\"])"
+        param_name = "case"
+
+    if mode == "fork":
+        runner_lines = [
+            "@pytest.fixture(scope=\"module\")",
+            "def _server():",
+            "    with ForkServer(_SCRIPT) as server, watch_cancel(server):",
+            "        yield server",
+            "",
+            "",
+            "def _full_output(head: str, path: str | None) -> str:",
+            "    # Output past the server's buffer is only in the spill file.",
+            "    if path is None:",
+            "        return head",
+            "    try:",
+            "        with open(path, encoding=_ENCODING, newline=None) as handle:",
+            "            return handle.read()",
+            "    finally:",
+            "        os.unlink(path)",
+            "",
+            "",
+            "def _run_case(server, case: dict[str, str | None]) -> tuple[int, str, str, float]:",
+            "    outcome = server.run(case[\"input\"], timeout=_TIMEOUT, encoding=_ENCODING)",
+            "    stdout = _full_output(outcome.stdout, outcome.stdout_file)",
+            "    stderr = _full_output(outcome.stderr, outcome.stderr_file)",
+            "    if outcome.timed_out:",
+            "        raise subprocess.TimeoutExpired([sys.executable, str(_SCRIPT)], _TIMEOUT)",
+            "    return outcome.returncode, stdout, stderr, outcome.elapsed",
+            "",
+            "",
+        ]
+        test_signature = f"def test_generated(_server, record_property, {param_name}) -> None:"
+        run_call = "    returncode, stdout, stderr, elapsed = _run_case(_server, case)"
+    else:
+        runner_lines = [
             "def _run_case(case: dict[str, str | None]) -> tuple[int, str, str, float]:",
             "    start = time.perf_counter()",
-            "    completed = subprocess.run(",
+            "    with subprocess.Popen(",
             "        [sys.executable, str(_SCRIPT)],",
-            "        input=case[\"input\"],",
-            "        text=True,",
-            "        capture_output=True,",
-            "        timeout=_TIMEOUT,",
-            "        check=False,",
-            "    )",
+            "        stdin=subprocess.PIPE,",
+            "        stdout=subprocess.PIPE,",
+            "        stderr=subprocess.PIPE,",
+            "        encoding=_ENCODING,",
+            "    ) as process, watch_cancel(process):",
+            "        try:",
+            "            stdout, stderr = process.communicate(case[\"input\"], timeout=_TIMEOUT)",
+            "        except subprocess.TimeoutExpired:",
+            "            process.kill()",
+            "            process.communicate()",
+            "            raise",
             "    elapsed = time.perf_counter() - start",
-            "    stdout = completed.stdout",
-            "    stderr = completed.stderr",
-            "    return completed.returncode, stdout, stderr, elapsed",
+            "    return process.returncode, stdout, stderr, elapsed",
             "",
             "",
-            "@pytest.mark.parametrize(\"case\", _TEST_CASES, ids=lambda case: case[\"name\"])",
-            "def test_generated(case) -> None:",
-            "    returncode, stdout, stderr, _ = _run_case(case)",
+        ]
+        test_signature = f"def test_generated(record_property, {param_name}) -> None:"
+        run_call = "    returncode, stdout, stderr, elapsed = _run_case(case)"
+
+    replay_lines = [
+        "def _load_recorded() -> dict[str, dict]:",
+        f"    path = os.environ.get(\"{RECORDED_RESULTS_ENV}\")",
+        "    if not path:",
+        "        return {}",
+        "    with open(path, encoding=\"utf-8\") as handle:",
+        "        return json.load(handle)",
+        "",
+        "",
+        "_RECORDED = _load_recorded()",
+        "",
+        "",
+        "def _replay(case: dict) -> dict | None:",
+        "    record = _RECORDED.get(str(case[\"index\"]))",
+        "    if record is not None and record[\"timed_out\"]:",
+        "        raise subprocess.TimeoutExpired([sys.executable, str(_SCRIPT)], _TIMEOUT)",
+        "    return record",
+        "",
+        "",
+        "def _check_recorded_verdict(record: dict) -> None:",
+        "    # The executor did not keep this output whole (it was spilled to a",
+        "    # file, cut at a limit or stopped at its first difference from the",
+        "    # expected output), so its verdict stands.",
+        "    if record[\"status\"] in (\"passed\", \"executed\"):",
+        "        return",
+        "    message = record[\"message\"]",
+        "    if record[\"divergence_line\"] is not None:",
+        "        message += (",
+        "            f\"\\nРасхождение: строка {record['divergence_line']}, \"",
+        "            f\"символ {record['divergence_offset']} вывода\"",
+        "        )",
+        "    if record[\"stdout_file\"]:",
+        "        message += f\"\\nПолный вывод: {record['stdout_file']}\"",
+        "    pytest.fail(message)",
+        "",
+        "",
+    ]
+
+    test_lines = [parametrize, test_signature]
+    if data_file:
+        test_lines.append("    case = _load_case(entry)")
+    test_lines.extend(
+        [
+            f"    record_property({CASE_INDEX_PROPERTY!r}, case[\"index\"])",
+            "    record = _replay(case)",
+            "    if record is None:",
+            "    " + run_call,
+            "    elif not record[\"complete\"]:",
+            "        record_property(\"elapsed\", record[\"elapsed\"])",
+            "        _check_recorded_verdict(record)",
+            "        return",
+            "    else:",
+            "        returncode, stdout, stderr = record[\"returncode\"], record[\"stdout\"], record[\"stderr\"]",
+            "        elapsed = record[\"elapsed\"]",
+            "    record_property(\"elapsed\", elapsed)",
             "    expected = case.get(\"expected\")",
             "    if returncode != 0:",
             "        pytest.fail(",
-            "            f\"Процесс завершился с кодом {returncode}.\\\\nSTDERR: {stderr.strip()}\"",
+            "            f\"Процесс завершился с кодом {returncode}.\\nSTDERR: {stderr.strip()}\"",
             "        )",
             "    if expected is not None:",
-            "        assert stdout == expected, (",
-            "            \"Вывод не совпадает с ожидаемым.\\\\n\"",
-            "            f\"Ожидалось: {expected!r}\\\\n\"",
+            "        # The executor's rule for this case.",
+            "        comparator = get_comparator(case.get(\"comparator\") or _COMPARATOR)",
+            "        outcome = comparator.match(stdout, expected)",
+            "        assert outcome.matched, (",
+            "            f\"Вывод не совпадает с ожидаемым ({comparator.spec}, строка {outcome.line}).\\n\"",
+            "            f\"Ожидалось: {expected!r}\\n\"",
             "            f\"Получено: {stdout!r}\"",
             "        )",
         ]
     )
 
-    target_path.write_text(module_source, encoding="utf-8")
+    module_source = "\n".join(header + data_lines + runner_lines + replay_lines + test_lines)
+    _write_if_changed(target_path, module_source)
     return target_path
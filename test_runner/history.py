@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import math
+import sqlite3
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence
+
+from .cases import TestCase, case_key
+from .limits import MEMORY_LIMIT_STATUS
+
+if TYPE_CHECKING:
+    from .executor import TestResult
+
+__all__ = ["CaseRecord", "RunHistory", "AdaptiveTimeout"]
+
+# Weight of the newest run in the moving average of ``elapsed``.
+ELAPSED_SMOOTHING = 0.3
+# Run times kept per case for percentiles.
+ELAPSED_SAMPLES = 20
+_LOOKUP_BATCH = 500
+
+
+def _pack(samples: Sequence[float]) -> bytes:
+    return array("d", samples).tobytes()
+
+
+def _unpack(blob: Optional[bytes]) -> tuple[float, ...]:
+    samples = array("d")
+    if blob:
+        samples.frombytes(blob)
+    return tuple(samples)
+
+
+@dataclass(slots=True)
+class CaseRecord:
+    """What previous runs tell about a case."""
+
+    status: str
+    average_elapsed: float
+    runs: int
+    # The latest ``ELAPSED_SAMPLES`` run times, oldest first.
+    samples: tuple[float, ...] = ()
+
+    @property
+    def failed(self) -> bool:
+        return self.status in {"error", "failed", MEMORY_LIMIT_STATUS}
+
+    @property
+    def p95(self) -> float:
+        """95th percentile (nearest rank) of the kept run times.
+
+        Records written before run times were kept fall back to the average.
+        """
+
+        if not self.samples:
+            return self.average_elapsed
+        ordered = sorted(self.samples)
+        return ordered[math.ceil(0.95 * len(ordered)) - 1]
+
+
+@dataclass(slots=True, frozen=True)
+class AdaptiveTimeout:
+    """Per-case wall-clock timeout derived from the case's past run times.
+
+    A case gets *factor* times its historical p95, kept between *floor* and
+    *ceiling*; a case without history gets *default* (*ceiling* when
+    ``None``).  A case that timed out records the timeout as its run time,
+    so its next timeout grows by *factor*, up to *ceiling*.
+    """
+
+    factor: float = 3.0
+    floor: float = 1.0
+    ceiling: float = 30.0
+    default: Optional[float] = None
+
+    def timeout(self, record: Optional[CaseRecord]) -> float:
+        if record is None:
+            return self.ceiling if self.default is None else self.default
+        return min(self.ceiling, max(self.floor, self.factor * record.p95))
+
+
+class RunHistory:
+    """Per-case history of past runs kept in a SQLite file.
+
+    Cases are identified by :func:`~test_runner.cases.case_key` (label and
+    input hash), so the history survives reordering and editing other cases.
+    For every case the last status, an exponential moving average of its
+    ``elapsed`` time and its latest run times (for
+    :class:`AdaptiveTimeout`) are stored.  :meth:`record` only buffers; :meth:`flush`
+    writes the buffered results in one transaction.  Instances may be shared
+    between threads.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pending: Dict[str, tuple[str, float]] = {}
+        self._db = sqlite3.connect(str(path), isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cases ("
+            " key TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " elapsed REAL NOT NULL,"
+            " runs INTEGER NOT NULL,"
+            " updated REAL NOT NULL,"
+            " samples BLOB)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(cases)")}
+        if "samples" not in columns:
+            self._db.execute("ALTER TABLE cases ADD COLUMN samples BLOB")
+
+    def __enter__(self) -> "RunHistory":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def lookup(self, cases: Iterable[TestCase]) -> Dict[int, CaseRecord]:
+        """Return the known records of *cases*, keyed by ``TestCase.index``."""
+
+        keys = {case_key(case): case.index for case in cases}
+        names = list(keys)
+        records: Dict[int, CaseRecord] = {}
+        with self._lock:
+            for start in range(0, len(names), _LOOKUP_BATCH):
+                batch = names[start : start + _LOOKUP_BATCH]
+                rows = self._db.execute(
+                    "SELECT key, status, elapsed, runs, samples FROM cases"
+                    f" WHERE key IN ({', '.join('?' * len(batch))})",
+                    batch,
+                )
+                for key, status, elapsed, runs, samples in rows:
+                    records[keys[key]] = CaseRecord(status, elapsed, runs, _unpack(samples))
+        return records
+
+    def timeouts(self, cases: Iterable[TestCase], policy: AdaptiveTimeout) -> Dict[int, float]:
+        """Return the *policy* timeout of every case, keyed by ``TestCase.index``."""
+
+        cases = list(cases)
+        records = self.lookup(cases)
+        return {case.index: policy.timeout(records.get(case.index)) for case in cases}
+
+    def order(
+        self,
+        test_cases: Iterable[TestCase],
+        *,
+        longest_first: bool = True,
+    ) -> List[TestCase]:
+        """Order cases so that likely failures and slow cases start early.
+
+        Cases that failed last time, and cases without history, come first.
+        With *longest_first* (useful when several workers run in parallel,
+        so a slow case does not end up running alone at the end) cases in
+        each group are ordered by their average ``elapsed``, unknown cases
+        counting as the slowest; otherwise the original order is kept.
+        """
+
+        cases = list(test_cases)
+        records = self.lookup(cases)
+
+        def priority(case: TestCase) -> tuple[bool, float]:
+            record = records.get(case.index)
+            if record is None:
+                return False, -math.inf if longest_first else 0.0
+            return not record.failed, -record.average_elapsed if longest_first else 0.0
+
+        return sorted(cases, key=priority)
+
+    def record(self, result: TestResult) -> None:
+        # Cached and deduplicated results repeat another run; they carry no
+        # new information.
+        if result.cached or result.deduplicated:
+            return
+        with self._lock:
+            self._pending[case_key(result.case)] = (result.status, result.elapsed)
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            self._db.execute("BEGIN")
+            try:
+                now = time.time()
+                for key, (status, elapsed) in pending.items():
+                    row = self._db.execute(
+                        "SELECT elapsed, runs, samples FROM cases WHERE key = ?", (key,)
+                    ).fetchone()
+                    samples = list(_unpack(row[2])) if row else []
+                    if math.isnan(elapsed):
+                        average = row[0] if row else 0.0
+                    else:
+                        samples = (samples + [elapsed])[-ELAPSED_SAMPLES:]
+                        average = elapsed if row is None else row[0] + ELAPSED_SMOOTHING * (elapsed - row[0])
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO cases (key, status, elapsed, runs, updated, samples)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, status, average, (row[1] if row else 0) + 1, now, _pack(samples)),
+                    )
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pending.clear()
+            self._db.execute("DELETE FROM cases")
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,148 @@
+"""Kernel-enforced resource limits of the processes that run the cases.
+
+Limits are applied to the child with ``prlimit`` right after it starts
+(Linux) or with ``setrlimit`` between ``fork`` and ``exec`` elsewhere, so
+they count only the case's own consumption: unlike a wall-clock timeout, a
+CPU-time limit is not tripped by other cases competing for the same cores,
+and a memory limit keeps one runaway case from pushing the host into swap.
+Children run in their own session, and :func:`kill_process_group` takes
+down everything they started along with them.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import signal
+import sys
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+try:
+    import resource
+except ModuleNotFoundError:  # pragma: no cover - Windows
+    resource = None
+
+__all__ = ["ResourceLimits", "kill_process_group", "LIMIT_MESSAGES", "MEMORY_LIMIT_STATUS"]
+
+# ``TestResult.limit`` values and the messages of results stopped by them.
+LIMIT_MESSAGES = {
+    "time": "Превышено время ожидания",
+    "cpu": "Превышен лимит процессорного времени",
+    "output": "Превышен допустимый объём вывода, процесс остановлен",
+    "memory": "Превышен лимит памяти",
+}
+# ``TestResult.status`` of cases stopped by the memory limit.
+MEMORY_LIMIT_STATUS = "memory_limit"
+
+_SIGXCPU = getattr(signal, "SIGXCPU", None)
+# Linux counts the heap and every private mapping in RLIMIT_DATA, which
+# leaves out the shared libraries and reserved-but-unused address space
+# that RLIMIT_AS would charge; other systems only enforce RLIMIT_AS.
+_MEMORY_RESOURCE = None
+if resource is not None:
+    _MEMORY_RESOURCE = resource.RLIMIT_DATA if sys.platform == "linux" else resource.RLIMIT_AS
+# Signs of a failed allocation at the end of a child's stderr.
+_MEMORY_ERRORS = (b"MemoryError", b"Cannot allocate memory", b"out of memory")
+_STDERR_TAIL = 4096
+# A child killed by a signal with its peak this close to the limit is
+# taken to have run out of memory outside Python (e.g. in an extension).
+_MEMORY_PEAK_SHARE = 0.9
+
+
+def kill_process_group(pid: int) -> None:
+    """Kill the process group led by *pid*, ignoring a group that is already gone."""
+
+    if not hasattr(os, "killpg"):
+        return
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+@dataclass(slots=True, frozen=True)
+class ResourceLimits:
+    """Per-case limits enforced by the kernel in the child process.
+
+    ``cpu`` is the user plus system CPU time in seconds.  The kernel counts
+    it in whole seconds: at ``cpu`` rounded up the child gets ``SIGXCPU``,
+    and a child that ignores it is killed one second later.  ``memory`` is
+    the size in bytes the child's data may grow to; allocations beyond it
+    fail, which a Python script reports as a ``MemoryError``.
+    """
+
+    cpu: Optional[float] = None
+    memory: Optional[int] = None
+
+    @property
+    def active(self) -> bool:
+        return self.cpu is not None or self.memory is not None
+
+    def rlimits(self) -> List[Tuple[int, int, int]]:
+        """``(resource, soft, hard)`` triples to apply to the child."""
+
+        if not self.active:
+            return []
+        if resource is None:
+            raise RuntimeError("Ограничения ресурсов недоступны на этой платформе")
+        limits = []
+        if self.cpu is not None:
+            seconds = max(1, math.ceil(self.cpu))
+            limits.append((resource.RLIMIT_CPU, seconds, seconds + 1))
+        if self.memory is not None:
+            limits.append((_MEMORY_RESOURCE, self.memory, self.memory))
+        return limits
+
+    def popen_kwargs(self) -> Dict[str, Any]:
+        """Extra :class:`subprocess.Popen` arguments: own session, and limits
+        set before ``exec`` where they cannot be applied afterwards."""
+
+        kwargs: Dict[str, Any] = {"start_new_session": True}
+        if self.active and not hasattr(resource, "prlimit"):
+            rlimits = self.rlimits()
+            kwargs["preexec_fn"] = lambda: _set_limits(rlimits)
+        return kwargs
+
+    def apply_to(self, pid: int) -> None:
+        """Apply the limits to a started child (a no-op where ``preexec_fn`` did it)."""
+
+        if self.active and hasattr(resource, "prlimit"):
+            for kind, soft, hard in self.rlimits():
+                resource.prlimit(pid, kind, (soft, hard))
+
+    def exceeded(
+        self,
+        returncode: Optional[int],
+        usage: Mapping[str, Any],
+        stderr: str | bytes = b"",
+    ) -> Optional[str]:
+        """Return the kind of limit that stopped a child, if one did.
+
+        *usage* holds the ``TestResult`` usage fields of the child (see
+        :func:`~test_runner.usage.usage_from_values`).
+        """
+
+        if returncode is None or returncode == 0:
+            return None
+        if self.cpu is not None and returncode < 0:
+            if _SIGXCPU is not None and returncode == -_SIGXCPU:
+                return "cpu"
+            cpu_time = (usage.get("user_time") or 0.0) + (usage.get("system_time") or 0.0)
+            if returncode == -signal.SIGKILL and cpu_time >= max(1, math.ceil(self.cpu)):
+                # The hard limit, for children that ignored SIGXCPU.
+                return "cpu"
+        if self.memory is not None:
+            if isinstance(stderr, str):
+                stderr = stderr[-_STDERR_TAIL:].encode("utf-8", "replace")
+            if any(marker in stderr[-_STDERR_TAIL:] for marker in _MEMORY_ERRORS):
+                return "memory"
+            peak = usage.get("max_rss_kib")
+            if returncode < 0 and peak is not None and peak * 1024 >= _MEMORY_PEAK_SHARE * self.memory:
+                return "memory"
+        return None
+
+
+def _set_limits(rlimits: Sequence[Tuple[int, int, int]]) -> None:
+    for kind, soft, hard in rlimits:
+        resource.setrlimit(kind, (soft, hard))
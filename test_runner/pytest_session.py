@@ -0,0 +1,227 @@
+"""Run pytest inside the current process and collect structured outcomes.
+
+:func:`run_pytest` calls :func:`pytest.main` with a small plugin instead of
+starting ``python -m pytest``: pytest, its plugins and :mod:`test_runner`
+stay imported between runs, and every test outcome arrives as a
+:class:`PytestOutcome` mapped back to ``TestCase.index`` through the
+property that generated modules record (see
+:data:`~test_runner.generator.CASE_INDEX_PROPERTY`), so nothing has to be
+parsed out of pytest's terminal output.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import importlib
+import io
+import os
+import sys
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, ContextManager, Dict, List, Optional
+
+from .generator import CASE_INDEX_PROPERTY, RECORDED_RESULTS_ENV
+
+if TYPE_CHECKING:
+    from .executor import CancelToken
+
+__all__ = ["PytestOutcome", "PytestReport", "run_pytest", "watch_cancel"]
+
+# ``pytest.main`` keeps global state (sys.path, assertion rewriting hooks,
+# the captured streams), so runs in one process must not overlap.
+_RUN_LOCK = threading.Lock()
+# The *cancel* token of the run_pytest() call in progress.
+_cancel: Optional[CancelToken] = None
+
+_CANCELLED_MESSAGE = "Отменено"
+
+
+@dataclass(slots=True)
+class PytestOutcome:
+    """Result of one pytest test item."""
+
+    nodeid: str
+    outcome: str
+    duration: float
+    message: str = ""
+    index: Optional[int] = None
+
+    @property
+    def failed(self) -> bool:
+        return self.outcome in {"failed", "error"}
+
+
+@dataclass(slots=True)
+class PytestReport:
+    """Everything a finished :func:`run_pytest` call reports."""
+
+    exit_code: int
+    outcomes: List[PytestOutcome] = field(default_factory=list)
+    output: str = ""
+
+    def by_index(self) -> Dict[int, PytestOutcome]:
+        return {outcome.index: outcome for outcome in self.outcomes if outcome.index is not None}
+
+    def counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for outcome in self.outcomes:
+            counts[outcome.outcome] = counts.get(outcome.outcome, 0) + 1
+        return counts
+
+
+def _failure_message(report: object) -> str:
+    longrepr = getattr(report, "longrepr", None)
+    crash = getattr(longrepr, "reprcrash", None)
+    if crash is not None:
+        return crash.message
+    if isinstance(longrepr, tuple):
+        # Skips report ``(path, line, reason)``.
+        return str(longrepr[-1])
+    return str(longrepr) if longrepr is not None else ""
+
+
+def _case_index(params: Dict[str, object]) -> Optional[int]:
+    """The case index in a generated test's parameters, if any."""
+
+    case = params.get("case")
+    if isinstance(case, dict) and isinstance(case.get("index"), int):
+        return case["index"]
+    # Data-file modules: ``(offset, length, index, name)`` from the index file.
+    entry = params.get("entry")
+    if isinstance(entry, tuple) and len(entry) == 4 and isinstance(entry[2], int):
+        return entry[2]
+    return None
+
+
+class _OutcomeCollector:
+    """pytest plugin that turns test reports into :class:`PytestOutcome`."""
+
+    def __init__(self, cancel: Optional[CancelToken]) -> None:
+        self._cancel = cancel
+        self._indexes: Dict[str, int] = {}
+        self.outcomes: Dict[str, PytestOutcome] = {}
+
+    def pytest_itemcollected(self, item: object) -> None:
+        # The parameter itself carries the case index, which also covers
+        # tests that fail before recording any property.
+        callspec = getattr(item, "callspec", None)
+        index = _case_index(callspec.params) if callspec is not None else None
+        if index is not None:
+            self._indexes[item.nodeid] = index  # type: ignore[attr-defined]
+
+    def pytest_runtest_protocol(self, item: object, nextitem: object) -> Optional[bool]:
+        if self._cancel is not None and self._cancel.cancelled:
+            # Claiming the item skips it; the session stops right after.
+            item.session.shouldstop = _CANCELLED_MESSAGE  # type: ignore[attr-defined]
+            return True
+        return None
+
+    def pytest_runtest_logreport(self, report: object) -> None:
+        nodeid: str = report.nodeid  # type: ignore[attr-defined]
+        when: str = report.when  # type: ignore[attr-defined]
+        for name, value in report.user_properties:  # type: ignore[attr-defined]
+            if name == CASE_INDEX_PROPERTY:
+                self._indexes[nodeid] = value
+
+        outcome = self.outcomes.get(nodeid)
+        if outcome is None:
+            outcome = PytestOutcome(nodeid, "passed", 0.0, index=self._indexes.get(nodeid))
+            self.outcomes[nodeid] = outcome
+        outcome.index = self._indexes.get(nodeid, outcome.index)
+        outcome.duration += report.duration  # type: ignore[attr-defined]
+
+        if report.skipped:  # type: ignore[attr-defined]
+            outcome.outcome = "skipped"
+            outcome.message = _failure_message(report)
+        elif report.failed:  # type: ignore[attr-defined]
+            # A failing fixture (setup or teardown) is an error, as pytest reports it.
+            if when == "call":
+                outcome.outcome = "failed"
+            elif outcome.outcome != "failed":
+                outcome.outcome = "error"
+            outcome.message = outcome.message or _failure_message(report)
+
+
+def _forget_module(path: Path) -> None:
+    """Drop the module loaded from *path* so the next run imports it afresh.
+
+    The generated module is rewritten between runs and reads the recorded
+    results at import time; everything else stays imported.
+    """
+
+    target = os.path.normcase(str(path.resolve()))
+    for name, module in list(sys.modules.items()):
+        filename = getattr(module, "__file__", None)
+        if filename and os.path.normcase(os.path.abspath(filename)) == target:
+            del sys.modules[name]
+
+
+@contextlib.contextmanager
+def _environment(name: str, value: Optional[str]):
+    previous = os.environ.get(name)
+    if value is None:
+        os.environ.pop(name, None)
+    else:
+        os.environ[name] = value
+    try:
+        yield
+    finally:
+        if previous is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = previous
+
+
+def watch_cancel(victim: object) -> ContextManager[None]:
+    """Kill *victim* (anything with a ``kill()`` method) if the
+    :func:`run_pytest` call running the current test is cancelled.
+
+    Generated modules wrap the process of every test in it, so a cancelled
+    run does not wait for the test in progress.  Outside :func:`run_pytest`,
+    for example under ``python -m pytest``, it does nothing.
+    """
+
+    token = _cancel
+    if token is None:
+        return contextlib.nullcontext()
+    return token.watch(victim)
+
+
+def run_pytest(
+    test_file: Path,
+    *,
+    recorded_results: Optional[Path] = None,
+    cancel: Optional[CancelToken] = None,
+    args: tuple[str, ...] = (),
+) -> PytestReport:
+    """Run pytest on *test_file* in this process.
+
+    *recorded_results* is passed to the module through
+    :data:`~test_runner.generator.RECORDED_RESULTS_ENV`.  A *cancel* token
+    is checked before every test and kills the process of the test in
+    progress (see :func:`watch_cancel`); a cancelled run reports no outcome
+    for the remaining tests.  pytest's terminal output is kept in
+    :attr:`PytestReport.output`; test output is captured with
+    ``--capture=sys`` so that the run does not redirect the file
+    descriptors of the whole process.
+    """
+
+    importlib.invalidate_caches()
+    import pytest
+
+    collector = _OutcomeCollector(cancel)
+    terminal = io.StringIO()
+    arguments = [str(test_file), "-q", "--capture=sys", "-p", "no:cacheprovider", *args]
+    recorded = str(recorded_results) if recorded_results is not None else None
+    global _cancel
+    with _RUN_LOCK, _environment(RECORDED_RESULTS_ENV, recorded):
+        _forget_module(test_file)
+        _cancel = cancel
+        try:
+            with contextlib.redirect_stdout(terminal):
+                exit_code = pytest.main(arguments, plugins=[collector])
+        finally:
+            _cancel = None
+        _forget_module(test_file)
+    return PytestReport(int(exit_code), list(collector.outcomes.values()), terminal.getvalue())
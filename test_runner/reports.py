@@ -0,0 +1,158 @@
+"""Machine-readable reports of a finished run (JSON and JUnit XML)."""
+
+from __future__ import annotations
+
+import json
+import math
+import re
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence
+
+from ._text import display_text
+from .executor import TestResult, is_timeout
+from .limits import MEMORY_LIMIT_STATUS
+from .usage import suite_totals
+
+__all__ = ["status_counts", "write_json_report", "write_junit_report"]
+
+# Characters that XML 1.0 does not allow even when escaped.
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+_CASE_FIELDS = (
+    "status",
+    "message",
+    "returncode",
+    "elapsed",
+    "startup",
+    "cached",
+    "deduplicated",
+    "user_time",
+    "system_time",
+    "max_rss_kib",
+    "voluntary_switches",
+    "involuntary_switches",
+    "truncated",
+    "stdout_file",
+    "stderr_file",
+    "divergence_offset",
+    "divergence_line",
+    "reference_elapsed",
+    "speedup",
+    "worker",
+    "limit",
+    "stdout",
+    "stderr",
+)
+
+
+def status_counts(results: Iterable[TestResult]) -> Dict[str, int]:
+    counts = {"passed": 0, "failed": 0, "error": 0, MEMORY_LIMIT_STATUS: 0, "executed": 0}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+    return counts
+
+
+def _finite(value: float | None) -> float | None:
+    return None if value is None or math.isnan(value) else value
+
+
+def _case_record(result: TestResult) -> Dict[str, Any]:
+    record: Dict[str, Any] = {"index": result.case.index, "label": result.case.label}
+    for name in _CASE_FIELDS:
+        record[name] = getattr(result, name)
+    record["elapsed"] = _finite(result.elapsed)
+    record["timed_out"] = is_timeout(result)
+    record["stdout"] = display_text(result.stdout)
+    record["stderr"] = display_text(result.stderr)
+    return record
+
+
+def write_json_report(
+    results: Sequence[TestResult],
+    path: Path,
+    *,
+    script: Path,
+    suite: Path,
+) -> Path:
+    """Write every result and a summary as one JSON document."""
+
+    totals = suite_totals(results)
+    payload = {
+        "script": str(script),
+        "suite": str(suite),
+        "summary": {
+            "total": len(results),
+            **status_counts(results),
+            "elapsed": totals.elapsed,
+            "user_time": totals.user_time,
+            "system_time": totals.system_time,
+            "max_rss_kib": totals.max_rss_kib,
+            "speedup": totals.speedup,
+            "deduplicated": totals.deduplicated,
+        },
+        "cases": [_case_record(result) for result in results],
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as handle:
+        json.dump(payload, handle, ensure_ascii=False, indent=1)
+    return path
+
+
+def _xml_text(text: str) -> str:
+    return _XML_INVALID.sub("\ufffd", text)
+
+
+def _seconds(value: float | None) -> str:
+    value = _finite(value)
+    return f"{value:.6f}" if value is not None else "0"
+
+
+def write_junit_report(
+    results: Sequence[TestResult],
+    path: Path,
+    *,
+    suite_name: str,
+) -> Path:
+    """Write a JUnit XML report that CI systems can display.
+
+    ``failed`` cases become ``<failure>``, ``error`` and ``memory_limit``
+    cases ``<error>``; ``passed`` and ``executed`` cases have no child
+    element.
+    """
+
+    counts = status_counts(results)
+    root = ET.Element("testsuites")
+    suite = ET.SubElement(
+        root,
+        "testsuite",
+        name=suite_name,
+        tests=str(len(results)),
+        failures=str(counts["failed"]),
+        errors=str(counts["error"] + counts[MEMORY_LIMIT_STATUS]),
+        skipped="0",
+        time=_seconds(sum(_finite(result.elapsed) or 0.0 for result in results)),
+    )
+    for result in results:
+        case = ET.SubElement(
+            suite,
+            "testcase",
+            classname=suite_name,
+            name=_xml_text(f"{result.case.index}: {result.case.label}"),
+            time=_seconds(result.elapsed),
+        )
+        if result.has_error:
+            tag = "failure" if result.status == "failed" else "error"
+            problem = ET.SubElement(case, tag, message=_xml_text(result.message))
+            details: List[str] = []
+            if result.case.expected_output is not None and result.status == "failed":
+                details += ["Ожидалось:", display_text(result.case.expected_output).rstrip()]
+            problem.text = _xml_text("\n".join(details))
+        if result.stdout:
+            ET.SubElement(case, "system-out").text = _xml_text(display_text(result.stdout))
+        if result.stderr:
+            ET.SubElement(case, "system-err").text = _xml_text(display_text(result.stderr))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    ET.ElementTree(root).write(path, encoding="utf-8", xml_declaration=True)
+    return path
@@ -0,0 +1,197 @@
+"""Compact storage of large suites with one copy of every distinct input."""
+
+from __future__ import annotations
+
+import sys
+from array import array
+from dataclasses import dataclass
+from typing import IO, Dict, Iterable, Iterator, List, Optional
+
+from ._text import as_bytes
+from .cases import TestCase, iter_cases
+from .tracing import span
+
+__all__ = ["CaseSuite", "SuiteStats", "describe_stats"]
+
+
+@dataclass(slots=True)
+class SuiteStats:
+    """Size figures of a :class:`CaseSuite`.
+
+    ``stored_bytes`` is the memory taken by the stored inputs, expected
+    outputs, labels and the per-case tables; ``plain_bytes`` is what the
+    same suite takes as a list of :class:`TestCase` objects with their own
+    ``str`` attributes.
+    """
+
+    cases: int
+    distinct_inputs: int
+    distinct_expected: int
+    stored_bytes: int
+    plain_bytes: int
+
+    @property
+    def duplicate_inputs(self) -> int:
+        return self.cases - self.distinct_inputs
+
+
+class _InternTable:
+    """Keeps one ``bytes`` object per distinct value and numbers them."""
+
+    __slots__ = ("values", "_ids", "size")
+
+    def __init__(self) -> None:
+        self.values: List[bytes] = []
+        self._ids: Dict[bytes, int] = {}
+        self.size = 0
+
+    def intern(self, value: bytes) -> int:
+        number = self._ids.get(value)
+        if number is None:
+            number = self._ids[value] = len(self.values)
+            self.values.append(value)
+            self.size += sys.getsizeof(value)
+        return number
+
+    def nbytes(self) -> int:
+        return self.size + sys.getsizeof(self.values) + sys.getsizeof(self._ids)
+
+
+class CaseSuite:
+    """A sequence of test cases stored as interned, encoded texts.
+
+    Inputs and expected outputs are kept as ``bytes`` in *encoding*, with a
+    single copy per distinct content; each case only stores its index, its
+    label and the numbers of its texts.  Iterating over the suite yields
+    ordinary :class:`TestCase` objects built on the fly, so a suite can be
+    passed wherever an iterable of cases is expected.  Labels equal to the
+    default ``"Тест <index>"`` are not stored, and neither are the
+    comparators of cases that leave the choice to the run.
+    """
+
+    def __init__(self, *, encoding: str = "utf-8") -> None:
+        self.encoding = encoding
+        self._indexes = array("q")
+        self._input_ids = array("I")
+        self._expected_ids = array("i")
+        self._labels: Dict[int, str] = {}
+        self._comparators: Dict[int, str] = {}
+        self._inputs = _InternTable()
+        self._expected = _InternTable()
+        self._plain_bytes = 0
+
+    @classmethod
+    def from_cases(cls, test_cases: Iterable[TestCase], *, encoding: str = "utf-8") -> "CaseSuite":
+        suite = cls(encoding=encoding)
+        suite.extend(test_cases)
+        return suite
+
+    @classmethod
+    def from_stream(cls, stream: IO[str] | IO[bytes], *, encoding: str = "utf-8") -> "CaseSuite":
+        """Parse a suite file (see :func:`~test_runner.cases.iter_cases`) into a suite."""
+
+        with span("parse_cases"):
+            return cls.from_cases(iter_cases(stream, encoding=encoding), encoding=encoding)
+
+    def append(self, case: TestCase) -> None:
+        position = len(self._indexes)
+        self._indexes.append(case.index)
+        if case.label != f"Тест {case.index}":
+            self._labels[position] = case.label
+        if case.comparator is not None:
+            self._comparators[position] = sys.intern(case.comparator)
+        self._input_ids.append(self._inputs.intern(as_bytes(case.input_data, self.encoding)))
+        # The case object, its texts and its slot in a list of cases.
+        self._plain_bytes += (
+            sys.getsizeof(case) + sys.getsizeof(case.label) + sys.getsizeof(case.input_data) + 8
+        )
+        if case.expected_output is None:
+            self._expected_ids.append(-1)
+        else:
+            self._expected_ids.append(self._expected.intern(as_bytes(case.expected_output, self.encoding)))
+            self._plain_bytes += sys.getsizeof(case.expected_output)
+
+    def extend(self, test_cases: Iterable[TestCase]) -> None:
+        for case in test_cases:
+            self.append(case)
+
+    def __len__(self) -> int:
+        return len(self._indexes)
+
+    def __getitem__(self, position: int) -> TestCase:
+        if position < 0:
+            position += len(self)
+        return self._case(position, decode=True)
+
+    def __iter__(self) -> Iterator[TestCase]:
+        for position in range(len(self)):
+            yield self._case(position, decode=True)
+
+    def iter_bytes(self) -> Iterator[TestCase]:
+        """Yield the cases with their stored ``bytes`` texts, decoding nothing.
+
+        The texts are in :attr:`encoding` and are the suite's own objects,
+        shared by every case with the same content; meant for binary runs
+        (``binary=True`` of :func:`~test_runner.executor.run_test_cases`).
+        """
+
+        for position in range(len(self)):
+            yield self._case(position, decode=False)
+
+    def _case(self, position: int, *, decode: bool) -> TestCase:
+        index = self._indexes[position]
+        input_data: str | bytes = self._inputs.values[self._input_ids[position]]
+        expected_id = self._expected_ids[position]
+        expected: Optional[str | bytes] = None if expected_id < 0 else self._expected.values[expected_id]
+        if decode:
+            input_data = input_data.decode(self.encoding)
+            if expected is not None:
+                expected = expected.decode(self.encoding)
+        return TestCase(
+            index=index,
+            label=self._labels.get(position, f"Тест {index}"),
+            input_data=input_data,
+            expected_output=expected,
+            comparator=self._comparators.get(position),
+        )
+
+    def input_id(self, position: int) -> int:
+        """Return the number of the distinct input used by the case at *position*."""
+
+        return self._input_ids[position]
+
+    def stats(self) -> SuiteStats:
+        tables = sum(
+            sys.getsizeof(table)
+            for table in (
+                self._indexes,
+                self._input_ids,
+                self._expected_ids,
+                self._labels,
+                self._comparators,
+            )
+        )
+        labels = sum(sys.getsizeof(label) for label in self._labels.values())
+        stored = self._inputs.nbytes() + self._expected.nbytes() + tables + labels
+        return SuiteStats(
+            cases=len(self),
+            distinct_inputs=len(self._inputs.values),
+            distinct_expected=len(self._expected.values),
+            stored_bytes=stored,
+            plain_bytes=self._plain_bytes,
+        )
+
+    def __repr__(self) -> str:
+        return f"CaseSuite({len(self)} cases, {len(self._inputs.values)} distinct inputs)"
+
+
+def describe_stats(stats: SuiteStats) -> Optional[str]:
+    """One-line Russian summary of *stats*, or ``None`` for an empty suite."""
+
+    if not stats.cases:
+        return None
+    return (
+        f"тестов {stats.cases}, различных входов {stats.distinct_inputs}; "
+        f"память данных {stats.stored_bytes / 1024:.0f} КиБ "
+        f"(отдельными строками {stats.plain_bytes / 1024:.0f} КиБ)"
+    )
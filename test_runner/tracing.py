@@ -0,0 +1,240 @@
+"""Phase-level tracing of a run, exported as Chrome trace-event JSON.
+
+The library wraps its phases in :func:`span` — parsing the suite, writing
+and running the pytest module, and for every case its ``case`` span with
+the ``spawn``, ``wait`` and ``compare`` phases nested in it — and the same
+function (or the :func:`traced` decorator) adds spans of your own::
+
+    with Tracer() as tracer:
+        run_test_cases(cases, script)
+        with span("report", category="app"):
+            write_report(...)
+    tracer.write_chrome_trace("trace.json")   # open in ui.perfetto.dev
+    print("\\n".join(describe_summary(tracer.summary())))
+
+Spans are recorded only while a :class:`Tracer` is active; otherwise
+:func:`span` returns a shared no-op context manager and costs one function
+call.  Spans of all threads go to the active tracer and are shown per
+thread; child processes are not traced.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import functools
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Dict, List, Optional, TypeVar
+
+__all__ = [
+    "Tracer",
+    "PhaseSummary",
+    "span",
+    "record_span",
+    "traced",
+    "active_tracer",
+    "describe_summary",
+]
+
+_F = TypeVar("_F", bound=Callable[..., Any])
+
+_NULL_SPAN = contextlib.nullcontext()
+_tracer: Optional["Tracer"] = None
+
+
+@dataclass(slots=True)
+class PhaseSummary:
+    """Totals of the spans with one name, in seconds."""
+
+    name: str
+    count: int
+    total: float
+    longest: float
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "category", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, category: str, args: Dict[str, Any]) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        self.tracer._add(self.name, self.category, self.start, time.perf_counter_ns(), self.args)
+
+
+class Tracer:
+    """Collects spans while active (between :meth:`start` and :meth:`stop`,
+    or inside a ``with`` block).
+
+    Only one tracer records at a time; starting a tracer while another is
+    active suspends the other until this one stops.
+    """
+
+    def __init__(self) -> None:
+        # (name, category, start_ns, end_ns, thread id, args)
+        self._events: List[tuple[str, str, int, int, int, Dict[str, Any]]] = []
+        self._threads: Dict[int, str] = {}
+        self._previous: Optional[Tracer] = None
+        self._origin = time.perf_counter_ns()
+
+    def start(self) -> "Tracer":
+        global _tracer
+        self._previous, _tracer = _tracer, self
+        return self
+
+    def stop(self) -> None:
+        global _tracer
+        if _tracer is self:
+            _tracer = self._previous
+        self._previous = None
+
+    def __enter__(self) -> "Tracer":
+        return self.start()
+
+    def __exit__(self, *_exc: object) -> None:
+        self.stop()
+
+    def span(self, name: str, category: str = "phase", **args: Any) -> _Span:
+        """A span recorded by this tracer whether or not it is active."""
+
+        return _Span(self, name, category, args)
+
+    def _add(self, name: str, category: str, start: int, end: int, args: Dict[str, Any]) -> None:
+        thread = threading.current_thread()
+        if thread.ident not in self._threads:
+            self._threads[thread.ident] = thread.name  # type: ignore[index]
+        # list.append is atomic, so threads need no lock here.
+        self._events.append((name, category, start, end, thread.ident, args))  # type: ignore[arg-type]
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """The spans as a Chrome/Perfetto trace-event document."""
+
+        pid = os.getpid()
+        events: List[Dict[str, Any]] = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in self._threads.items()
+        ]
+        for name, category, start, end, tid, args in sorted(self._events, key=lambda event: event[2]):
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - self._origin) / 1000,
+                "dur": (end - start) / 1000,
+                "pid": pid,
+                "tid": tid,
+            }
+            if args:
+                event["args"] = {key: _json_value(value) for key, value in args.items()}
+            events.append(event)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str | os.PathLike[str]) -> Path:
+        """Write :meth:`chrome_trace` to *path* (open it in Perfetto or ``chrome://tracing``)."""
+
+        import json
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.chrome_trace(), ensure_ascii=False), encoding="utf-8")
+        return path
+
+    def summary(self) -> List[PhaseSummary]:
+        """Totals per span name, the largest total first."""
+
+        phases: Dict[str, PhaseSummary] = {}
+        for name, _category, start, end, _tid, _args in self._events:
+            seconds = (end - start) / 1e9
+            phase = phases.get(name)
+            if phase is None:
+                phase = phases[name] = PhaseSummary(name, 0, 0.0, 0.0)
+            phase.count += 1
+            phase.total += seconds
+            phase.longest = max(phase.longest, seconds)
+        return sorted(phases.values(), key=lambda phase: phase.total, reverse=True)
+
+
+def _json_value(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def active_tracer() -> Optional[Tracer]:
+    """The tracer that is recording, if any."""
+
+    return _tracer
+
+
+def span(name: str, category: str = "phase", **args: Any) -> ContextManager[Any]:
+    """Record the ``with`` block as a span named *name* in the active tracer.
+
+    *args* are shown with the span in the trace viewer.  Without an active
+    tracer the block runs untouched.
+    """
+
+    tracer = _tracer
+    if tracer is None:
+        return _NULL_SPAN
+    return _Span(tracer, name, category, args)
+
+
+def record_span(name: str, start: float, end: float, category: str = "phase", **args: Any) -> None:
+    """Record a span measured elsewhere; *start* and *end* come from
+    :func:`time.perf_counter`."""
+
+    tracer = _tracer
+    if tracer is not None:
+        tracer._add(name, category, int(start * 1e9), int(end * 1e9), args)
+
+
+def traced(name: Optional[str] = None, category: str = "phase") -> Callable[[_F], _F]:
+    """Decorator that records every call of the function as a span
+    (named after the function unless *name* is given)."""
+
+    def decorate(function: _F) -> _F:
+        label = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            tracer = _tracer
+            if tracer is None:
+                return function(*args, **kwargs)
+            with _Span(tracer, label, category, {}):
+                return function(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+def describe_summary(phases: List[PhaseSummary]) -> List[str]:
+    """The summary as an aligned Russian table, one line per phase."""
+
+    if not phases:
+        return ["Трассировка пуста"]
+    width = max(len("Этап"), *(len(phase.name) for phase in phases))
+    lines = [f"{'Этап':<{width}}  {'вызовов':>8}  {'всего, с':>10}  {'среднее, мс':>11}  {'макс., мс':>10}"]
+    for phase in phases:
+        lines.append(
+            f"{phase.name:<{width}}  {phase.count:>8}  {phase.total:>10.3f}  "
+            f"{phase.mean * 1000:>11.2f}  {phase.longest * 1000:>10.2f}"
+        )
+    return lines
@@ -0,0 +1,139 @@
+"""Per-process resource accounting based on ``wait4``."""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterable, Optional, Sequence
+
+if TYPE_CHECKING:
+    from .executor import TestResult
+
+__all__ = [
+    "USAGE_FIELDS",
+    "ResourcePopen",
+    "UsageTotals",
+    "usage_from_values",
+    "suite_totals",
+]
+
+# TestResult fields filled from the child's rusage, in ``usage_from_values`` order.
+USAGE_FIELDS = (
+    "user_time",
+    "system_time",
+    "max_rss_kib",
+    "voluntary_switches",
+    "involuntary_switches",
+)
+
+
+def usage_from_values(values: Optional[Sequence[float]]) -> dict[str, float | int | None]:
+    """Map ``(utime, stime, maxrss, nvcsw, nivcsw)`` onto the TestResult fields.
+
+    ``ru_maxrss`` is reported in kilobytes on Linux and in bytes on macOS; the
+    result is normalized to KiB.
+    """
+
+    if values is None:
+        return dict.fromkeys(USAGE_FIELDS)
+    user, system, max_rss, voluntary, involuntary = values
+    if sys.platform == "darwin":
+        max_rss //= 1024
+    return {
+        "user_time": float(user),
+        "system_time": float(system),
+        "max_rss_kib": int(max_rss),
+        "voluntary_switches": int(voluntary),
+        "involuntary_switches": int(involuntary),
+    }
+
+
+class ResourcePopen(subprocess.Popen):
+    """:class:`subprocess.Popen` that reaps its child with ``os.wait4``.
+
+    After the process has been waited for, :attr:`rusage` holds the raw
+    ``(utime, stime, maxrss, nvcsw, nivcsw)`` values of the child (``None``
+    on platforms without ``wait4``).
+    """
+
+    rusage: Optional[tuple[float, float, int, int, int]] = None
+
+    if hasattr(os, "wait4"):
+
+        def _try_wait(self, wait_flags: int) -> tuple[int, int]:
+            try:
+                pid, status, usage = os.wait4(self.pid, wait_flags)
+            except ChildProcessError:
+                # Reaped elsewhere (e.g. SIGCHLD set to SIG_IGN); mirror Popen.
+                return self.pid, 0
+            if pid == self.pid:
+                self.rusage = (
+                    usage.ru_utime,
+                    usage.ru_stime,
+                    usage.ru_maxrss,
+                    usage.ru_nvcsw,
+                    usage.ru_nivcsw,
+                )
+            return pid, status
+
+
+@dataclass(slots=True)
+class UsageTotals:
+    """Resource usage aggregated over a suite.
+
+    CPU times, wall time and context switches are summed; ``max_rss_kib`` is
+    the largest peak of any single case.  Cases without usage data (cached
+    results from older runs, the asyncio backend) only count towards
+    ``cases`` and ``elapsed``.  Cases compared with a reference script add
+    their own and the reference's wall time to ``compared_elapsed`` and
+    ``reference_elapsed``.  ``deduplicated`` counts the cases that reused
+    the run of another case with the same input.
+    """
+
+    cases: int = 0
+    elapsed: float = 0.0
+    user_time: float = 0.0
+    system_time: float = 0.0
+    max_rss_kib: int = 0
+    voluntary_switches: int = 0
+    involuntary_switches: int = 0
+    compared_elapsed: float = 0.0
+    reference_elapsed: float = 0.0
+    deduplicated: int = 0
+
+    @property
+    def speedup(self) -> Optional[float]:
+        """Overall speedup over the reference script, if any case was compared."""
+
+        if not self.compared_elapsed > 0:
+            return None
+        return self.reference_elapsed / self.compared_elapsed
+
+    def add(self, result: TestResult) -> None:
+        self.cases += 1
+        self.elapsed += result.elapsed
+        if result.user_time is not None:
+            self.user_time += result.user_time
+        if result.system_time is not None:
+            self.system_time += result.system_time
+        if result.max_rss_kib is not None:
+            self.max_rss_kib = max(self.max_rss_kib, result.max_rss_kib)
+        if result.voluntary_switches is not None:
+            self.voluntary_switches += result.voluntary_switches
+        if result.involuntary_switches is not None:
+            self.involuntary_switches += result.involuntary_switches
+        self.deduplicated += result.deduplicated
+        if result.reference_elapsed is not None:
+            self.compared_elapsed += result.elapsed
+            self.reference_elapsed += result.reference_elapsed
+
+
+def suite_totals(results: Iterable[TestResult]) -> UsageTotals:
+    """Return the :class:`UsageTotals` of *results*."""
+
+    totals = UsageTotals()
+    for result in results:
+        totals.add(result)
+    return totals
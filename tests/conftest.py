@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+import sys
+import textwrap
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+# The package lives next to this folder and is not installed.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def make_script(tmp_path: Path) -> Callable[[str], Path]:
+    """Write a script under test into the test's temporary folder."""
+
+    counter = iter(range(1_000_000))
+
+    def make(source: str) -> Path:
+        path = tmp_path / f"script_{next(counter)}.py"
+        path.write_text(textwrap.dedent(source), encoding="utf-8")
+        return path
+
+    return make
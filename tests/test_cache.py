@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from test_runner.cache import ResultCache
+from test_runner.cases import TestCase as Case
+from test_runner.executor import run_test_cases
+
+REVERSE = """
+import sys
+print(sys.stdin.read().strip()[::-1])
+"""
+
+# Prints a non-ASCII text whose decoding depends on the run's encoding.
+NON_ASCII = """
+import sys
+sys.stdout.buffer.write("привет".encode("utf-8"))
+"""
+
+
+def _case(text: str, expected: str | None = None) -> Case:
+    return Case(index=1, label="case", input_data=text, expected_output=expected)
+
+
+def test_second_run_is_answered_from_the_cache(tmp_path: Path, make_script) -> None:
+    script = make_script(REVERSE)
+    with ResultCache(tmp_path / "cache.sqlite3") as cache:
+        [first] = run_test_cases([_case("abc", "cba")], script, timeout=10, cache=cache)
+        [second] = run_test_cases([_case("abc", "cba")], script, timeout=10, cache=cache)
+        assert (cache.hits, cache.misses) == (1, 1)
+    assert not first.cached
+    assert second.cached
+    assert second.status == "passed"
+    assert second.stdout == first.stdout
+
+
+def test_changed_input_or_timeout_misses(tmp_path: Path, make_script) -> None:
+    script = make_script(REVERSE)
+    with ResultCache(tmp_path / "cache.sqlite3") as cache:
+        run_test_cases([_case("abc")], script, timeout=10, cache=cache)
+        [other_input] = run_test_cases([_case("abd")], script, timeout=10, cache=cache)
+        [other_timeout] = run_test_cases([_case("abc")], script, timeout=20, cache=cache)
+    assert not other_input.cached
+    assert not other_timeout.cached
+
+
+def test_cached_result_is_judged_by_the_new_expected_output(tmp_path: Path, make_script) -> None:
+    script = make_script(REVERSE)
+    with ResultCache(tmp_path / "cache.sqlite3") as cache:
+        run_test_cases([_case("abc", "cba")], script, timeout=10, cache=cache)
+        [hit] = run_test_cases([_case("abc", "abc")], script, timeout=10, cache=cache)
+    assert hit.cached
+    assert hit.status == "failed"
+
+
+def test_encoding_is_part_of_the_key(tmp_path: Path, make_script) -> None:
+    script = make_script(NON_ASCII)
+    with ResultCache(tmp_path / "cache.sqlite3") as cache:
+        [utf8] = run_test_cases([_case("")], script, timeout=10, cache=cache, encoding="utf-8")
+        [latin1] = run_test_cases([_case("")], script, timeout=10, cache=cache, encoding="latin-1")
+    assert utf8.stdout == "привет"
+    assert not latin1.cached
+    assert latin1.stdout == "привет".encode("utf-8").decode("latin-1")
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import pytest
+
+from test_runner.cases import TestCase as Case
+from test_runner.compare import COMPARATORS, MatchOutcome, get_comparator
+from test_runner.executor import run_test_cases
+
+SPECS = [*COMPARATORS, "numeric abs=0.01 rel=0"]
+
+# (output, expected) pairs that pass or fail in different ways per rule.
+PAIRS = [
+    ("1 2 3\n", "1 2 3"),
+    ("1  2\n3\r\n", "1 2 3"),
+    ("3\n1\n2\n", "1\n2\n3"),
+    ("1.004 2\n", "1 2"),
+    ("1 2\n", "1 2 3"),
+    ("1 2 3 4\n", "1 2 3"),
+    ("12 3\n", "1 23"),
+    ("привет, мир\n", "привет,  мир"),
+    ("", ""),
+    ("\n\n", "x"),
+]
+
+
+def _chunked(data: bytes, size: int) -> list[bytes]:
+    return [data[start : start + size] for start in range(0, len(data), size)] or [b""]
+
+
+def _feed(spec: str, chunks: list[bytes], expected: str | bytes) -> MatchOutcome:
+    matcher = get_comparator(spec).matcher(expected, "utf-8")
+    for chunk in chunks:
+        if not matcher.feed(chunk):
+            break
+    return matcher.finish()
+
+
+@pytest.mark.parametrize("spec", SPECS)
+@pytest.mark.parametrize("output, expected", PAIRS)
+def test_chunked_output_is_judged_like_the_whole_output(spec: str, output: str, expected: str) -> None:
+    data = output.encode("utf-8")
+    whole = get_comparator(spec).match(data, expected)
+    # Every chunk size, including 1 byte, which splits the UTF-8 letters
+    # and the CRLF pair.
+    for size in range(1, len(data) + 1):
+        assert _feed(spec, _chunked(data, size), expected) == whole, size
+    # Every single split point.
+    for cut in range(len(data) + 1):
+        assert _feed(spec, [data[:cut], data[cut:]], expected) == whole, cut
+
+
+@pytest.mark.parametrize("spec", SPECS)
+@pytest.mark.parametrize("output, expected", PAIRS)
+def test_binary_chunks_are_judged_like_the_whole_output(spec: str, output: str, expected: str) -> None:
+    data = output.encode("utf-8")
+    whole = get_comparator(spec).match(data, expected.encode("utf-8"))
+    for size in range(1, len(data) + 1):
+        assert _feed(spec, _chunked(data, size), expected.encode("utf-8")) == whole, size
+
+
+@pytest.mark.parametrize(
+    "spec, output, expected, matched",
+    [
+        ("exact", "1 2 3\n", "1 2 3", True),
+        ("exact", "1  2\n3\r\n", "1 2 3", False),
+        ("tokens", "1  2\n3\r\n", "1 2 3", True),
+        ("unordered", "3\n1\n2\n", "1\n2\n3", True),
+        ("tokens", "3\n1\n2\n", "1\n2\n3", False),
+        ("numeric abs=0.01 rel=0", "1.004 2\n", "1 2", True),
+        ("numeric", "1.004 2\n", "1 2", False),
+        ("tokens", "12 3\n", "1 23", False),
+    ],
+)
+def test_rules_judge_whole_outputs(spec: str, output: str, expected: str, matched: bool) -> None:
+    assert get_comparator(spec).match(output.encode(), expected).matched is matched
+
+
+def test_divergence_points_at_the_first_wrong_character() -> None:
+    outcome = _feed("exact", _chunked(b"abc\nabX\n", 1), "abc\nabc")
+    assert outcome == MatchOutcome(False, 6, 2)
+
+
+# Writes its answer piece by piece, with pauses, so the runner reads it in
+# several chunks.
+PIECES = """
+import sys, time
+for piece in sys.stdin.read().split("|"):
+    sys.stdout.write(piece)
+    sys.stdout.flush()
+    time.sleep(0.05)
+"""
+
+
+@pytest.mark.parametrize("stop_on_divergence", [False, True])
+def test_script_output_written_in_pieces(make_script, stop_on_divergence: bool) -> None:
+    script = make_script(PIECES)
+    cases = [
+        Case(index=1, label="tokens", input_data="1 |2\n|3\n", expected_output="1 2 3"),
+        Case(index=2, label="wrong", input_data="1 |4\n|3\n", expected_output="1 2 3"),
+        Case(index=3, label="split", input_data="1|2 3\n", expected_output="1 2 3"),
+    ]
+    results = run_test_cases(
+        cases, script, timeout=10, comparator="tokens", stop_on_divergence=stop_on_divergence
+    )
+    assert [result.status for result in results] == ["passed", "failed", "failed"]
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import os
+import signal
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from test_runner.cases import TestCase as Case
+from test_runner.distributed import Coordinator, spawn_local_workers
+from test_runner.executor import CancelToken
+
+AUTHKEY = b"test-runner-tests"
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "killpg"), reason="needs POSIX process groups")
+
+ECHO = """
+import time
+value = input()
+time.sleep(0.02)
+print(value)
+"""
+
+# Reports its pid through the file named by its input, then runs on.
+LINGER = """
+import time
+path = input()
+with open(path + ".tmp", "w") as handle:
+    handle.write(str(__import__("os").getpid()))
+__import__("os").replace(path + ".tmp", path)
+time.sleep(120)
+"""
+
+
+def _gone(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            # A killed orphan may linger as a zombie until init reaps it.
+            return any(line.split()[1:2] == ["Z"] for line in status if line.startswith("State:"))
+    except FileNotFoundError:
+        return True
+
+
+def _wait_for(condition, timeout: float = 15.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_cases_of_a_dead_worker_are_requeued(make_script) -> None:
+    script = make_script(ECHO)
+    cases = [Case(index=i, label=f"case {i}", input_data=str(i), expected_output=str(i)) for i in range(1, 61)]
+    with Coordinator(authkey=AUTHKEY, batch_size=4) as coordinator:
+        workers = spawn_local_workers(coordinator.address, 2, authkey=AUTHKEY)
+        try:
+            assert coordinator.wait_for_workers(2, timeout=30)
+            results = []
+            for result in coordinator.iter_results(cases, script, timeout=10):
+                results.append(result)
+                if len(results) == 5:
+                    workers[0].kill()
+            # Before the cleanup below kills the surviving worker as well.
+            stats = coordinator.stats()
+        finally:
+            for worker in workers:
+                worker.kill()
+                worker.wait()
+    assert sorted(result.case.index for result in results) == list(range(1, 61))
+    assert all(result.status == "passed" for result in results)
+    assert all(result.worker is not None for result in results)
+    assert sum(not worker.alive for worker in stats) == 1
+    assert sum(worker.requeued for worker in stats) > 0
+
+
+def test_killed_worker_does_not_leave_its_cases_running(tmp_path: Path, make_script) -> None:
+    script = make_script(LINGER)
+    pid_file = tmp_path / "pid"
+    token = CancelToken()
+    with Coordinator(authkey=AUTHKEY) as coordinator:
+        [worker] = spawn_local_workers(coordinator.address, 1, authkey=AUTHKEY)
+        try:
+            assert coordinator.wait_for_workers(1, timeout=30)
+
+            def consume() -> None:
+                cases = [Case(index=1, label="linger", input_data=str(pid_file))]
+                for _ in coordinator.iter_results(cases, script, cancel=token, worker_timeout=None):
+                    pass
+
+            consumer = threading.Thread(target=consume, daemon=True)
+            consumer.start()
+            assert _wait_for(pid_file.exists)
+            case_pid = int(pid_file.read_text())
+            os.kill(worker.pid, signal.SIGKILL)
+            worker.wait()
+            assert _wait_for(lambda: _gone(case_pid))
+        finally:
+            token.cancel()
+            worker.kill()
+            worker.wait()
+        consumer.join(timeout=10)
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import importlib.util
+import os
+import subprocess
+import sys
+
+import pytest
+
+from test_runner.capture import spill_directory
+from test_runner.cases import TestCase as Case
+from test_runner.executor import is_timeout, run_test_cases
+from test_runner.forkserver import ForkServer, fork_available
+from test_runner.generator import generate_pytest_file
+
+pytestmark = pytest.mark.skipif(not fork_available(), reason="the fork server needs os.fork")
+
+# One script that behaves differently per input, so a single run of each
+# mode covers the usual outcomes of a case.
+SCRIPT = """
+import os
+import sys
+import time
+
+from helper import shout
+
+command = sys.stdin.readline().strip()
+rest = sys.stdin.read()
+if command == "echo":
+    print(rest.strip())
+elif command == "linger":
+    print(rest.strip(), flush=True)
+    time.sleep(1)
+elif command == "shout":
+    print(shout(rest.strip()))
+elif command == "main":
+    print(__name__, os.path.basename(sys.argv[0]))
+elif command == "stderr":
+    print("out")
+    print("problem", file=sys.stderr)
+elif command == "raise":
+    raise ValueError("broken")
+elif command == "exit":
+    print("partial")
+    sys.exit(int(rest))
+elif command == "sleep":
+    time.sleep(30)
+elif command == "big":
+    sys.stdout.write("x" * int(rest))
+elif command == "cwd":
+    print(os.getcwd())
+"""
+
+HELPER = """
+def shout(text):
+    return text.upper() + "!"
+"""
+
+CASES = [
+    ("echo", "hello\nworld", "hello\nworld"),
+    ("linger", "hello", "bye"),
+    ("shout", "hey", "HEY!"),
+    ("main", "", "__main__ script.py"),
+    ("stderr", "", "out"),
+    ("raise", "", None),
+    ("exit", "0", "partial"),
+    ("exit", "3", "partial"),
+    ("sleep", "", None),
+    ("big", "300000", "x" * 300000),
+    ("cwd", "", None),
+]
+
+FIELDS = ("status", "stdout", "returncode", "limit", "truncated", "divergence_offset", "divergence_line")
+
+
+def _cases() -> list[Case]:
+    return [
+        Case(index=index, label=command, input_data=f"{command}\n{data}", expected_output=expected)
+        for index, (command, data, expected) in enumerate(CASES, start=1)
+    ]
+
+
+def _script(tmp_path):
+    (tmp_path / "helper.py").write_text(HELPER.lstrip(), encoding="utf-8")
+    path = tmp_path / "script.py"
+    path.write_text(SCRIPT.lstrip(), encoding="utf-8")
+    return path
+
+
+def _summary(results) -> list[tuple]:
+    rows = []
+    for result in results:
+        row = {field: getattr(result, field) for field in FIELDS}
+        if result.divergence_offset is not None and result.returncode != 0:
+            # Stopped early: how much was written after the divergence point
+            # before the kill landed depends on timing, in either mode.
+            row["stdout"] = result.stdout[: result.divergence_offset]
+        rows.append(tuple(row.values()))
+    return rows
+
+
+@pytest.mark.parametrize("stop_on_divergence", [False, True])
+def test_fork_mode_matches_cold_mode(tmp_path, stop_on_divergence: bool) -> None:
+    script = _script(tmp_path)
+    runs = {
+        mode: run_test_cases(
+            _cases(),
+            script,
+            timeout=2,
+            mode=mode,
+            output_buffer=64 * 1024,
+            stop_on_divergence=stop_on_divergence,
+            deduplicate=False,
+        )
+        for mode in ("cold", "fork")
+    }
+    assert _summary(runs["fork"]) == _summary(runs["cold"])
+
+    cold = {result.case.label + str(result.case.index): result for result in runs["cold"]}
+    assert [result.status for result in runs["cold"]] == [
+        "passed",
+        "failed",
+        "passed",
+        "passed",
+        "passed",
+        "error",
+        "passed",
+        "error",
+        "error",
+        "passed",
+        "executed",
+    ]
+    assert is_timeout(cold["sleep9"])
+    if stop_on_divergence:
+        # Stopped at the wrong first line instead of after the script's pause.
+        assert cold["linger2"].divergence_line == 1
+        assert cold["linger2"].elapsed < 1
+    for cold_result, fork_result in zip(runs["cold"], runs["fork"]):
+        assert ("problem" in cold_result.stderr) == ("problem" in fork_result.stderr)
+        assert ("ValueError: broken" in cold_result.stderr) == ("ValueError: broken" in fork_result.stderr)
+
+
+def test_fork_mode_matches_cold_mode_in_binary(tmp_path) -> None:
+    script = _script(tmp_path)
+    cases = [
+        Case(index=1, label="echo", input_data=b"echo\n\xff\x00\r\n", expected_output=b"\xff\x00"),
+        Case(index=2, label="echo", input_data=b"echo\nabc", expected_output=b"abd"),
+    ]
+    cold = run_test_cases(cases, script, timeout=5, binary=True)
+    fork = run_test_cases(cases, script, timeout=5, mode="fork", binary=True)
+    assert _summary(fork) == _summary(cold)
+    assert [result.status for result in cold] == ["passed", "failed"]
+
+
+# More than the 1 MiB the executor and the fork server keep in memory.
+BIG = 3_000_000
+
+
+def _big_case() -> Case:
+    return Case(index=1, label="big", input_data=f"big\n{BIG}", expected_output="x" * BIG)
+
+
+@pytest.mark.parametrize("mode", ["cold", "fork"])
+def test_generated_module_passes_output_over_the_buffer(tmp_path, mode: str) -> None:
+    script = _script(tmp_path)
+    [result] = run_test_cases([_big_case()], script, timeout=10, mode=mode)
+    assert result.status == "passed"
+    assert result.stdout_file is not None
+
+    module = generate_pytest_file(
+        [_big_case()], script, tmp_path / "generated" / "test_big.py", timeout=10, mode=mode
+    )
+    completed = subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", str(module)],
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert completed.returncode == 0, completed.stdout
+
+
+def test_generated_fork_run_removes_spill_files(tmp_path) -> None:
+    script = _script(tmp_path)
+    path = generate_pytest_file([_big_case()], script, tmp_path / "generated" / "test_big.py", mode="fork")
+    spec = importlib.util.spec_from_file_location("generated_big", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    before = set(os.listdir(spill_directory()))
+    with ForkServer(script) as server:
+        returncode, stdout, _stderr, _elapsed = module._run_case(server, module._TEST_CASES[0])
+    assert returncode == 0
+    assert len(stdout) == BIG
+    assert set(os.listdir(spill_directory())) == before
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import time
+import xml.etree.ElementTree as ElementTree
+from pathlib import Path
+
+import pytest
+
+from test_runner.cases import TestCase as Case
+from test_runner.executor import run_test_cases
+from test_runner.forkserver import fork_available
+from test_runner.generator import (
+    RECORDED_RESULTS_ENV,
+    data_file_paths,
+    generate_pytest_file,
+    write_recorded_results,
+)
+
+# Counts its runs in a log next to itself, then prints what it is told.
+COUNTED = """
+import pathlib
+import sys
+import time
+with pathlib.Path(__file__).with_name("runs.log").open("a") as log:
+    log.write("run\\n")
+letter, size, *pause = sys.stdin.read().split()
+sys.stdout.write(letter * int(size))
+sys.stdout.flush()
+time.sleep(float(pause[0]) if pause else 0)
+"""
+
+
+def _cases(count: int, suffix: str = "") -> list[Case]:
+    return [
+        Case(index=i, label=f"case {i}", input_data=f"{i}{suffix}", expected_output=str(i))
+        for i in range(1, count + 1)
+    ]
+
+
+def _generate(tmp_path: Path, cases: list[Case]) -> tuple[Path, Path]:
+    target = tmp_path / "test_generated.py"
+    generate_pytest_file(cases, tmp_path / "script.py", target, data_file=True)
+    return data_file_paths(target)
+
+
+def _age(*paths: Path) -> None:
+    for path in paths:
+        os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+
+
+def test_unchanged_data_file_is_not_rewritten(tmp_path: Path) -> None:
+    data, index = _generate(tmp_path, _cases(200))
+    _age(data, index)
+    _generate(tmp_path, _cases(200))
+    assert data.stat().st_mtime_ns == 1_000_000_000
+    assert index.stat().st_mtime_ns == 1_000_000_000
+
+
+def test_changed_data_file_is_rewritten(tmp_path: Path) -> None:
+    _generate(tmp_path, _cases(200))
+    # Changed in the middle and shorter than before.
+    changed = _cases(150)
+    changed[100] = Case(index=101, label="case 101", input_data="changed", expected_output="101")
+    data, index = _generate(tmp_path, changed)
+
+    fresh = tmp_path / "fresh"
+    fresh.mkdir()
+    fresh_data, fresh_index = _generate(fresh, changed)
+    assert data.read_bytes() == fresh_data.read_bytes()
+    assert index.read_bytes() == fresh_index.read_bytes()
+
+
+def _replay(tmp_path: Path, make_script, cases: list[Case], **options) -> tuple[dict[str, str], int]:
+    """Run *cases*, then pytest on the generated module with the recorded results.
+
+    Returns ``"passed"`` or the failure message per test name and how many
+    times the script ran.
+    """
+
+    script = make_script(COUNTED)
+    results = run_test_cases(cases, script, timeout=10, **options)
+    target = generate_pytest_file(cases, script, tmp_path / "generated" / "test_generated.py", timeout=10)
+    recorded = write_recorded_results(results, target)
+    junit = tmp_path / "junit.xml"
+    subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", f"--junitxml={junit}", str(target)],
+        capture_output=True,
+        timeout=120,
+        env={**os.environ, RECORDED_RESULTS_ENV: str(recorded)},
+    )
+    outcomes = {
+        testcase.get("name"): "passed" if failure is None else failure.get("message")
+        for testcase in ElementTree.parse(junit).iter("testcase")
+        for failure in [testcase.find("failure")]
+    }
+    runs = script.with_name("runs.log").read_text().count("run")
+    return outcomes, runs
+
+
+def test_replay_keeps_the_verdict_on_truncated_output(tmp_path: Path, make_script) -> None:
+    cases = [
+        Case(index=1, label="spilled", input_data="x 100000", expected_output="x" * 100_000),
+        Case(index=2, label="spilled-wrong", input_data="x 100000", expected_output="z"),
+        Case(index=3, label="flood", input_data="y 200000", expected_output="y"),
+        Case(index=4, label="short", input_data="x 3", expected_output="xxx"),
+    ]
+    outcomes, runs = _replay(
+        tmp_path, make_script, cases, output_buffer=10_000, output_kill_limit=150_000, deduplicate=False
+    )
+    assert outcomes["test_generated[spilled]"] == "passed"
+    assert outcomes["test_generated[short]"] == "passed"
+    assert "Вывод отличается" in outcomes["test_generated[spilled-wrong]"]
+    assert "объём вывода" in outcomes["test_generated[flood]"]
+    # The executor's runs only: pytest ran none of them again.
+    assert runs == 4
+
+
+def test_replay_keeps_the_divergence_point(tmp_path: Path, make_script) -> None:
+    # Wrong from its first character, then busy for a long time.
+    cases = [Case(index=1, label="stopped", input_data="x 10 5", expected_output="y")]
+    started = time.monotonic()
+    outcomes, runs = _replay(tmp_path, make_script, cases, stop_on_divergence=True)
+    assert time.monotonic() - started < 5
+    assert runs == 1
+    assert "строка 1, символ 0" in outcomes["test_generated[stopped]"]
+
+
+# Reads and writes cp1251 bytes, whatever the locale's codec is.
+CP1251_ECHO = """
+import sys
+text = sys.stdin.buffer.read().decode("cp1251")
+sys.stdout.buffer.write(text.upper().encode("cp1251"))
+"""
+
+
+@pytest.mark.parametrize(
+    "mode",
+    ["cold", pytest.param("fork", marks=pytest.mark.skipif(not fork_available(), reason="needs os.fork"))],
+)
+def test_generated_module_uses_the_run_encoding(tmp_path: Path, make_script, mode: str) -> None:
+    script = make_script(CP1251_ECHO)
+    cases = [Case(index=1, label="cyrillic", input_data="привет", expected_output="ПРИВЕТ")]
+    [result] = run_test_cases(cases, script, timeout=10, mode=mode, encoding="cp1251")
+    assert result.status == "passed"
+
+    target = generate_pytest_file(
+        cases, script, tmp_path / "generated" / "test_cp1251.py", timeout=10, mode=mode, encoding="cp1251"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", str(target)],
+        capture_output=True,
+        text=True,
+        timeout=120,
+        env={**os.environ, "PYTHONUTF8": "1"},
+    )
+    assert completed.returncode == 0, completed.stdout
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from test_runner.cache import ResultCache
+from test_runner.cases import TestCase as Case
+from test_runner.executor import is_timeout, run_test_cases
+from test_runner.history import AdaptiveTimeout, RunHistory
+from test_runner.limits import MEMORY_LIMIT_STATUS
+
+# Kernel-enforced limits need the POSIX resource module.
+pytest.importorskip("resource")
+
+MIB = 1024 * 1024
+
+ALLOCATE = """
+size = int(input())
+data = bytearray(size * 1024 * 1024)
+print(len(data) // (1024 * 1024))
+"""
+
+
+def _case(megabytes: int) -> Case:
+    return Case(index=1, label="alloc", input_data=str(megabytes), expected_output=str(megabytes))
+
+
+@pytest.mark.parametrize("mode", ["cold", "fork"])
+def test_memory_limit_status(make_script, mode: str) -> None:
+    script = make_script(ALLOCATE)
+    small, big = run_test_cases(
+        [_case(10), Case(index=2, label="big", input_data="300", expected_output="300")],
+        script,
+        timeout=20,
+        mode=mode,
+        memory_limit=100 * MIB,
+    )
+    assert small.status == "passed"
+    assert big.status == MEMORY_LIMIT_STATUS
+    assert big.limit == "memory"
+    assert big.has_error
+    assert "100 МиБ" in big.message
+
+
+def test_memory_limit_is_part_of_the_cache_key(tmp_path: Path, make_script) -> None:
+    script = make_script(ALLOCATE)
+    with ResultCache(tmp_path / "cache.sqlite3") as cache:
+        [unlimited] = run_test_cases([_case(300)], script, timeout=20, cache=cache)
+        [limited] = run_test_cases(
+            [_case(300)], script, timeout=20, cache=cache, memory_limit=50 * MIB
+        )
+        [again] = run_test_cases([_case(300)], script, timeout=20, cache=cache)
+    assert unlimited.status == "passed"
+    assert not limited.cached
+    assert limited.status == MEMORY_LIMIT_STATUS
+    assert again.cached
+
+
+def test_limit_stopped_results_are_not_cached(tmp_path: Path, make_script) -> None:
+    script = make_script(ALLOCATE)
+    with ResultCache(tmp_path / "cache.sqlite3") as cache:
+        for _ in range(2):
+            [result] = run_test_cases(
+                [_case(300)], script, timeout=20, cache=cache, memory_limit=50 * MIB
+            )
+            assert not result.cached
+            assert result.status == MEMORY_LIMIT_STATUS
+
+
+SPIN = """
+import time
+end = time.process_time() + float(input())
+while time.process_time() < end:
+    pass
+print("done")
+"""
+
+
+def test_cpu_limit_status(make_script) -> None:
+    script = make_script(SPIN)
+    quick, spinning = run_test_cases(
+        [
+            Case(index=1, label="quick", input_data="0.1", expected_output="done"),
+            Case(index=2, label="spin", input_data="30", expected_output="done"),
+        ],
+        script,
+        timeout=20,
+        cpu_limit=1,
+    )
+    assert quick.status == "passed"
+    assert spinning.status == "error"
+    assert spinning.limit == "cpu"
+    assert is_timeout(spinning)
+
+
+def test_cpu_limit_is_part_of_the_cache_key(tmp_path: Path, make_script) -> None:
+    script = make_script(SPIN)
+    case = Case(index=1, label="spin", input_data="1.5", expected_output="done")
+    with ResultCache(tmp_path / "cache.sqlite3") as cache:
+        [unlimited] = run_test_cases([case], script, timeout=20, cache=cache)
+        [limited] = run_test_cases([case], script, timeout=20, cache=cache, cpu_limit=1)
+    assert unlimited.status == "passed"
+    assert not limited.cached
+    assert limited.limit == "cpu"
+
+
+def test_adaptive_timeout_keys_on_the_case_timeout(tmp_path: Path, make_script) -> None:
+    script = make_script(SPIN)
+    case = Case(index=1, label="quick", input_data="0", expected_output="done")
+    policy = AdaptiveTimeout(factor=3.0, floor=1.0, ceiling=10.0)
+    with ResultCache(tmp_path / "cache.sqlite3") as cache, RunHistory(
+        tmp_path / "history.sqlite3"
+    ) as history:
+        [first] = run_test_cases([case], script, timeout=10, cache=cache, history=history)
+        history.flush()
+        # The history now gives the case a 1 s timeout instead of the common 10 s.
+        [adaptive] = run_test_cases(
+            [case], script, timeout=10, cache=cache, history=history, adaptive_timeout=policy
+        )
+    assert not first.cached
+    assert not adaptive.cached
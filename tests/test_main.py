@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+import pytest
+
+pytest.importorskip("tkinter")
+
+import main  # noqa: E402
+from test_runner.cases import TestCase as Case  # noqa: E402
+from test_runner.executor import TestResult as Result  # noqa: E402
+
+
+def _result(index: int, elapsed: float) -> Result:
+    case = Case(index=index, label=f"case {index}", input_data="")
+    return Result(case=case, status="passed", stdout="", stderr="", elapsed=elapsed, message="")
+
+
+def test_time_sort_key_orders_never_run_cases_last() -> None:
+    nan = float("nan")
+    results = [_result(1, 0.5), _result(2, nan), _result(3, 0.1), _result(4, nan), _result(5, 0.3)]
+    key = main._SORT_KEYS["time"]
+    ordered = sorted(results, key=lambda result: (key(result), result.case.index))
+    assert [result.case.index for result in ordered] == [3, 5, 1, 2, 4]
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from test_runner.cases import TestCase as Case
+from test_runner.executor import CancelToken
+from test_runner.forkserver import fork_available
+from test_runner.generator import generate_pytest_file
+from test_runner.pytest_session import run_pytest
+
+# Tells the test where it got to through the file named by its input.
+SLOW = """
+import pathlib
+import time
+pathlib.Path(input()).write_text("started")
+time.sleep(30)
+print("done")
+"""
+
+
+def _wait_for(condition, timeout: float = 15.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.mark.parametrize(
+    "mode",
+    ["cold", pytest.param("fork", marks=pytest.mark.skipif(not fork_available(), reason="needs os.fork"))],
+)
+def test_cancel_stops_the_test_in_progress(tmp_path: Path, make_script, mode: str) -> None:
+    script = make_script(SLOW)
+    marker = tmp_path / "started"
+    cases = [
+        Case(index=index, label=f"slow {index}", input_data=str(marker), expected_output="done")
+        for index in (1, 2)
+    ]
+    target = generate_pytest_file(
+        cases, script, tmp_path / "generated" / "test_slow.py", timeout=60, mode=mode
+    )
+    token = CancelToken()
+    reports = []
+    runner = threading.Thread(target=lambda: reports.append(run_pytest(target, cancel=token)), daemon=True)
+    runner.start()
+    assert _wait_for(marker.exists)
+    cancelled = time.monotonic()
+    token.cancel()
+    runner.join(timeout=20)
+    assert not runner.is_alive()
+    assert time.monotonic() - cancelled < 10
+    # The second test never started.
+    assert len(reports[0].outcomes) <= 1
+
+
+@pytest.mark.skipif(not fork_available(), reason="needs os.fork")
+@pytest.mark.parametrize("data_file", [False, True])
+def test_setup_errors_map_to_their_cases(tmp_path: Path, make_script, data_file: bool) -> None:
+    script = make_script("print(input())")
+    cases = [Case(index=index, label=f"case {index}", input_data="x", expected_output="x") for index in (4, 7)]
+    target = generate_pytest_file(
+        cases, script, tmp_path / "generated" / "test_setup.py", mode="fork", data_file=data_file
+    )
+    # The fork server fixture fails before any test records a property.
+    script.unlink()
+    report = run_pytest(target)
+    assert sorted(report.by_index()) == [4, 7]
+    assert {outcome.outcome for outcome in report.outcomes} == {"error"}